@@ -1,149 +1,470 @@
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import asyncio
+import logging
 import os
-import json
+import time
+
 from dotenv import load_dotenv
 
+from cache import ResponseCache, make_cache_key
+from json_stream import JsonArrayStream
+from llm_json import ResponseParser
+from llm_pool import LLMClientPool
+from local_engine import LocalEngine
+from metrics import LLM_CALL_SECONDS, LLM_FALLBACKS, LLM_HEDGES, LLM_UNAVAILABLE, SIMILAR_REUSE
+from prompts import PromptRegistry
+from resilience import CircuitBreaker, LatencyTracker, ProviderUnavailable, mark_degraded, time_left
+from scheduler import LLMScheduler, SchedulerBusy, priority_for, priority_tag
+from similarity import SimilarityIndex
+from singleflight import SingleFlight
+from token_usage import TokenMeter
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+MODEL_PROVIDER = "anthropic"
+MODEL_NAME = "claude-3-7-sonnet-20250219"
+
 class AIEducatorService:
-    def __init__(self):
+    def __init__(self, cache: ResponseCache = None):
         self.api_key = os.getenv("EMERGENT_LLM_KEY")
         if not self.api_key:
             raise ValueError("EMERGENT_LLM_KEY not found in environment variables")
+        self.cache = cache if cache is not None else ResponseCache()
+        self.singleflight = SingleFlight()
+        self.scheduler = LLMScheduler()
+        self.pool = LLMClientPool(self.api_key, MODEL_PROVIDER, MODEL_NAME)
+        self.parser = ResponseParser()
+        self.prompts = PromptRegistry()
+        self.tokens = TokenMeter(MODEL_NAME)
+        self.local = LocalEngine()
+        self.similar = SimilarityIndex()
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.call_timeout = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "60"))
     
     def _create_chat(self, system_message: str):
-        """Create a new chat instance with Claude"""
-        chat = LlmChat(
-            api_key=self.api_key,
-            session_id="tutor_session",
-            system_message=system_message
-        ).with_model("anthropic", "claude-3-7-sonnet-20250219")
-        return chat
-    
-    async def generate_hints(self, problem: str, difficulty: str, topic: str):
-        """Generate 3 tiered hints for a problem"""
-        system_message = """You are an expert educator creating tiered hints for practice problems.
-        Generate exactly 3 hints with progressive guidance:
-        - Hint 1: Gentle nudge, identifies what concept to use
-        - Hint 2: More specific, suggests an approach or formula
-        - Hint 3: Step-by-step outline without giving the final answer
-        
-        Return ONLY valid JSON in this format:
-        {
-            "hint1": "First gentle hint...",
-            "hint2": "More specific hint...",
-            "hint3": "Detailed step-by-step outline..."
-        }"""
+        """Create a chat with Claude that has its own session and uses the pooled connections"""
+        return self.pool.chat(system_message)
+    
+    async def _generate(self, method: str, system_message: str, prompt: str, use_cache: bool = True):
+        """Run one generation, serving repeats from the response cache.
+        
+        Identical concurrent calls share one in-flight request. Passing
+        use_cache=False asks for a fresh generation, so it skips both the
+        cache and the coalescing.
+        
+        Returns the validated JSON payload, or None if nothing usable could
+        be parsed even after a re-ask. Only complete payloads are cached.
+        """
+        if not use_cache:
+            data = await self._call_model(method, system_message, prompt, None)
+        else:
+            key = self._cache_key(method, system_message, prompt)
+            cache_key = key if self.cache.enabled_for(method) else None
+            if cache_key is not None:
+                cached = await self.cache.aget(cache_key)
+                if cached is not None:
+                    return cached
+            
+            if self.singleflight.in_flight(key):
+                # The call being joined may have been started at a lower priority, e.g. by a prefetch
+                self.scheduler.promote(self._flight_tag(key), priority_for(method))
+            data = await self.singleflight.do(
+                key,
+                lambda: self._flight(key, method, system_message, prompt, cache_key),
+                label=method
+            )
+        # Flagged here rather than in _call_model so every caller sharing a coalesced call is flagged
+        if data is None:
+            mark_degraded(method)
+        return data
+    
+    @staticmethod
+    def _flight_tag(key: str) -> str:
+        return f"flight|{key}"
+    
+    async def _flight(self, key: str, method: str, system_message: str, prompt: str, cache_key: str = None):
+        """_call_model for a coalesced call, tagged so that callers joining it can promote its queued model calls"""
+        with priority_tag(self._flight_tag(key)):
+            return await self._call_model(method, system_message, prompt, cache_key)
+    
+    async def _reuse_similar(self, method: str, scope: str, problem: str, key: str):
+        """Cached answer of a near-identical problem with the same numbers, or None"""
+        match = self.similar.lookup(scope, problem, exclude=key)
+        if match is None:
+            return None
+        data = await self.cache.aget(match)
+        if data is None:
+            self.similar.record_stale()
+            return None
+        SIMILAR_REUSE.inc(method)
+        return data
+    
+    async def _generate_similar(self, method: str, scope: str, problem: str, system_message: str, prompt: str, use_cache: bool = True):
+        """_generate, reusing the answer to a problem that differs only in wording, casing or variable names"""
+        if not use_cache or not self.cache.enabled_for(method):
+            return await self._generate(method, system_message, prompt, use_cache=use_cache)
+        
+        key = self._cache_key(method, system_message, prompt)
+        data = await self._reuse_similar(method, scope, problem, key)
+        if data is not None:
+            return data
+        data = await self._generate(method, system_message, prompt)
+        if data is not None:
+            self.similar.add(scope, problem, key)
+        return data
+    
+    async def _timed(self, method: str, chat, prompt: str) -> str:
+        """One request to the provider, given up on after `call_timeout` seconds"""
+        started = time.perf_counter()
+        try:
+            with LLM_CALL_SECONDS.time(method):
+                response = await asyncio.wait_for(chat.send_message(self.pool.message(prompt)), self.call_timeout)
+        except asyncio.TimeoutError:
+            raise ProviderUnavailable("timeout", f"No reply within {self.call_timeout:g}s")
+        self.latency.observe(method, time.perf_counter() - started)
+        return response
+    
+    async def _hedged(self, method: str, system_message: str, prompt: str, chat):
+        """Send `prompt`, and a duplicate in a new chat if no reply came within the usual latency.
+        
+        The duplicate only goes out when a scheduler slot is free right
+        away, so hedging never queues ahead of other calls. The first reply
+        wins and the other request is cancelled. Returns (chat, response).
+        """
+        priority = priority_for(method)
+        hedge = chat is None
+        chat = chat if chat is not None else self._create_chat(system_message)
+        async with self.scheduler.slot(priority):
+            primary = asyncio.ensure_future(self._timed(method, chat, prompt))
+            tasks = {primary: chat}
+            try:
+                delay = self.latency.hedge_delay(method) if hedge else None
+                if delay is not None:
+                    await asyncio.wait([primary], timeout=delay)
+                if primary.done() or delay is None or not self.scheduler.try_acquire(priority):
+                    return chat, await primary
+                
+                try:
+                    hedge_chat = self._create_chat(system_message)
+                    tasks[asyncio.ensure_future(self._timed(method, hedge_chat, prompt))] = hedge_chat
+                    pending = set(tasks)
+                    while pending:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            if task.exception() is None:
+                                winner = "primary" if task is primary else "hedge"
+                                self.latency.hedges[winner] += 1
+                                LLM_HEDGES.inc(method, winner)
+                                # The cancelled request was still billed for its prompt
+                                self.tokens.record(method, system_message, prompt, "")
+                                return tasks[task], task.result()
+                    raise primary.exception()
+                finally:
+                    self.scheduler.release()
+            finally:
+                for task in tasks:
+                    task.cancel()
+    
+    async def _send(self, method: str, system_message: str, prompt: str, chat=None):
+        """One model round trip, refused while the circuit is open and bounded by the request deadline.
+        
+        Pass `chat` to continue a conversation; those calls are not hedged.
+        Returns (chat, response), or raises ProviderUnavailable.
+        """
+        if not self.breaker.allow():
+            raise ProviderUnavailable("circuit_open")
+        left = time_left()
+        if left is not None and left <= 0:
+            raise ProviderUnavailable("deadline")
+        try:
+            chat, response = await asyncio.wait_for(self._hedged(method, system_message, prompt, chat), left)
+        except asyncio.TimeoutError:
+            # Only the request ran out of time; a tight budget on one endpoint should not open the circuit for all
+            raise ProviderUnavailable("deadline", f"No reply within the request's {left:.1f}s")
+        except SchedulerBusy:
+            raise
+        except ProviderUnavailable:
+            self.breaker.record_failure()
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            raise ProviderUnavailable("provider_error", str(e)) from e
+        self.breaker.record_success()
+        return chat, response
+    
+    @staticmethod
+    def _unavailable(method: str, error: ProviderUnavailable):
+        LLM_UNAVAILABLE.inc(method, error.cause)
+        LLM_FALLBACKS.inc(method)
+        if error.cause == "provider_error":
+            logger.warning("Model call for %s failed: %s", method, error)
+    
+    async def _call_model(self, method: str, system_message: str, prompt: str, cache_key: str = None):
+        """Send one prompt to the model and parse the reply, caching it under `cache_key`.
+        
+        If nothing can be repaired or salvaged from the reply, the model is
+        asked once, in the same chat, to resend just the JSON. Returns None,
+        for the caller's placeholder content, when the provider is
+        unavailable or the request deadline passes.
+        """
+        try:
+            chat, response = await self._send(method, system_message, prompt)
+            self.tokens.record(method, system_message, prompt, response)
+            result = self.parser.parse(method, response)
+            
+            if result.data is None and self.parser.reask:
+                reask = self.parser.reask_prompt(result.error)
+                chat, retry = await self._send(method, system_message, reask, chat=chat)
+                # The re-ask resends the whole conversation so far
+                self.tokens.record(method, system_message, "\n".join([prompt, response, reask]), retry)
+                result = self.parser.parse(method, retry)
+                self.parser.record_reask(method, result.data is not None)
+        except ProviderUnavailable as e:
+            self._unavailable(method, e)
+            return None
+        
+        if result.data is None:
+            LLM_FALLBACKS.inc(method)
+            return None
+        if cache_key is not None and result.outcome != "salvaged":
+            await self.cache.aset(cache_key, method, result.data)
+        return result.data
+    
+    def estimate_tokens(self, method: str, **params) -> int:
+        """Expected tokens for one model call of `method` with these prompt parameters"""
+        system_message, prompt = self.prompts.render(method, **params)
+        return self.tokens.estimate(method, system_message, prompt)
+    
+    def stats(self) -> dict:
+        """Counters for the cache, request coalescing, scheduling, connection, parsing, local engine, similarity and resilience layers"""
+        return {
+            "cache": self.cache.stats(),
+            "coalescing": self.singleflight.stats(),
+            "scheduler": self.scheduler.stats(),
+            "connections": self.pool.stats(),
+            "parsing": self.parser.stats(),
+            "local_engine": self.local.stats(),
+            "similarity": self.similar.stats(),
+            "circuit_breaker": self.breaker.stats(),
+            "hedging": self.latency.stats(),
+            "call_timeout_seconds": self.call_timeout
+        }
+    
+    @staticmethod
+    def _cache_key(method: str, system_message: str, prompt: str) -> str:
+        return make_cache_key(method, system_message, prompt, f"{MODEL_PROVIDER}/{MODEL_NAME}")
+    
+    async def _stream_chat(self, chat, prompt: str):
+        """Yield response text chunks, streaming when the chat client supports it"""
+        message = self.pool.message(prompt)
+        stream_message = getattr(chat, "stream_message", None)
+        if stream_message is None:
+            yield await chat.send_message(message)
+            return
+        async for chunk in stream_message(message):
+            yield chunk
+    
+    async def _stream_generate(self, method: str, system_message: str, prompt: str, array_keys: list, use_cache: bool = True):
+        """Stream one generation as (array_key, item) pairs.
+        
+        A pair is yielded as soon as an element of one of the `array_keys`
+        arrays is complete. The final pair is (None, payload) with the parsed
+        document, or (None, None) if it could not be parsed. Shares cache
+        entries with _generate.
+        """
+        use_cache = use_cache and self.cache.enabled_for(method)
+        key = self._cache_key(method, system_message, prompt)
+        if use_cache:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                for array_key in array_keys:
+                    for item in cached.get(array_key, []):
+                        yield array_key, item
+                yield None, cached
+                return
+        
+        parser = JsonArrayStream(array_keys)
+        interrupted = False
+        try:
+            async for item in self._stream_items(method, system_message, prompt, parser):
+                yield item
+        except ProviderUnavailable as e:
+            # Whatever arrived before the failure is still parsed below, but is not complete enough to cache
+            self._unavailable(method, e)
+            interrupted = True
+        
+        if parser.text or not interrupted:
+            self.tokens.record(method, system_message, prompt, parser.text)
+        # Items already streamed cannot be taken back, so there is no re-ask here
+        result = self.parser.parse(method, parser.text) if parser.text else None
+        data = result.data if result is not None else None
+        if data is None or interrupted:
+            mark_degraded(method)
+        if data is None and not interrupted:
+            LLM_FALLBACKS.inc(method)
+        if use_cache and not interrupted and data is not None and result.outcome != "salvaged":
+            await self.cache.aset(key, method, data)
+        yield None, data
+    
+    async def _stream_items(self, method: str, system_message: str, prompt: str, parser: JsonArrayStream):
+        """Feed the streamed reply into `parser`, yielding its items, under the same limits as _send.
+        
+        The deadline is checked between chunks, as a timeout around the
+        whole stream would also cut into the time the consumer spends on
+        each item.
+        """
+        if not self.breaker.allow():
+            raise ProviderUnavailable("circuit_open")
+        left = time_left()
+        slot = self.scheduler.slot(priority_for(method))
+        try:
+            await asyncio.wait_for(slot.__aenter__(), left)
+        except asyncio.TimeoutError:
+            raise ProviderUnavailable("deadline")
         
-        chat = self._create_chat(system_message)
-        prompt = f"""Topic: {topic}
-Difficulty: {difficulty}
-Problem: {problem}
-
-Generate 3 tiered hints in JSON format."""
+        timeout = time.monotonic() + self.call_timeout
+        deadline = timeout if left is None else min(timeout, time.monotonic() + time_left())
+        chunks = self._stream_chat(self._create_chat(system_message), prompt)
+        try:
+            with LLM_CALL_SECONDS.time(method):
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(anext(chunks), deadline - time.monotonic())
+                    except StopAsyncIteration:
+                        break
+                    for item in parser.feed(chunk):
+                        yield item
+        except asyncio.TimeoutError:
+            if deadline < timeout:
+                raise ProviderUnavailable("deadline")
+            self.breaker.record_failure()
+            raise ProviderUnavailable("timeout")
+        except Exception as e:
+            self.breaker.record_failure()
+            raise ProviderUnavailable("provider_error", str(e)) from e
+        finally:
+            await chunks.aclose()
+            await slot.__aexit__(None, None, None)
+        self.breaker.record_success()
+    
+    async def generate_hints(self, problem: str, difficulty: str, topic: str, use_cache: bool = True):
+        """Generate 3 tiered hints for a problem"""
+        local = self.local.hints(topic, problem)
+        if local is not None:
+            return local
         
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        system_message, prompt = self.prompts.render("generate_hints", topic=topic, difficulty=difficulty, problem=problem)
         
-        try:
-            # Clean response and parse JSON
-            clean_response = response.strip()
-            if clean_response.startswith('```json'):
-                clean_response = clean_response[7:-3].strip()
-            elif clean_response.startswith('```'):
-                clean_response = clean_response[3:-3].strip()
-            
-            hints_data = json.loads(clean_response)
-            return [
-                hints_data.get("hint1", ""),
-                hints_data.get("hint2", ""),
-                hints_data.get("hint3", "")
-            ]
-        except json.JSONDecodeError:
+        # Hints are pitched at a difficulty, so only problems asked at the same one share them
+        data = await self._generate_similar("generate_hints", f"generate_hints|{difficulty}", problem, system_message, prompt, use_cache=use_cache)
+        if data is None:
             # Fallback to basic hints
             return [
                 f"Consider what you know about {topic}",
                 f"Think about the {difficulty} level approach",
                 "Break the problem into smaller steps"
             ]
+        
+        return [
+            data.get("hint1", ""),
+            data.get("hint2", ""),
+            data.get("hint3", "")
+        ]
     
-    async def generate_solution(self, problem: str, topic: str):
+    def _solution_messages(self, problem: str, topic: str):
+        """Build the system message and prompt for a solution"""
+        return self.prompts.render("generate_solution", topic=topic, problem=problem)
+    
+    async def generate_solution(self, problem: str, topic: str, use_cache: bool = True):
         """Generate step-by-step solution"""
-        system_message = """You are an expert educator providing clear, step-by-step solutions.
-        Break down the solution into numbered steps with clear reasoning.
-        Include the final answer at the end.
-        
-        Return ONLY valid JSON in this format:
-        {
-            "steps": ["Step 1: ...", "Step 2: ...", "Step 3: ..."],
-            "answer": "Final answer",
-            "explanation": "Brief explanation of key concepts"
-        }"""
+        local = self.local.solution(topic, problem)
+        if local is not None:
+            return local
         
-        chat = self._create_chat(system_message)
-        prompt = f"""Topic: {topic}
-Problem: {problem}
-
-Generate a complete step-by-step solution in JSON format."""
+        system_message, prompt = self._solution_messages(problem, topic)
+        data = await self._generate_similar("generate_solution", "generate_solution", problem, system_message, prompt, use_cache=use_cache)
+        if data is None:
+            return self._solution_fallback()
         
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        
-        try:
-            clean_response = response.strip()
-            if clean_response.startswith('```json'):
-                clean_response = clean_response[7:-3].strip()
-            elif clean_response.startswith('```'):
-                clean_response = clean_response[3:-3].strip()
-            
-            return json.loads(clean_response)
-        except json.JSONDecodeError:
-            return {
-                "steps": ["Solution being generated..."],
-                "answer": "Calculating...",
-                "explanation": "Working on solution"
-            }
+        return data
+    
+    async def stream_solution(self, problem: str, topic: str, use_cache: bool = True):
+        """Stream a solution as ("step", text) events, then ("done", solution)"""
+        local = self.local.solution(topic, problem)
+        if local is not None:
+            for step in local["steps"]:
+                yield "step", step
+            yield "done", local
+            return
+        
+        system_message, prompt = self._solution_messages(problem, topic)
+        share = use_cache and self.cache.enabled_for("generate_solution")
+        cache_key = self._cache_key("generate_solution", system_message, prompt)
+        if share:
+            reused = await self._reuse_similar("generate_solution", "generate_solution", problem, cache_key)
+            if reused is not None:
+                for step in reused.get("steps", []):
+                    yield "step", step
+                yield "done", reused
+                return
+        
+        async for key, value in self._stream_generate("generate_solution", system_message, prompt, ["steps"], use_cache=use_cache):
+            if key is None:
+                if value is not None and share:
+                    self.similar.add("generate_solution", problem, cache_key)
+                yield "done", value if value is not None else self._solution_fallback()
+            else:
+                yield "step", value
+    
+    @staticmethod
+    def _solution_fallback():
+        return {
+            "steps": ["Solution being generated..."],
+            "answer": "Calculating...",
+            "explanation": "Working on solution"
+        }
+    
+    def _practice_problem_messages(self, topic: str, difficulty: str, count: int, student_profile: dict):
+        """Build the system message and prompt for a practice problem set"""
+        return self.prompts.render(
+            "generate_practice_problems",
+            count=count,
+            topic=topic,
+            difficulty=difficulty,
+            grade_level=student_profile.get('grade_level', 'General'),
+            learning_style=student_profile.get('learning_style', 'mixed')
+        )
     
-    async def generate_practice_problems(self, topic: str, difficulty: str, count: int, student_profile: dict):
+    async def generate_practice_problems(self, topic: str, difficulty: str, count: int, student_profile: dict, use_cache: bool = True):
         """Generate adaptive practice problems"""
-        system_message = """You are an expert educator creating practice problems.
-        Generate problems that are appropriate for the student's level and learning style.
-        Include context and clear problem statements.
-        
-        Return ONLY valid JSON in this format:
-        {
-            "problems": [
-                {
-                    "prompt": "Problem statement...",
-                    "difficulty": "easy/medium/hard",
-                    "context": "Real-world context..."
-                }
-            ]
-        }"""
-        
-        chat = self._create_chat(system_message)
-        prompt = f"""Create {count} practice problems for:
-        Topic: {topic}
-        Difficulty: {difficulty}
-        Student Grade: {student_profile.get('grade_level', 'General')}
-        Learning Style: {student_profile.get('learning_style', 'mixed')}
-        
-        Generate problems in JSON format."""
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        local = self.local.practice_problems(topic, difficulty, count)
+        if local is not None:
+            return local
         
-        try:
-            clean_response = response.strip()
-            if clean_response.startswith('```json'):
-                clean_response = clean_response[7:-3].strip()
-            elif clean_response.startswith('```'):
-                clean_response = clean_response[3:-3].strip()
-            
-            data = json.loads(clean_response)
-            return data.get("problems", [])
-        except json.JSONDecodeError:
+        system_message, prompt = self._practice_problem_messages(topic, difficulty, count, student_profile)
+        data = await self._generate("generate_practice_problems", system_message, prompt, use_cache=use_cache)
+        if data is None:
             return []
+        
+        return data.get("problems", [])
+    
+    async def stream_practice_problems(self, topic: str, difficulty: str, count: int, student_profile: dict, use_cache: bool = True):
+        """Stream problems as ("problem", problem) events, then ("done", problems)"""
+        local = self.local.practice_problems(topic, difficulty, count)
+        if local is not None:
+            for problem in local:
+                yield "problem", problem
+            yield "done", local
+            return
+        
+        system_message, prompt = self._practice_problem_messages(topic, difficulty, count, student_profile)
+        async for key, value in self._stream_generate("generate_practice_problems", system_message, prompt, ["problems"], use_cache=use_cache):
+            if key is None:
+                yield "done", value.get("problems", []) if value is not None else []
+            else:
+                yield "problem", value
     
     async def calculate_mastery_score(self, attempts: list, hints_used: list) -> float:
         """Calculate mastery score based on attempts and hints used"""
@@ -162,130 +483,74 @@ Generate a complete step-by-step solution in JSON format."""
         final_score = max(0, base_score - hint_penalty)
         return round(final_score, 2)
     
-    async def generate_progress_summary(self, student_id: str, topic: str, mastery_score: float, attempts: list):
+    async def generate_progress_summary(self, student_id: str, topic: str, mastery_score: float, attempts: list, use_cache: bool = True):
         """Generate personalized progress summary and recommendations"""
-        system_message = """You are an expert educator providing personalized feedback and recommendations.
-        Analyze the student's performance and provide actionable next steps.
-        
-        Return ONLY valid JSON in this format:
-        {
-            "strengths": ["Strength 1", "Strength 2"],
-            "target_areas": ["Area to improve 1", "Area to improve 2"],
-            "recommendations": ["Next step 1", "Next step 2"],
-            "motivational_message": "Encouraging message"
-        }"""
-        
-        chat = self._create_chat(system_message)
-        prompt = f"""Analyze this student's performance:
-        Topic: {topic}
-        Mastery Score: {mastery_score}/100
-        Total Attempts: {len(attempts)}
-        Correct: {sum(1 for a in attempts if a.get('correct', False))}
-        
-        Generate a progress summary with recommendations in JSON format."""
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        
-        try:
-            clean_response = response.strip()
-            if clean_response.startswith('```json'):
-                clean_response = clean_response[7:-3].strip()
-            elif clean_response.startswith('```'):
-                clean_response = clean_response[3:-3].strip()
-            
-            return json.loads(clean_response)
-        except json.JSONDecodeError:
+        system_message, prompt = self.prompts.render(
+            "generate_progress_summary",
+            topic=topic,
+            mastery_score=mastery_score,
+            attempt_count=len(attempts),
+            correct_count=sum(1 for a in attempts if a.get('correct', False))
+        )
+        
+        data = await self._generate("generate_progress_summary", system_message, prompt, use_cache=use_cache)
+        if data is None:
             return {
                 "strengths": ["Making progress"],
                 "target_areas": ["Continue practicing"],
                 "recommendations": ["Try more problems"],
                 "motivational_message": "Keep up the great work!"
             }
+        
+        return data
+    
+    def _lesson_plan_messages(self, topic: str, unit_outline: list, student_profile: dict, session_length: int):
+        """Build the system message and prompt for a lesson plan"""
+        return self.prompts.render(
+            "generate_lesson_plan",
+            session_length=session_length,
+            topic=topic,
+            unit_outline=unit_outline,
+            grade_level=student_profile.get('grade_level', 'General'),
+            learning_style=student_profile.get('learning_style', 'mixed'),
+            pacing_pref=student_profile.get('pacing_pref', 'medium')
+        )
     
-    async def generate_lesson_plan(self, topic: str, unit_outline: list, student_profile: dict, session_length: int = 45):
+    async def generate_lesson_plan(self, topic: str, unit_outline: list, student_profile: dict, session_length: int = 45, use_cache: bool = True):
         """Generate comprehensive lesson plan"""
-        system_message = """You are an expert curriculum designer creating detailed lesson plans.
-        Include measurable objectives, engaging activities, and time estimates.
-        
-        Return ONLY valid JSON in this format:
-        {
-            "objectives": ["Objective 1", "Objective 2", "Objective 3"],
-            "activities": [
-                {
-                    "title": "Activity name",
-                    "description": "What to do",
-                    "time_minutes": 10
-                }
-            ],
-            "materials": ["Material 1", "Material 2"]
-        }"""
-        
-        chat = self._create_chat(system_message)
-        prompt = f"""Create a {session_length}-minute lesson plan for:
-        Topic: {topic}
-        Unit Outline: {', '.join(unit_outline)}
-        Student Grade: {student_profile.get('grade_level', 'General')}
-        Learning Style: {student_profile.get('learning_style', 'mixed')}
-        Pacing: {student_profile.get('pacing_pref', 'medium')}
-        
-        Generate lesson plan in JSON format."""
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        system_message, prompt = self._lesson_plan_messages(topic, unit_outline, student_profile, session_length)
+        data = await self._generate("generate_lesson_plan", system_message, prompt, use_cache=use_cache)
+        if data is None:
+            return self._lesson_plan_fallback(session_length)
         
-        try:
-            clean_response = response.strip()
-            if clean_response.startswith('```json'):
-                clean_response = clean_response[7:-3].strip()
-            elif clean_response.startswith('```'):
-                clean_response = clean_response[3:-3].strip()
-            
-            return json.loads(clean_response)
-        except json.JSONDecodeError:
-            return {
-                "objectives": ["Learn key concepts"],
-                "activities": [{"title": "Practice", "description": "Work on problems", "time_minutes": session_length}],
-                "materials": ["Notebook", "Pen"]
-            }
+        return data
+    
+    async def stream_lesson_plan(self, topic: str, unit_outline: list, student_profile: dict, session_length: int = 45, use_cache: bool = True):
+        """Stream a lesson plan as "objective", "activity" and "material" events, then ("done", plan)"""
+        system_message, prompt = self._lesson_plan_messages(topic, unit_outline, student_profile, session_length)
+        events = {"objectives": "objective", "activities": "activity", "materials": "material"}
+        async for key, value in self._stream_generate("generate_lesson_plan", system_message, prompt, list(events), use_cache=use_cache):
+            if key is None:
+                yield "done", value if value is not None else self._lesson_plan_fallback(session_length)
+            else:
+                yield events[key], value
     
-    async def generate_diagnostic_assessment(self, topic: str, num_questions: int = 5):
+    @staticmethod
+    def _lesson_plan_fallback(session_length: int):
+        return {
+            "objectives": ["Learn key concepts"],
+            "activities": [{"title": "Practice", "description": "Work on problems", "time_minutes": session_length}],
+            "materials": ["Notebook", "Pen"]
+        }
+    
+    async def generate_diagnostic_assessment(self, topic: str, num_questions: int = 5, difficulty: str = "mixed", use_cache: bool = True):
         """Generate diagnostic quiz to assess baseline mastery"""
-        system_message = """You are an expert assessment designer creating diagnostic quizzes.
-        Create varied difficulty questions to establish baseline understanding.
-        
-        Return ONLY valid JSON in this format:
-        {
-            "questions": [
-                {
-                    "question": "Question text",
-                    "options": ["A", "B", "C", "D"],
-                    "correct_answer": "A",
-                    "difficulty": "easy/medium/hard",
-                    "skill_tested": "Specific skill"
-                }
-            ]
-        }"""
-        
-        chat = self._create_chat(system_message)
-        prompt = f"""Create a {num_questions}-question diagnostic assessment for:
-        Topic: {topic}
-        
-        Include a mix of easy, medium, and hard questions.
-        Generate assessment in JSON format."""
+        system_message, prompt = self.prompts.render("generate_diagnostic_assessment", num_questions=num_questions, topic=topic, difficulty=difficulty)
         
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        
-        try:
-            clean_response = response.strip()
-            if clean_response.startswith('```json'):
-                clean_response = clean_response[7:-3].strip()
-            elif clean_response.startswith('```'):
-                clean_response = clean_response[3:-3].strip()
-            
-            return json.loads(clean_response)
-        except json.JSONDecodeError:
+        data = await self._generate("generate_diagnostic_assessment", system_message, prompt, use_cache=use_cache)
+        if data is None:
             return {
                 "questions": []
-            }
\ No newline at end of file
+            }
+        
+        return data
@@ -0,0 +1,166 @@
+import asyncio
+import copy
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from config import env_flag
+from database import SessionLocal
+from models import CachedResponse
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(text: str) -> str:
+    """Collapse whitespace so formatting differences map to the same key"""
+    return " ".join(str(text).split())
+
+
+def make_cache_key(method: str, system_message: str, prompt: str, model: str) -> str:
+    """Build a content-addressed key for one generation"""
+    parts = [_normalize(method), _normalize(system_message), _normalize(prompt), _normalize(model)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier cache for parsed LLM responses.
+
+    The first tier is an in-process LRU with a TTL and a size limit. The
+    second tier is the `cached_responses` table, shared by every worker and
+    surviving restarts.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_seconds: float = None,
+                 db_ttl_seconds: float = None, persistent: bool = None, disabled_methods=None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+        self.db_ttl_seconds = db_ttl_seconds if db_ttl_seconds is not None else float(os.getenv("LLM_CACHE_DB_TTL_SECONDS", "604800"))
+        self.persistent = persistent if persistent is not None else env_flag("LLM_CACHE_PERSISTENT", True)
+        if disabled_methods is None:
+            disabled_methods = [m.strip() for m in os.getenv("LLM_CACHE_DISABLED_METHODS", "").split(",") if m.strip()]
+        self.disabled_methods = set(disabled_methods)
+
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def enabled_for(self, method: str) -> bool:
+        """Whether results of `method` may be cached"""
+        return self.max_entries > 0 and method not in self.disabled_methods
+
+    def get(self, key: str):
+        """Return the cached value for `key`, or None on a miss"""
+        value = self._memory_get(key)
+        if value is not None:
+            return value
+        return self._db_result(key, self._db_get(key) if self.persistent else None)
+
+    async def aget(self, key: str):
+        """Like get(), with the database lookup run in a worker thread"""
+        value = self._memory_get(key)
+        if value is not None:
+            return value
+        return self._db_result(key, await asyncio.to_thread(self._db_get, key) if self.persistent else None)
+
+    def set(self, key: str, method: str, value):
+        """Store a parsed, JSON-serializable value in both tiers"""
+        value = copy.deepcopy(value)
+        self._remember(key, value)
+        if self.persistent:
+            self._db_set(key, method, value)
+
+    async def aset(self, key: str, method: str, value):
+        """Like set(), with the database write run in a worker thread"""
+        value = copy.deepcopy(value)
+        self._remember(key, value)
+        if self.persistent:
+            await asyncio.to_thread(self._db_set, key, method, value)
+
+    def clear(self):
+        """Drop the in-memory tier"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else 0.0,
+            "disabled_methods": sorted(self.disabled_methods),
+        }
+
+    def _memory_get(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+        return None
+
+    def _db_result(self, key: str, value):
+        if value is None:
+            self.misses += 1
+            return None
+        self.db_hits += 1
+        self._remember(key, value)
+        return copy.deepcopy(value)
+
+    def _remember(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _db_get(self, key: str):
+        db = SessionLocal()
+        try:
+            row = db.query(CachedResponse).filter(CachedResponse.key == key).first()
+            if row is None:
+                return None
+            if row.expires_at and row.expires_at <= datetime.utcnow():
+                db.delete(row)
+                db.commit()
+                return None
+            return row.payload
+        except Exception:
+            logger.exception("Response cache lookup failed")
+            return None
+        finally:
+            db.close()
+
+    def _db_set(self, key: str, method: str, value):
+        db = SessionLocal()
+        try:
+            db.merge(CachedResponse(
+                key=key,
+                method=method,
+                payload=value,
+                created_at=datetime.utcnow(),
+                expires_at=datetime.utcnow() + timedelta(seconds=self.db_ttl_seconds)
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Response cache write failed")
+        finally:
+            db.close()
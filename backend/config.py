@@ -0,0 +1,9 @@
+import os
+
+
+def env_flag(name: str, default: bool) -> bool:
+    """A boolean setting from the environment: 1, true, yes or on (any case) turn it on"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,378 @@
+import asyncio
+import logging
+import math
+import os
+from collections import Counter
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import env_flag
+from database import AsyncSessionLocal
+from models import DiagnosticItem
+from scheduler import llm_priority
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+# Item difficulty on the ability scale of a one-parameter (Rasch) model
+ITEM_DIFFICULTY = {"easy": -1.0, "medium": 0.0, "hard": 1.0}
+
+# Ability grid for the posterior, with a standard normal prior
+_GRID = np.linspace(-4.0, 4.0, 161)
+_PRIOR = np.exp(-0.5 * _GRID ** 2)
+
+
+def _normalize(text) -> str:
+    return " ".join(str(text or "").lower().split())
+
+
+def _difficulty(value) -> str:
+    value = _normalize(value)
+    return value if value in ITEM_DIFFICULTY else "medium"
+
+
+def _item_dict(row: DiagnosticItem, with_answer: bool = True) -> dict:
+    item = {
+        "id": row.id,
+        "question": row.question,
+        "options": row.options or [],
+        "difficulty": row.difficulty,
+        "skill_tested": row.skill
+    }
+    if with_answer:
+        item["correct_answer"] = row.correct_answer
+    return item
+
+
+def _spread(rows: list, count: int) -> list:
+    """Pick `count` rows, least served first, cycling through skills so none repeats early"""
+    by_skill = {}
+    for row in rows:
+        by_skill.setdefault(_normalize(row.skill), []).append(row)
+    queues = sorted(by_skill.values(), key=lambda queue: queue[0].served_count or 0)
+    picked = []
+    while len(picked) < count and queues:
+        for queue in list(queues):
+            if len(picked) == count:
+                break
+            picked.append(queue.pop(0))
+            if not queue:
+                queues.remove(queue)
+    return picked
+
+
+def is_correct(row: DiagnosticItem, answer) -> bool:
+    """Grade an answer given as the option text or as its letter"""
+    given, expected = _normalize(answer), _normalize(row.correct_answer)
+    if given == expected:
+        return True
+    options = [_normalize(option) for option in row.options or []]
+    letters = "abcdefgh"[:len(options)]
+    # The model answers with either the letter or the option text; accept the other form too
+    if len(expected) == 1 and expected in letters:
+        return given == options[letters.index(expected)] or given == expected
+    if len(given) == 1 and given in letters:
+        return options[letters.index(given)] == expected
+    return False
+
+
+def estimate_ability(responses: list) -> tuple:
+    """Posterior mean and standard deviation of ability from (difficulty, correct) pairs"""
+    posterior = _PRIOR.copy()
+    for difficulty, correct in responses:
+        p = 1.0 / (1.0 + np.exp(-(_GRID - ITEM_DIFFICULTY[difficulty])))
+        posterior *= p if correct else 1.0 - p
+    posterior /= posterior.sum()
+    mean = float((_GRID * posterior).sum())
+    return mean, math.sqrt(float(((_GRID - mean) ** 2 * posterior).sum()))
+
+
+class DiagnosticBank:
+    """Reusable diagnostic questions, keyed by topic, difficulty and skill.
+
+    Assessments are assembled from the `diagnostic_items` table, spread
+    over the three difficulties and rotating through skills and the least
+    served items. Only cells the bank cannot cover are generated while the
+    client waits; cells smaller than the target size are grown on a
+    background worker, so once a topic is stocked no request waits on the
+    model.
+    """
+
+    def __init__(self, ai_service, enabled: bool = None, target_per_difficulty: int = None,
+                 batch_size: int = None, target_error: float = None, min_questions: int = None):
+        self.ai_service = ai_service
+        self.enabled = enabled if enabled is not None else env_flag("DIAGNOSTIC_BANK_ENABLED", True)
+        self.target_per_difficulty = target_per_difficulty if target_per_difficulty is not None else int(os.getenv("DIAGNOSTIC_BANK_TARGET_PER_DIFFICULTY", "12"))
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv("DIAGNOSTIC_BANK_BATCH_SIZE", "6"))
+        self.target_error = target_error if target_error is not None else float(os.getenv("DIAGNOSTIC_ADAPTIVE_TARGET_ERROR", "0.65"))
+        self.min_questions = min_questions if min_questions is not None else int(os.getenv("DIAGNOSTIC_ADAPTIVE_MIN_QUESTIONS", "3"))
+
+        self._queue = None
+        self._pending = set()
+        self._task = None
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.served_from_bank = 0
+        self.generated_on_demand = 0
+        self.adaptive_questions = 0
+        self.refills = 0
+        self.refill_failures = 0
+
+    @staticmethod
+    def plan(count: int) -> dict:
+        """Questions per difficulty, as even as possible with medium and then easy getting the remainder"""
+        base, extra = divmod(count, len(DIFFICULTIES))
+        return {difficulty: base + (1 if i < extra else 0) for i, difficulty in enumerate(("medium", "easy", "hard"))}
+
+    def _cell(self, db: Session, topic: str, difficulty: str, limit: int, exclude=()) -> list:
+        query = db.query(DiagnosticItem).filter(
+            DiagnosticItem.topic_key == _normalize(topic),
+            DiagnosticItem.difficulty == difficulty
+        )
+        if exclude:
+            query = query.filter(~DiagnosticItem.id.in_(list(exclude)))
+        return query.order_by(DiagnosticItem.served_count, DiagnosticItem.created_at).limit(limit).all()
+
+    def _served(self, db: Session, rows: list):
+        if rows:
+            # Incremented in the database, so requests serving the same item at once both count
+            db.execute(
+                update(DiagnosticItem)
+                .where(DiagnosticItem.id.in_([row.id for row in rows]))
+                .values(served_count=func.coalesce(DiagnosticItem.served_count, 0) + 1)
+                .execution_options(synchronize_session=False)
+            )
+        self.served_from_bank += len(rows)
+
+    def claim(self, db: Session, topic: str, count: int) -> tuple:
+        """Take up to `count` items spread over the difficulties; returns (items, shortfall per difficulty)"""
+        items, shortfall = [], {}
+        for difficulty, wanted in self.plan(count).items():
+            if not wanted:
+                continue
+            # Over-fetch so the pick can rotate through skills and tell whether the cell needs to grow
+            candidates = self._cell(db, topic, difficulty, max(wanted * 4, self.target_per_difficulty))
+            rows = _spread(candidates, wanted)
+            self._served(db, rows)
+            items += [_item_dict(row) for row in rows]
+            if len(rows) < wanted:
+                shortfall[difficulty] = wanted - len(rows)
+            if len(candidates) < self.target_per_difficulty:
+                self.request_refill(topic, difficulty)
+        db.commit()
+        return items, shortfall
+
+    def _cell_size(self, db: Session, topic: str, difficulty: str) -> int:
+        return db.query(func.count(DiagnosticItem.id)).filter(
+            DiagnosticItem.topic_key == _normalize(topic),
+            DiagnosticItem.difficulty == difficulty
+        ).scalar()
+
+    def stock(self, db: Session, topic: str, questions: list, served: int = 0) -> list:
+        """Add generated questions to the bank, skipping ones it already holds; the first `served` count as served"""
+        key = _normalize(topic)
+        texts = [str(question.get("question") or "").strip() for question in questions]
+        known = set(db.scalars(select(DiagnosticItem.question).where(
+            DiagnosticItem.topic_key == key,
+            DiagnosticItem.question.in_(texts)
+        )))
+        rows = []
+        for question, text in zip(questions, texts):
+            if not text or text in known:
+                continue
+            known.add(text)
+            rows.append(DiagnosticItem(
+                topic=topic,
+                topic_key=key,
+                skill=str(question.get("skill_tested") or "").strip() or None,
+                difficulty=_difficulty(question.get("difficulty")),
+                question=text,
+                options=question.get("options") or [],
+                correct_answer=str(question.get("correct_answer", "")),
+                served_count=1 if len(rows) < served else 0
+            ))
+        db.add_all(rows)
+        db.flush()
+        stocked = [_item_dict(row) for row in rows]
+        db.commit()
+        return stocked
+
+    async def _generate(self, topic: str, difficulty: str, count: int) -> list:
+        data = await self.ai_service.generate_diagnostic_assessment(
+            topic=topic,
+            num_questions=count,
+            difficulty=difficulty,
+            use_cache=False
+        )
+        return data.get("questions", [])
+
+    async def assemble(self, db: AsyncSession, topic: str, count: int) -> dict:
+        """Serve a diagnostic of `count` questions, generating only the cells the bank cannot cover"""
+        items, shortfall = await db.run_sync(self.claim, topic, count)
+        self.record_request(count, len(items))
+        if shortfall:
+            generated = await asyncio.gather(*(
+                self._generate(topic, difficulty, missing) for difficulty, missing in shortfall.items()
+            ))
+            for missing, questions in zip(shortfall.values(), generated):
+                items += (await db.run_sync(self.stock, topic, questions, missing))[:missing]
+        order = {difficulty: i for i, difficulty in enumerate(DIFFICULTIES)}
+        items.sort(key=lambda item: order[item["difficulty"]])
+        return {"questions": items}
+
+    async def next_question(self, db: AsyncSession, topic: str, answers: list, max_questions: int) -> dict:
+        """Pick the most informative unasked question given the answers so far, or finish the diagnostic.
+
+        Each answer is {"item_id", "answer"} or {"item_id", "correct"}. Ability
+        is estimated with a Rasch model; the next item is taken from the
+        difficulty closest to the estimate, preferring skills asked least.
+        """
+        ids = [answer["item_id"] for answer in answers]
+        rows = {row.id: row for row in (await db.scalars(select(DiagnosticItem).where(DiagnosticItem.id.in_(ids)))).all()} if ids else {}
+        unknown = [item_id for item_id in ids if item_id not in rows]
+        if unknown:
+            raise KeyError(f"Unknown diagnostic items: {', '.join(unknown)}")
+
+        graded, skills = [], {}
+        for answer in answers:
+            row = rows[answer["item_id"]]
+            correct = answer["correct"] if answer.get("correct") is not None else is_correct(row, answer.get("answer"))
+            graded.append((row.difficulty, bool(correct)))
+            skill = skills.setdefault(row.skill or "general", {"asked": 0, "correct": 0})
+            skill["asked"] += 1
+            skill["correct"] += int(bool(correct))
+
+        ability, error = estimate_ability(graded)
+        estimate = {
+            "ability": round(ability, 3),
+            "standard_error": round(error, 3),
+            # Chance of answering a medium question correctly
+            "mastery_score": round(100 / (1 + math.exp(-ability)), 1),
+            "level": min(DIFFICULTIES, key=lambda difficulty: abs(ITEM_DIFFICULTY[difficulty] - ability)),
+            "answered": len(answers),
+            "skills": skills
+        }
+        done = len(answers) >= max_questions or (len(answers) >= self.min_questions and error <= self.target_error)
+        if done:
+            return {"done": True, "question": None, "estimate": estimate}
+
+        asked_skills = Counter(_normalize(row.skill) for row in rows.values())
+        targets = sorted(DIFFICULTIES, key=lambda difficulty: abs(ITEM_DIFFICULTY[difficulty] - ability))
+
+        def pick(session: Session):
+            for difficulty in targets:
+                candidates = self._cell(session, topic, difficulty, 20, exclude=ids)
+                if candidates:
+                    row = min(candidates, key=lambda row: asked_skills[_normalize(row.skill)])
+                    self._served(session, [row])
+                    session.commit()
+                    return row
+                self.request_refill(topic, difficulty)
+            return None
+
+        row = await db.run_sync(pick)
+        if row is not None:
+            question = _item_dict(row, with_answer=False)
+        else:
+            # Nothing left to ask at any difficulty: grow the closest cell now
+            self.generated_on_demand += self.batch_size
+            questions = await self._generate(topic, targets[0], self.batch_size)
+            stocked = await db.run_sync(self.stock, topic, questions, 1)
+            if not stocked:
+                return {"done": True, "question": None, "estimate": estimate}
+            question = {key: value for key, value in stocked[0].items() if key != "correct_answer"}
+        self.adaptive_questions += 1
+        return {"done": False, "question": question, "estimate": estimate}
+
+    def record_request(self, requested: int, from_bank: int):
+        """Count an assembly as a hit, partial hit or miss"""
+        if from_bank >= requested:
+            self.hits += 1
+        elif from_bank:
+            self.partial_hits += 1
+        else:
+            self.misses += 1
+        self.generated_on_demand += max(requested - from_bank, 0)
+
+    def request_refill(self, topic: str, difficulty: str):
+        """Queue a cell to be grown in the background unless it already is"""
+        key = (_normalize(topic), difficulty)
+        if self._queue is None or key in self._pending:
+            return
+        self._pending.add(key)
+        self._queue.put_nowait((topic, difficulty))
+
+    async def _refill(self, topic: str, difficulty: str):
+        async with AsyncSessionLocal() as db:
+            size = await db.run_sync(self._cell_size, topic, difficulty)
+            if size >= self.target_per_difficulty:
+                return
+            with llm_priority("background"):
+                questions = await self._generate(topic, difficulty, min(self.batch_size, self.target_per_difficulty - size))
+            await db.run_sync(self.stock, topic, questions)
+            self.refills += 1
+
+    async def _worker(self):
+        while True:
+            topic, difficulty = await self._queue.get()
+            try:
+                await self._refill(topic, difficulty)
+            except Exception:
+                self.refill_failures += 1
+                logger.exception("Growing the diagnostic bank for %s/%s failed", topic, difficulty)
+            finally:
+                self._pending.discard((_normalize(topic), difficulty))
+                self._queue.task_done()
+
+    def start(self):
+        """Start the background worker that grows the bank"""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        """Cancel the background worker"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._queue = None
+        self._pending.clear()
+
+    def stats(self, db: Session) -> dict:
+        rows = db.query(
+            DiagnosticItem.topic_key,
+            DiagnosticItem.difficulty,
+            func.count(DiagnosticItem.id),
+            func.count(func.distinct(DiagnosticItem.skill)),
+            func.sum(func.coalesce(DiagnosticItem.served_count, 0))
+        ).group_by(DiagnosticItem.topic_key, DiagnosticItem.difficulty).all()
+
+        requests = self.hits + self.partial_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "cells": {
+                f"{topic}|{difficulty}": {"items": items, "skills": skills, "times_served": int(served or 0)}
+                for topic, difficulty, items, skills, served in rows
+            },
+            "requests": requests,
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+            "served_from_bank": self.served_from_bank,
+            "generated_on_demand": self.generated_on_demand,
+            "adaptive_questions": self.adaptive_questions,
+            "refills": self.refills,
+            "refill_failures": self.refill_failures,
+            "pending_refills": len(self._pending),
+            "target_per_difficulty": self.target_per_difficulty,
+            "batch_size": self.batch_size
+        }
@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import os
+from collections import namedtuple
+
+from dotenv import load_dotenv
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import AsyncSessionLocal
+from models import PracticeProblem, ProblemDelivery
+from scheduler import llm_priority
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class Bucket(namedtuple("Bucket", ["topic", "difficulty", "grade_level", "learning_style"])):
+    """Inventory bucket of interchangeable practice problems"""
+
+    @property
+    def key(self) -> str:
+        return "|".join(" ".join(str(part or "").lower().split()) for part in self)
+
+    @property
+    def student_profile(self) -> dict:
+        return {"grade_level": self.grade_level, "learning_style": self.learning_style}
+
+
+def _parse_prewarm(value: str) -> list:
+    """Parse "Algebra:medium,Fractions:easy" into buckets with the default profile"""
+    buckets = []
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        topic, _, difficulty = entry.partition(":")
+        buckets.append(Bucket(topic.strip(), difficulty.strip() or "medium", "General", "mixed"))
+    return buckets
+
+
+def _problem_dict(row: PracticeProblem) -> dict:
+    return {
+        "id": row.id,
+        "prompt": row.prompt_text,
+        "difficulty": row.difficulty,
+        "context": row.context
+    }
+
+
+class ProblemInventory:
+    """Stock of pre-generated practice problems, topped up in the background.
+
+    Problems live in the `practice_problems` table, grouped by bucket. A
+    student is never served the same stocked problem twice; deliveries are
+    recorded in `problem_deliveries`. When a student's unseen stock in a
+    bucket drops below the low-water mark, the bucket is queued for a
+    refill that runs on the background workers.
+    """
+
+    def __init__(self, ai_service, low_water: int = None, batch_size: int = None,
+                 max_bucket_size: int = None, workers: int = None, prewarm=None):
+        self.ai_service = ai_service
+        self.low_water = low_water if low_water is not None else int(os.getenv("PROBLEM_INVENTORY_LOW_WATER", "5"))
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv("PROBLEM_INVENTORY_BATCH_SIZE", "10"))
+        self.max_bucket_size = max_bucket_size if max_bucket_size is not None else int(os.getenv("PROBLEM_INVENTORY_MAX_BUCKET", "200"))
+        self.workers = workers if workers is not None else int(os.getenv("PROBLEM_INVENTORY_WORKERS", "1"))
+        self.prewarm_buckets = prewarm if prewarm is not None else _parse_prewarm(os.getenv("PROBLEM_INVENTORY_PREWARM", ""))
+
+        self._queue = None
+        self._pending = set()
+        self._tasks = []
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.served_from_stock = 0
+        self.generated_on_demand = 0
+        self.refills = 0
+        self.refill_failures = 0
+
+    def claim(self, db: Session, bucket: Bucket, count: int, student_id: str = None) -> list:
+        """Take up to `count` stocked problems the student has not seen yet"""
+        query = db.query(PracticeProblem).filter(PracticeProblem.inventory_key == bucket.key)
+        if student_id:
+            seen = select(ProblemDelivery.problem_id).where(ProblemDelivery.student_id == student_id)
+            query = query.filter(~PracticeProblem.id.in_(seen))
+        available = query.count()
+        # Concurrent claims skip rows another transaction holds; SQLite has no FOR UPDATE and serializes writers anyway
+        rows = (
+            query.order_by(PracticeProblem.served_count, PracticeProblem.created_at)
+            .limit(count)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+
+        if rows:
+            # Incremented in the database, so claims racing on the same row both count
+            db.execute(
+                update(PracticeProblem)
+                .where(PracticeProblem.id.in_([row.id for row in rows]))
+                .values(served_count=func.coalesce(PracticeProblem.served_count, 0) + 1)
+                .execution_options(synchronize_session=False)
+            )
+        if student_id:
+            db.add_all([ProblemDelivery(problem_id=row.id, student_id=student_id) for row in rows])
+        problems = [_problem_dict(row) for row in rows]
+        db.commit()
+
+        if available - len(rows) < self.low_water:
+            self.request_refill(bucket)
+        self.served_from_stock += len(rows)
+        return problems
+
+    def stock(self, db: Session, bucket: Bucket, problems: list, student_id: str = None, served: bool = False) -> list:
+        """Add generated problems to a bucket, marking them served when they go straight to a client"""
+        rows = [
+            PracticeProblem(
+                topic=bucket.topic,
+                prompt_text=problem.get("prompt", ""),
+                context=problem.get("context"),
+                difficulty=problem.get("difficulty") or bucket.difficulty,
+                inventory_key=bucket.key,
+                grade_level=bucket.grade_level,
+                learning_style=bucket.learning_style,
+                served_count=1 if served else 0
+            )
+            for problem in problems
+        ]
+        db.add_all(rows)
+        db.flush()
+        if student_id:
+            db.add_all([ProblemDelivery(problem_id=row.id, student_id=student_id) for row in rows])
+        stocked = [_problem_dict(row) for row in rows]
+        db.commit()
+        return stocked
+
+    async def take(self, db: AsyncSession, bucket: Bucket, count: int, student_id: str = None) -> list:
+        """Serve `count` problems, generating only what the stock cannot cover"""
+        problems = await db.run_sync(self.claim, bucket, count, student_id)
+        self.record_request(count, len(problems))
+        shortfall = count - len(problems)
+        if shortfall <= 0:
+            return problems
+
+        generated = await self.ai_service.generate_practice_problems(
+            topic=bucket.topic,
+            difficulty=bucket.difficulty,
+            count=shortfall,
+            student_profile=bucket.student_profile,
+            use_cache=False
+        )
+        # Anything beyond the shortfall goes straight into stock
+        await db.run_sync(self.stock, bucket, generated[shortfall:])
+        return problems + await db.run_sync(self.stock, bucket, generated[:shortfall], student_id, True)
+
+    def record_request(self, requested: int, from_stock: int):
+        """Count a request as a hit, partial hit or miss"""
+        if from_stock >= requested:
+            self.hits += 1
+        elif from_stock:
+            self.partial_hits += 1
+        else:
+            self.misses += 1
+        self.generated_on_demand += max(requested - from_stock, 0)
+
+    def request_refill(self, bucket: Bucket):
+        """Queue a bucket for a background refill unless one is already pending"""
+        if self._queue is None or bucket.key in self._pending:
+            return
+        self._pending.add(bucket.key)
+        self._queue.put_nowait(bucket)
+
+    async def _refill(self, bucket: Bucket):
+        async with AsyncSessionLocal() as db:
+            size = await db.scalar(select(func.count(PracticeProblem.id)).where(PracticeProblem.inventory_key == bucket.key))
+            if size >= self.max_bucket_size:
+                return
+            with llm_priority("background"):
+                problems = await self.ai_service.generate_practice_problems(
+                    topic=bucket.topic,
+                    difficulty=bucket.difficulty,
+                    count=min(self.batch_size, self.max_bucket_size - size),
+                    student_profile=bucket.student_profile,
+                    use_cache=False
+                )
+            await db.run_sync(self.stock, bucket, problems)
+            self.refills += 1
+
+    async def _worker(self):
+        while True:
+            bucket = await self._queue.get()
+            try:
+                await self._refill(bucket)
+            except Exception:
+                self.refill_failures += 1
+                logger.exception("Refill of problem bucket %s failed", bucket.key)
+            finally:
+                self._pending.discard(bucket.key)
+                self._queue.task_done()
+
+    async def _prewarm(self):
+        try:
+            async with AsyncSessionLocal() as db:
+                for bucket in self.prewarm_buckets:
+                    fresh = await db.scalar(select(func.count(PracticeProblem.id)).where(
+                        PracticeProblem.inventory_key == bucket.key,
+                        PracticeProblem.served_count == 0
+                    ))
+                    if fresh < self.low_water:
+                        self.request_refill(bucket)
+        except Exception:
+            logger.exception("Pre-warming the problem inventory failed")
+
+    def start(self):
+        """Start the refill workers and queue the pre-warm buckets"""
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.prewarm_buckets:
+            self._tasks.append(asyncio.create_task(self._prewarm()))
+
+    async def stop(self):
+        """Cancel the refill workers"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._pending.clear()
+
+    def stats(self, db: Session) -> dict:
+        rows = db.query(
+            PracticeProblem.inventory_key,
+            func.count(PracticeProblem.id),
+            func.sum(func.coalesce(PracticeProblem.served_count, 0))
+        ).filter(PracticeProblem.inventory_key.isnot(None)).group_by(PracticeProblem.inventory_key).all()
+        fresh = dict(db.query(PracticeProblem.inventory_key, func.count(PracticeProblem.id)).filter(
+            PracticeProblem.inventory_key.isnot(None),
+            PracticeProblem.served_count == 0
+        ).group_by(PracticeProblem.inventory_key).all())
+
+        requests = self.hits + self.partial_hits + self.misses
+        return {
+            "buckets": {
+                key: {"stock": total, "unserved": fresh.get(key, 0), "times_served": int(served or 0)}
+                for key, total, served in rows
+            },
+            "requests": requests,
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+            "served_from_stock": self.served_from_stock,
+            "generated_on_demand": self.generated_on_demand,
+            "refills": self.refills,
+            "refill_failures": self.refill_failures,
+            "pending_refills": len(self._pending),
+            "low_water": self.low_water,
+            "batch_size": self.batch_size,
+            "max_bucket_size": self.max_bucket_size
+        }
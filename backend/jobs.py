@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy import and_, or_, select, update
+
+from database import AsyncSessionLocal
+from metrics import JOB_OUTCOMES, JOB_SECONDS
+from models import Job
+from resilience import track_degraded
+from token_usage import set_endpoint
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("succeeded", "failed")
+
+# A claimed job's lease outlives its timeout by this much before another worker may take it over
+LEASE_MARGIN_SECONDS = 30
+
+
+class JobFailed(Exception):
+    """Raised by a job handler for errors that a retry cannot fix"""
+
+
+class JobQueue:
+    """Durable queue of long generations, run by a pool of local workers.
+
+    Jobs are rows in the `jobs` table, so they survive restarts and any
+    server process can run them. A worker claims a job with a conditional
+    UPDATE and holds it for a lease of `timeout` seconds plus a margin; a
+    job whose lease ran out because its worker died is claimed again.
+    Failed attempts are retried with exponential backoff up to
+    `max_attempts`, and so are attempts that could only produce
+    placeholder content; the last attempt keeps it, flagged as degraded in
+    the result. A job interrupted by shutdown goes back to the queue
+    without using up an attempt.
+    """
+
+    def __init__(self, workers: int = None, max_attempts: int = None, timeout: float = None,
+                 retry_backoff: float = None, poll_interval: float = None):
+        self.workers = workers if workers is not None else int(os.getenv("JOB_WORKERS", "2"))
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.timeout = timeout if timeout is not None else float(os.getenv("JOB_TIMEOUT_SECONDS", "300"))
+        self.retry_backoff = retry_backoff if retry_backoff is not None else float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "2"))
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv("JOB_POLL_SECONDS", "1"))
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        self._handlers = {}
+        self._tasks = []
+        self._wakeup = None
+        self._finished = None
+        self.running = 0
+
+    def register(self, kind: str, handler):
+        """Run jobs of `kind` with `await handler(db, job)`, which returns the job's result.
+
+        Rows the handler changes in `db` are committed together with the result.
+        """
+        self._handlers[kind] = handler
+
+    async def submit(self, db, kind: str, payload: dict, session_id: str = None) -> Job:
+        """Queue a job and commit it, along with anything else pending in `db`"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        job = Job(kind=kind, status="queued", payload=payload, session_id=session_id,
+                  attempts=0, max_attempts=self.max_attempts, run_after=datetime.utcnow())
+        db.add(job)
+        await db.commit()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str):
+        async with AsyncSessionLocal() as db:
+            return await db.get(Job, job_id)
+
+    async def wait(self, job_id: str, timeout: float):
+        """The job, returned once it has finished or after `timeout` seconds, whichever comes first"""
+        deadline = time.monotonic() + timeout
+        while True:
+            # A fresh session per check, so no connection is held while waiting
+            job = await self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.status in FINISHED or remaining <= 0:
+                return job
+            # Jobs finishing in this process wake the waiters at once; other processes' jobs are seen on the next poll
+            delay = min(remaining, self.poll_interval)
+            if self._finished is None:
+                await asyncio.sleep(delay)
+                continue
+            async with self._finished:
+                try:
+                    await asyncio.wait_for(self._finished.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _claimable(self, now: datetime):
+        return and_(Job.kind.in_(list(self._handlers)), or_(
+            and_(Job.status == "queued", Job.run_after <= now),
+            and_(Job.status == "running", Job.lease_expires_at < now)
+        ))
+
+    async def _claim(self):
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            candidates = (await db.scalars(
+                select(Job.id).where(self._claimable(now)).order_by(Job.created_at).limit(self.workers + 1)
+            )).all()
+            # End the read before writing; SQLite cannot upgrade a read transaction while other writers wait
+            await db.commit()
+            for job_id in candidates:
+                claimed = await db.execute(
+                    update(Job).where(Job.id == job_id, self._claimable(now)).values(
+                        status="running",
+                        worker_id=self.worker_id,
+                        attempts=Job.attempts + 1,
+                        started_at=now,
+                        lease_expires_at=now + timedelta(seconds=self.timeout + LEASE_MARGIN_SECONDS)
+                    ).execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                if claimed.rowcount == 1:
+                    return job_id
+        return None
+
+    async def _finish(self, job_id: str, **values):
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(**values).execution_options(synchronize_session=False))
+            await db.commit()
+
+    async def _run(self, job_id: str):
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            job = await db.get(Job, job_id)
+            kind, attempts, max_attempts = job.kind, job.attempts, job.max_attempts
+            set_endpoint(f"job {kind}")
+            try:
+                if attempts > max_attempts:
+                    raise JobFailed("Job was interrupted too many times")
+                reasons = track_degraded()
+                result = await asyncio.wait_for(self._handlers[kind](db, job), self.timeout)
+                if reasons:
+                    if attempts < max_attempts:
+                        raise RuntimeError(f"Model unavailable for {', '.join(sorted(reasons))}")
+                    if isinstance(result, dict):
+                        result = {**result, "degraded": sorted(reasons)}
+                job.status = "succeeded"
+                job.result = result
+                job.error = None
+                job.finished_at = datetime.utcnow()
+                job.lease_expires_at = None
+                await db.commit()
+                JOB_OUTCOMES.inc(kind, "succeeded")
+            except asyncio.CancelledError:
+                # Shutting down: hand the job back for another worker or the next start
+                await asyncio.shield(db.rollback())
+                await asyncio.shield(self._finish(job_id, status="queued", attempts=attempts - 1, lease_expires_at=None))
+                JOB_OUTCOMES.inc(kind, "released")
+                raise
+            except Exception as e:
+                await db.rollback()
+                error = str(e) or type(e).__name__
+                if isinstance(e, JobFailed) or attempts >= max_attempts:
+                    logger.exception("Job %s (%s) failed", job_id, kind)
+                    await self._finish(job_id, status="failed", error=error, finished_at=datetime.utcnow(), lease_expires_at=None)
+                    JOB_OUTCOMES.inc(kind, "failed")
+                else:
+                    logger.warning("Job %s (%s) attempt %d failed, retrying: %s", job_id, kind, attempts, error)
+                    delay = self.retry_backoff * 2 ** (attempts - 1)
+                    await self._finish(job_id, status="queued", error=error, lease_expires_at=None,
+                                       run_after=datetime.utcnow() + timedelta(seconds=delay))
+                    JOB_OUTCOMES.inc(kind, "retried")
+                    if self._wakeup is not None:
+                        asyncio.get_running_loop().call_later(delay, self._wakeup.set)
+            finally:
+                JOB_SECONDS.observe(time.perf_counter() - started, kind)
+        async with self._finished:
+            self._finished.notify_all()
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                job_id = await self._claim()
+            except Exception:
+                logger.exception("Claiming a job failed")
+                job_id = None
+            if job_id is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.running += 1
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("Running job %s failed", job_id)
+            finally:
+                self.running -= 1
+
+    def start(self):
+        """Start the job workers; jobs queued before a restart are picked up too"""
+        self._wakeup = asyncio.Event()
+        self._finished = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the job workers, returning their running jobs to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
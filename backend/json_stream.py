@@ -0,0 +1,91 @@
+import json
+
+
+class JsonArrayStream:
+    """Incremental parser that yields array items of a JSON object as they complete.
+
+    Feed it model output chunk by chunk. Every element of a top-level array
+    named in `keys` is returned from `feed` as soon as its closing token has
+    arrived, so callers can forward it before the rest of the document has
+    been generated. Text before the first `{` (markdown fences, prose) is
+    skipped.
+    """
+
+    def __init__(self, keys):
+        self.keys = set(keys)
+        self.text = ""
+        self._pos = 0
+        self._stack = []  # frames: {"kind": "{" or "[", "key": str, "expect_key": bool}
+        self._started = False
+        self._finished = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._item_start = None
+
+    def _in_target_array(self) -> bool:
+        return (
+            len(self._stack) == 2
+            and self._stack[1]["kind"] == "["
+            and self._stack[0]["key"] in self.keys
+        )
+
+    def feed(self, chunk: str) -> list:
+        """Consume a chunk and return the (key, item) pairs it completed"""
+        self.text += chunk
+        items = []
+        text = self.text
+        i = self._pos
+        while i < len(text) and not self._finished:
+            ch = text[i]
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._stack.append({"kind": "{", "key": None, "expect_key": True})
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    top = self._stack[-1]
+                    if top["kind"] == "{" and top["expect_key"]:
+                        top["key"] = json.loads(text[self._string_start:i + 1])
+                i += 1
+                continue
+
+            if self._in_target_array() and self._item_start is None and not ch.isspace() and ch not in ",]":
+                self._item_start = i
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                self._stack.append({"kind": ch, "key": None, "expect_key": ch == "{"})
+            elif ch == ":":
+                self._stack[-1]["expect_key"] = False
+            elif ch in ",]":
+                if self._in_target_array() and self._item_start is not None:
+                    raw = text[self._item_start:i]
+                    self._item_start = None
+                    try:
+                        items.append((self._stack[0]["key"], json.loads(raw)))
+                    except json.JSONDecodeError:
+                        pass
+                if ch == "]":
+                    self._stack.pop()
+                elif self._stack[-1]["kind"] == "{":
+                    self._stack[-1]["expect_key"] = True
+            elif ch == "}":
+                self._stack.pop()
+                if not self._stack:
+                    self._finished = True
+            i += 1
+
+        self._pos = i
+        return items
@@ -0,0 +1,225 @@
+import os
+import uuid
+from datetime import datetime
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from metrics import ATTEMPT_EVENTS
+from models import AttemptEvent, SkillState
+
+load_dotenv()
+
+# Bayesian Knowledge Tracing parameters, shared by every skill
+P_INIT = float(os.getenv("BKT_P_INIT", "0.2"))
+P_LEARN = float(os.getenv("BKT_P_LEARN", "0.15"))
+P_SLIP = float(os.getenv("BKT_P_SLIP", "0.1"))
+P_GUESS = float(os.getenv("BKT_P_GUESS", "0.2"))
+# Each hint makes a correct answer weaker evidence of mastery, as if it were more likely a guess
+HINT_GUESS = float(os.getenv("BKT_HINT_GUESS", "0.1"))
+MAX_GUESS = 0.5
+
+
+def bkt_step(p, correct, hints):
+    """One knowledge-tracing update; works on scalars and on arrays of independent skills"""
+    guess = np.minimum(P_GUESS + HINT_GUESS * hints, MAX_GUESS)
+    evidence_mastered = np.where(correct, 1 - P_SLIP, P_SLIP)
+    evidence_unmastered = np.where(correct, guess, 1 - guess)
+    posterior = p * evidence_mastered / (p * evidence_mastered + (1 - p) * evidence_unmastered)
+    return posterior + (1 - posterior) * P_LEARN
+
+
+def trace(correct: np.ndarray, hints: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Final mastery of many attempt sequences at once.
+
+    `correct` and `hints` are (sequences, steps) arrays padded past each
+    sequence's length. The recurrence runs once per step, each step
+    vectorized over every sequence.
+    """
+    p = np.full(len(lengths), P_INIT)
+    for step in range(correct.shape[1] if correct.size else 0):
+        active = step < lengths
+        p = np.where(active, bkt_step(p, correct[:, step], hints[:, step]), p)
+    return p
+
+
+def _state_key(row) -> tuple:
+    return row["student_id"], row["topic"], row["skill"]
+
+
+def _load(db: Session, keys: set) -> dict:
+    rows = db.query(SkillState).filter(
+        SkillState.student_id.in_({key[0] for key in keys}),
+        SkillState.topic.in_({key[1] for key in keys}),
+        SkillState.skill.in_({key[2] for key in keys})
+    ).all()
+    return {(row.student_id, row.topic, row.skill): row for row in rows if (row.student_id, row.topic, row.skill) in keys}
+
+
+def _state(db: Session, states: dict, key: tuple) -> SkillState:
+    state = states.get(key)
+    if state is None:
+        state = SkillState(student_id=key[0], topic=key[1], skill=key[2], p_mastery=P_INIT,
+                           attempt_count=0, correct_count=0, hint_count=0)
+        db.add(state)
+        states[key] = state
+    return state
+
+
+def _apply(db: Session, events: list, states: dict) -> set:
+    """Fold events into their states in O(1) each; returns the keys that got an event older than their state"""
+    late = set()
+    for event in sorted(events, key=lambda event: event["occurred_at"]):
+        key = _state_key(event)
+        state = _state(db, states, key)
+        if state.last_event_at is not None and event["occurred_at"] < state.last_event_at:
+            late.add(key)
+        else:
+            state.p_mastery = float(bkt_step(state.p_mastery, event["correct"], event["hints_used"]))
+            state.last_event_at = event["occurred_at"]
+        state.attempt_count = (state.attempt_count or 0) + 1
+        state.correct_count = (state.correct_count or 0) + int(event["correct"])
+        state.hint_count = (state.hint_count or 0) + event["hints_used"]
+        state.last_updated = datetime.utcnow()
+    return late
+
+
+def _existing_keys(db: Session, pairs: set) -> dict:
+    if not pairs:
+        return {}
+    rows = db.execute(select(AttemptEvent.student_id, AttemptEvent.idempotency_key, AttemptEvent.id).where(
+        AttemptEvent.student_id.in_({student_id for student_id, _ in pairs}),
+        AttemptEvent.idempotency_key.in_({key for _, key in pairs})
+    )).all()
+    return {(student_id, key): event_id for student_id, key, event_id in rows if (student_id, key) in pairs}
+
+
+def record_attempts(db: Session, events: list) -> list:
+    """Store attempt events and fold them into the students' skill states.
+
+    Events are dicts with student_id, topic, skill, correct, hints_used,
+    occurred_at and optionally problem_id, time_seconds and
+    idempotency_key. An event whose idempotency key the student already
+    used is acknowledged with the stored event's id and not applied again.
+    New events are written with one multi-row INSERT. Runs in the caller's
+    transaction; the caller commits. If a concurrent request stores the
+    same key first the INSERT raises IntegrityError, and the caller should
+    roll back and call again.
+
+    Returns one result per event, in order.
+    """
+    pairs = {(event["student_id"], event["idempotency_key"]) for event in events if event.get("idempotency_key")}
+    stored = _existing_keys(db, pairs)
+
+    now = datetime.utcnow()
+    rows, event_ids, duplicates = [], [], []
+    for event in events:
+        pair = (event["student_id"], event.get("idempotency_key"))
+        if pair[1] and pair in stored:
+            event_ids.append(stored[pair])
+            duplicates.append(True)
+            continue
+        row = {**event, "id": str(uuid.uuid4()), "received_at": now}
+        if pair[1]:
+            stored[pair] = row["id"]
+        rows.append(row)
+        event_ids.append(row["id"])
+        duplicates.append(False)
+
+    if rows:
+        db.execute(insert(AttemptEvent), rows)
+
+        keys = {_state_key(row) for row in rows}
+        try:
+            with db.begin_nested():
+                late = _apply(db, rows, _load(db, keys))
+        except IntegrityError:
+            # A concurrent request created one of the states first; fold into the stored row
+            late = _apply(db, rows, _load(db, keys))
+        db.flush()
+        if late:
+            # Events that arrive out of order are replayed with the skill's full history
+            _retrace(db, late)
+
+    ATTEMPT_EVENTS.inc("accepted", amount=len(rows))
+    ATTEMPT_EVENTS.inc("duplicate", amount=sum(duplicates))
+    states = _load(db, {_state_key(event) for event in events})
+    return [
+        {
+            "event_id": event_id,
+            "duplicate": duplicate,
+            "student_id": event["student_id"],
+            "topic": event["topic"],
+            "skill": event["skill"],
+            "mastery_score": round(states[_state_key(event)].p_mastery * 100, 2) if _state_key(event) in states else None
+        }
+        for event, event_id, duplicate in zip(events, event_ids, duplicates)
+    ]
+
+
+def _rebuild(db: Session, history: list, states: dict) -> int:
+    """Recompute states from full histories of (student_id, topic, skill, correct, hints_used, occurred_at) in time order"""
+    if not history:
+        return 0
+    index = {}
+    codes = np.fromiter((index.setdefault(tuple(row[:3]), len(index)) for row in history), dtype=np.int64, count=len(history))
+    correct = np.fromiter((bool(row[3]) for row in history), dtype=bool, count=len(history))
+    hints = np.fromiter((row[4] or 0 for row in history), dtype=np.float64, count=len(history))
+
+    # Lay each skill's attempts out on one row of a padded matrix, keeping time order
+    order = np.argsort(codes, kind="stable")
+    lengths = np.bincount(codes, minlength=len(index))
+    starts = np.cumsum(lengths) - lengths
+    positions = np.arange(len(history)) - np.repeat(starts, lengths)
+    correct_matrix = np.zeros((len(index), lengths.max()), dtype=bool)
+    hint_matrix = np.zeros((len(index), lengths.max()))
+    correct_matrix[codes[order], positions] = correct[order]
+    hint_matrix[codes[order], positions] = hints[order]
+
+    mastery = trace(correct_matrix, hint_matrix, lengths)
+    correct_counts = np.bincount(codes, weights=correct, minlength=len(index))
+    hint_counts = np.bincount(codes, weights=hints, minlength=len(index))
+    last = order[starts + lengths - 1]
+
+    now = datetime.utcnow()
+    for key, code in index.items():
+        state = _state(db, states, key)
+        state.p_mastery = float(mastery[code])
+        state.attempt_count = int(lengths[code])
+        state.correct_count = int(correct_counts[code])
+        state.hint_count = int(hint_counts[code])
+        state.last_event_at = history[last[code]][5]
+        state.last_updated = now
+    return len(index)
+
+
+def _history_query(*filters):
+    return select(
+        AttemptEvent.student_id, AttemptEvent.topic, AttemptEvent.skill,
+        AttemptEvent.correct, AttemptEvent.hints_used, AttemptEvent.occurred_at
+    ).where(*filters).order_by(AttemptEvent.occurred_at, AttemptEvent.received_at, AttemptEvent.id)
+
+
+def _retrace(db: Session, keys: set):
+    history = db.execute(_history_query(
+        AttemptEvent.student_id.in_({key[0] for key in keys}),
+        AttemptEvent.topic.in_({key[1] for key in keys}),
+        AttemptEvent.skill.in_({key[2] for key in keys})
+    )).all()
+    _rebuild(db, [row for row in history if tuple(row[:3]) in keys], _load(db, keys))
+
+
+def recompute_skill_states(db: Session, student_id: str = None) -> dict:
+    """Rebuild skill states from the stored event history, e.g. after changing the tracing parameters"""
+    filters = [AttemptEvent.student_id == student_id] if student_id else []
+    history = db.execute(_history_query(*filters)).all()
+    query = db.query(SkillState)
+    if student_id:
+        query = query.filter(SkillState.student_id == student_id)
+    states = {(row.student_id, row.topic, row.skill): row for row in query.all()}
+    rebuilt = _rebuild(db, history, states)
+    db.commit()
+    return {"events": len(history), "skills": rebuilt}
@@ -0,0 +1,265 @@
+import json
+import re
+from collections import Counter, namedtuple
+
+from dotenv import load_dotenv
+
+from config import env_flag
+from json_stream import JsonArrayStream
+from metrics import LLM_PARSE_OUTCOMES
+
+load_dotenv()
+
+# Required top-level fields per generator method, and the item rules for its arrays.
+# An array rule is either `str` (scalar items) or a tuple of keys every item must have.
+SCHEMAS = {
+    "generate_hints": {
+        "fields": {"hint1": str, "hint2": str, "hint3": str},
+    },
+    "generate_solution": {
+        "fields": {"steps": list, "answer": (str, int, float)},
+        "arrays": {"steps": str},
+    },
+    "generate_practice_problems": {
+        "fields": {"problems": list},
+        "arrays": {"problems": ("prompt",)},
+    },
+    "generate_progress_summary": {
+        "fields": {"strengths": list, "target_areas": list, "recommendations": list},
+        "arrays": {"strengths": str, "target_areas": str, "recommendations": str},
+    },
+    "generate_lesson_plan": {
+        "fields": {"objectives": list, "activities": list},
+        "arrays": {"objectives": str, "activities": ("title",), "materials": str},
+    },
+    "generate_diagnostic_assessment": {
+        "fields": {"questions": list},
+        "arrays": {"questions": ("question", "options", "correct_answer")},
+    },
+}
+
+OUTCOMES = ("ok", "repaired", "salvaged", "failed")
+
+# Earlier cut points tried when repairing a truncated response
+MAX_TRUNCATION_CUTS = 50
+
+ParseResult = namedtuple("ParseResult", ["data", "outcome", "error"])
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.S)
+
+
+def _scan(text: str):
+    """Return the closers needed to balance `text`, whether it ends inside a
+    string, and the positions of commas outside strings"""
+    closers, commas = [], []
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if closers:
+                closers.pop()
+        elif ch == ",":
+            commas.append(i)
+    return closers, in_string, commas
+
+
+def strip_trailing_commas(text: str) -> str:
+    """Drop commas directly before a closing brace or bracket"""
+    out = []
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == ",":
+            rest = text[i + 1:].lstrip()
+            if rest[:1] in ("}", "]"):
+                continue
+        out.append(ch)
+    return "".join(out)
+
+
+def close_truncated(text: str):
+    """Parse a document that was cut off, dropping the incomplete tail.
+
+    Tries the text as is, then cut back to each earlier comma, closing any
+    open objects and arrays. A value cut off inside a string is dropped
+    rather than closed, so a half-written problem statement never survives.
+    Returns (data, lost), where lost says whether content had to be cut.
+    """
+    _, _, commas = _scan(text)
+    candidates = [len(text)] + list(reversed(commas))[:MAX_TRUNCATION_CUTS]
+    for end in candidates:
+        candidate = text[:end]
+        closers, in_string, _ = _scan(candidate)
+        if in_string:
+            continue
+        candidate = candidate.rstrip().rstrip(",:").rstrip()
+        try:
+            return json.loads(candidate + "".join(reversed(closers))), end < len(text)
+        except json.JSONDecodeError:
+            continue
+    return None, False
+
+
+def extract_json(text: str):
+    """Find the JSON object in a reply wrapped in fences or prose.
+
+    Returns (data, remainder): the parsed object if one parsed cleanly,
+    otherwise None and the text from the first `{` on for repair.
+    """
+    fenced = _FENCE.search(text)
+    if fenced and "{" in fenced.group(1):
+        text = fenced.group(1)
+    start = text.find("{")
+    if start < 0:
+        return None, ""
+    try:
+        data, _ = json.JSONDecoder().raw_decode(text, start)
+        return data, text[start:]
+    except json.JSONDecodeError:
+        return None, text[start:].rstrip().rstrip("`").rstrip()
+
+
+def validate(method: str, data):
+    """Check `data` against the method's schema, dropping malformed array items.
+
+    Returns (data, dropped_items, error); error is None when data is usable.
+    """
+    if not isinstance(data, dict):
+        return None, 0, "response is not a JSON object"
+    schema = SCHEMAS.get(method)
+    if schema is None:
+        return data, 0, None
+
+    dropped = 0
+    for key, rule in schema.get("arrays", {}).items():
+        items = data.get(key)
+        if not isinstance(items, list):
+            continue
+        if rule is str:
+            kept = [item for item in items if isinstance(item, (str, int, float)) and not isinstance(item, bool)]
+        else:
+            kept = [item for item in items if isinstance(item, dict) and all(item.get(k) not in (None, "") for k in rule)]
+        dropped += len(items) - len(kept)
+        data[key] = kept
+
+    for field, types in schema["fields"].items():
+        value = data.get(field)
+        if not isinstance(value, types) or isinstance(value, bool):
+            return None, dropped, f"'{field}' is missing or has the wrong type"
+        if isinstance(value, list) and not value:
+            return None, dropped, f"'{field}' has no usable items"
+    return data, dropped, None
+
+
+class ResponseParser:
+    """Turns raw model replies into validated payloads and counts the outcomes.
+
+    Stages: extract the object from fences and prose, repair trailing commas
+    and truncation, validate against the method's schema, and finally
+    salvage the complete items of the method's arrays. A reply is "ok" if it
+    parsed and validated untouched, "repaired" if it needed fixing or lost
+    malformed items, "salvaged" if part of the document had to be cut off,
+    and "failed" otherwise.
+    """
+
+    def __init__(self, reask: bool = None):
+        self.reask = reask if reask is not None else env_flag("LLM_JSON_REASK", True)
+        self.outcomes = {outcome: Counter() for outcome in OUTCOMES}
+        self.reasks = Counter()
+        self.reask_successes = Counter()
+
+    def parse(self, method: str, text: str) -> ParseResult:
+        result = self._parse(method, text or "")
+        self.outcomes[result.outcome][method] += 1
+        LLM_PARSE_OUTCOMES.inc(method, result.outcome)
+        return result
+
+    def _parse(self, method: str, text: str) -> ParseResult:
+        data, remainder = extract_json(text)
+        repaired = lost = False
+        if data is None and remainder:
+            cleaned = strip_trailing_commas(remainder)
+            try:
+                data, _ = json.JSONDecoder().raw_decode(cleaned)
+            except json.JSONDecodeError:
+                data, lost = close_truncated(cleaned)
+            repaired = data is not None
+
+        error = "no JSON object found" if not remainder else "response is not valid JSON"
+        if data is not None:
+            data, dropped, error = validate(method, data)
+            if data is not None:
+                if lost:
+                    return ParseResult(data, "salvaged", None)
+                return ParseResult(data, "repaired" if repaired or dropped else "ok", None)
+
+        salvaged = self._salvage(method, text)
+        if salvaged is not None:
+            return ParseResult(salvaged, "salvaged", None)
+        return ParseResult(None, "failed", error)
+
+    @staticmethod
+    def _salvage(method: str, text: str):
+        """Keep the complete items of the method's arrays from a broken reply"""
+        arrays = SCHEMAS.get(method, {}).get("arrays")
+        if not arrays:
+            return None
+        data = {}
+        for key, item in JsonArrayStream(list(arrays)).feed(text):
+            data.setdefault(key, []).append(item)
+        data, _, error = validate(method, data)
+        return data if error is None else None
+
+    def record_reask(self, method: str, succeeded: bool):
+        self.reasks[method] += 1
+        if succeeded:
+            self.reask_successes[method] += 1
+
+    @staticmethod
+    def reask_prompt(error: str) -> str:
+        return (
+            f"Your previous reply could not be used: {error}. "
+            "Reply again with only the complete JSON object in the format requested, "
+            "with no markdown fences or commentary."
+        )
+
+    def stats(self) -> dict:
+        totals = {outcome: sum(counts.values()) for outcome, counts in self.outcomes.items()}
+        parsed = sum(totals.values())
+        methods = sorted({method for counts in self.outcomes.values() for method in counts})
+        return {
+            **totals,
+            "total": parsed,
+            "failure_rate": round(totals["failed"] / parsed, 4) if parsed else 0.0,
+            "salvage_rate": round(totals["salvaged"] / parsed, 4) if parsed else 0.0,
+            "repair_rate": round(totals["repaired"] / parsed, 4) if parsed else 0.0,
+            "reasks": sum(self.reasks.values()),
+            "reask_successes": sum(self.reask_successes.values()),
+            "methods": {
+                method: {
+                    **{outcome: self.outcomes[outcome][method] for outcome in OUTCOMES},
+                    "reasks": self.reasks[method],
+                    "reask_successes": self.reask_successes[method]
+                }
+                for method in methods
+            },
+            "reask_enabled": self.reask
+        }
@@ -0,0 +1,231 @@
+import asyncio
+import importlib
+import logging
+import os
+import uuid
+from collections import Counter
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Where each provider's API is served from, requested at startup to open the first connection early
+PROVIDER_URLS = {
+    "anthropic": "https://api.anthropic.com",
+    "openai": "https://api.openai.com/v1",
+    "gemini": "https://generativelanguage.googleapis.com",
+}
+
+
+def _chat_module():
+    """emergentintegrations.llm.chat, imported on first use; it pulls in litellm, which takes seconds to import"""
+    return importlib.import_module("emergentintegrations.llm.chat")
+
+
+def _litellm():
+    try:
+        return importlib.import_module("litellm")
+    except ImportError:  # emergentintegrations normally brings it in
+        return None
+
+
+def _async_http_handler():
+    """litellm's AsyncHTTPHandler, which its provider handlers (Anthropic, Gemini, ...) send requests with"""
+    try:
+        return importlib.import_module("litellm.llms.custom_httpx.http_handler").AsyncHTTPHandler
+    except (ImportError, AttributeError):
+        return None
+
+
+class _ReuseTrackingTransport(httpx.AsyncHTTPTransport):
+    """HTTP transport that records whether each request opened a new connection"""
+
+    def __init__(self, pool: "LLMClientPool", **kwargs):
+        super().__init__(**kwargs)
+        self._owner = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        opened = False
+        outer_trace = request.extensions.get("trace")
+
+        async def trace(event: str, info: dict):
+            nonlocal opened
+            if event == "connection.connect_tcp.started":
+                opened = True
+            if outer_trace is not None:
+                await outer_trace(event, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            self._owner.record_request(request.url.host, opened)
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """Sends over another transport's connections; closing it leaves them open"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        pass
+
+
+class LLMClientPool:
+    """HTTP connections and chat sessions shared by every LLM call.
+
+    One keep-alive httpx client is created at startup and handed to litellm,
+    which emergentintegrations uses for the provider calls, so requests reuse
+    open TLS connections instead of handshaking each time. litellm sends
+    OpenAI requests with `litellm.aclient_session` and every other provider's
+    through the AsyncHTTPHandler objects it caches per provider, so the pool
+    takes over both. Every chat gets its own session id, so no conversation
+    state is shared between requests.
+    """
+
+    def __init__(self, api_key: str, provider: str, model: str, max_connections: int = None,
+                 max_keepalive: int = None, keepalive_expiry: float = None, timeout: float = None,
+                 warmup_url: str = None):
+        self.api_key = api_key
+        self.provider = provider
+        self.model = model
+        self.max_connections = max_connections if max_connections is not None else int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+        self.max_keepalive = max_keepalive if max_keepalive is not None else int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+        self.keepalive_expiry = keepalive_expiry if keepalive_expiry is not None else float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS", "120"))
+        self.timeout = timeout if timeout is not None else float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", "120"))
+        if warmup_url is None:
+            warmup_url = os.getenv("LLM_WARMUP_URL", PROVIDER_URLS.get(provider, ""))
+        self.warmup_url = warmup_url
+
+        self.client = None
+        self.transport = None
+        self._previous_session = None
+        self._previous_create_client = None
+        self.chats_created = 0
+        self.requests = Counter()
+        self.connections_opened = Counter()
+
+    @property
+    def started(self) -> bool:
+        return self.client is not None
+
+    def load(self):
+        """Import the chat client, so the first model call does not pay for it"""
+        _chat_module()
+        _litellm()
+
+    async def start(self):
+        """Open the shared HTTP client and, if configured, pre-open a connection"""
+        if self.client is not None:
+            return
+        # The imports run in a thread so the event loop keeps serving meanwhile
+        await asyncio.to_thread(self.load)
+        self.transport = _ReuseTrackingTransport(self, limits=httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry
+        ))
+        self.client = httpx.AsyncClient(transport=self.transport, timeout=self.timeout)
+        litellm = _litellm()
+        if litellm is not None:
+            self._previous_session = litellm.aclient_session
+            litellm.aclient_session = self.client
+            self._hook_http_handler(litellm)
+
+        if self.warmup_url:
+            try:
+                await self.client.head(self.warmup_url)
+            except httpx.HTTPError as e:
+                logger.warning("LLM connection warmup to %s failed: %s", self.warmup_url, e)
+
+    async def close(self):
+        """Close pooled connections and restore litellm's own client"""
+        if self.client is None:
+            return
+        litellm = _litellm()
+        if litellm is not None and litellm.aclient_session is self.client:
+            litellm.aclient_session = self._previous_session
+        handler = _async_http_handler()
+        if handler is not None and getattr(getattr(handler, "create_client", None), "pool", None) is self:
+            handler.create_client = self._previous_create_client
+            self._flush_client_cache(litellm)
+        await self.client.aclose()
+        self.client = None
+        self.transport = None
+
+    def shared_client(self, timeout=None, event_hooks=None) -> httpx.AsyncClient:
+        """A client of its own that sends over the pooled connections, for litellm's handlers to own and close"""
+        return httpx.AsyncClient(
+            transport=_SharedTransport(self.transport),
+            timeout=timeout if timeout is not None else self.timeout,
+            event_hooks=event_hooks,
+            follow_redirects=True
+        )
+
+    def _hook_http_handler(self, litellm):
+        """Make the AsyncHTTPHandlers litellm creates send over the pooled connections"""
+        handler = _async_http_handler()
+        if handler is None or not hasattr(handler, "create_client"):
+            logger.warning("litellm has no AsyncHTTPHandler.create_client; provider calls use litellm's own connections")
+            return
+        self._previous_create_client = handler.create_client
+        previous = self._previous_create_client
+        pool = self
+
+        def create_client(handler_self, *args, **kwargs):
+            if pool.client is None:
+                return previous(handler_self, *args, **kwargs)
+            return pool.shared_client(kwargs.get("timeout"), kwargs.get("event_hooks"))
+
+        create_client.pool = self
+        handler.create_client = create_client
+        # Handlers created before the pool started hold clients of their own
+        self._flush_client_cache(litellm)
+
+    @staticmethod
+    def _flush_client_cache(litellm):
+        cache = getattr(litellm, "in_memory_llm_clients_cache", None)
+        if cache is not None and hasattr(cache, "flush_cache"):
+            cache.flush_cache()
+
+    def chat(self, system_message: str):
+        """Create a chat with a session id of its own"""
+        self.chats_created += 1
+        return _chat_module().LlmChat(
+            api_key=self.api_key,
+            session_id=f"tutor-{uuid.uuid4()}",
+            system_message=system_message
+        ).with_model(self.provider, self.model)
+
+    @staticmethod
+    def message(text: str):
+        return _chat_module().UserMessage(text=text)
+
+    def record_request(self, host: str, opened_connection: bool):
+        self.requests[host] += 1
+        if opened_connection:
+            self.connections_opened[host] += 1
+
+    def stats(self) -> dict:
+        requests = sum(self.requests.values())
+        opened = sum(self.connections_opened.values())
+        return {
+            "started": self.started,
+            "chats_created": self.chats_created,
+            "http_requests": requests,
+            "connections_opened": opened,
+            "connection_reuse_rate": round((requests - opened) / requests, 4) if requests else 0.0,
+            "hosts": {
+                host: {"requests": count, "connections_opened": self.connections_opened[host]}
+                for host, count in self.requests.items()
+            },
+            "max_connections": self.max_connections,
+            "max_keepalive": self.max_keepalive
+        }
@@ -0,0 +1,587 @@
+import ast
+import math
+import random
+import re
+from collections import Counter, namedtuple
+from fractions import Fraction
+
+from dotenv import load_dotenv
+
+from config import env_flag
+from metrics import LOCAL_ENGINE_ANSWERS
+
+load_dotenv()
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+# A worked problem: final answer, numbered steps, three hint tiers and a short explanation
+Worked = namedtuple("Worked", ["answer", "steps", "hints", "explanation"])
+
+
+def _normalize_topic(topic: str) -> str:
+    return " ".join((topic or "").lower().replace("-", " ").split())
+
+
+def _fmt(value: Fraction) -> str:
+    """Integers as integers, everything else as a fraction in lowest terms"""
+    value = Fraction(value)
+    return str(value.numerator) if value.denominator == 1 else f"{value.numerator}/{value.denominator}"
+
+
+def _decimal(value: Fraction, places: int = 2) -> str:
+    value = Fraction(value)
+    if value.denominator == 1:
+        return str(value.numerator)
+    return f"{float(value):.{places}f}".rstrip("0").rstrip(".")
+
+
+def _number(text: str) -> Fraction:
+    return Fraction(text)
+
+
+def _signed(value: Fraction) -> str:
+    """' + 3' or ' - 3', for appending a term to an expression"""
+    return f" - {_fmt(-value)}" if value < 0 else f" + {_fmt(value)}"
+
+
+class TopicGenerator:
+    """Generates problems for one family of topics and solves their statements.
+
+    `generate` returns a problem statement; `solve` parses a statement,
+    student-typed or generated, and returns a Worked answer or None when it
+    does not recognise it. Generated problems are always run back through
+    `solve`, so every answer served comes from the same checked path.
+    """
+
+    name = ""
+    contexts = ["Practice problem"]
+
+    def generate(self, rng: random.Random, difficulty: str) -> str:
+        raise NotImplementedError
+
+    def solve(self, text: str):
+        raise NotImplementedError
+
+
+class LinearEquations(TopicGenerator):
+    name = "linear_equations"
+    contexts = [
+        "Balancing both sides of an equation",
+        "Finding an unknown quantity",
+        "Working backwards from a total",
+    ]
+
+    _equation = re.compile(r"([0-9a-z+\-*·.\s]+)=([0-9a-z+\-*·.\s]+)")
+    _term = re.compile(r"([+-])(\d+(?:\.\d+)?)?([a-z]?)")
+
+    def generate(self, rng, difficulty):
+        var = rng.choice("xxxyn")
+        x = rng.choice([n for n in range(-10, 13) if n != 0])
+        if difficulty == "easy":
+            if rng.random() < 0.5:
+                b = rng.choice([n for n in range(-15, 16) if n != 0])
+                return f"Solve for {var}: {var}{_signed(b)} = {x + b}"
+            a = rng.randint(2, 9)
+            return f"Solve for {var}: {a}{var} = {a * x}"
+        if difficulty == "medium":
+            a, b = rng.randint(2, 9), rng.choice([n for n in range(-20, 21) if n != 0])
+            return f"Solve for {var}: {a}{var}{_signed(b)} = {a * x + b}"
+        a, c = rng.sample(range(2, 10), 2)
+        b = rng.randint(-20, 20)
+        d = a * x + b - c * x
+        return f"Solve for {var}: {self._side(a, b, var)} = {self._side(c, d, var)}"
+
+    @staticmethod
+    def _side(coefficient: Fraction, constant: Fraction, var: str) -> str:
+        if coefficient == 0:
+            return _fmt(constant)
+        if coefficient == 1:
+            text = var
+        elif coefficient == -1:
+            text = f"-{var}"
+        else:
+            text = f"{_fmt(coefficient)}{var}"
+        return text + (_signed(constant) if constant != 0 else "")
+
+    def _parse_side(self, text: str, var_holder: list):
+        text = text.replace(" ", "").replace("*", "").replace("·", "")
+        if not text:
+            return None
+        if text[0] not in "+-":
+            text = "+" + text
+        coefficient = constant = Fraction(0)
+        position = 0
+        for match in self._term.finditer(text):
+            if match.start() != position or not (match.group(2) or match.group(3)):
+                return None
+            position = match.end()
+            sign = -1 if match.group(1) == "-" else 1
+            if match.group(3):
+                if var_holder[0] not in (None, match.group(3)):
+                    return None
+                var_holder[0] = match.group(3)
+                coefficient += sign * (_number(match.group(2)) if match.group(2) else 1)
+            else:
+                constant += sign * _number(match.group(2))
+        if position != len(text):
+            return None
+        return coefficient, constant
+
+    def solve(self, text):
+        body = text.lower().replace("−", "-").rsplit(":", 1)[-1].strip().rstrip(".?!")
+        match = self._equation.fullmatch(body)
+        if not match:
+            return None
+        var = [None]
+        left, right = self._parse_side(match.group(1), var), self._parse_side(match.group(2), var)
+        if left is None or right is None or var[0] is None:
+            return None
+        var = var[0]
+        (a, b), (c, d) = left, right
+        coefficient, total = a - c, d - b
+        if coefficient == 0:
+            return None
+        x = total / coefficient
+
+        steps = []
+        if c != 0:
+            move = f"subtracting {self._side(c, 0, var)} from" if c > 0 else f"adding {self._side(-c, 0, var)} to"
+            steps.append(f"Move the {var} terms to the left by {move} both sides: {self._side(coefficient, b, var)} = {_fmt(d)}")
+        if b != 0:
+            verb = "Subtract" if b > 0 else "Add"
+            steps.append(f"{verb} {_fmt(abs(b))} {'from' if b > 0 else 'to'} both sides: {self._side(coefficient, 0, var)} = {_fmt(total)}")
+        if coefficient != 1:
+            steps.append(f"Divide both sides by {_fmt(coefficient)}: {var} = {_fmt(x)}")
+        # Verify by substituting back into the original equation
+        if a * x + b != c * x + d:
+            return None
+        steps.append(f"Check: with {var} = {_fmt(x)} the left side is {_fmt(a * x + b)} and the right side is {_fmt(c * x + d)}")
+        steps = [f"Step {i}: {step}" for i, step in enumerate(steps, 1)]
+
+        hints = [
+            f"This is a linear equation. Aim to get {var} on its own on one side, doing the same thing to both sides.",
+            f"Collect the {var} terms on one side first, then the plain numbers on the other." if c != 0
+            else f"Undo the operations on {var} in reverse order: deal with the added or subtracted number first, then the multiplication.",
+            f"Rearrange to {self._side(coefficient, 0, var)} = {_fmt(total)}, then divide both sides by {_fmt(coefficient)}." if coefficient != 1
+            else f"Rearrange so that {var} is alone; the number left on the other side is the answer.",
+        ]
+        explanation = f"Adding, subtracting, multiplying or dividing both sides by the same amount keeps the equation balanced, so each step isolates {var} a little more until its value is left."
+        return Worked(f"{var} = {_fmt(x)}", steps, hints, explanation)
+
+
+class Fractions(TopicGenerator):
+    name = "fractions"
+    contexts = [
+        "Sharing a pizza between friends",
+        "Measuring ingredients for a recipe",
+        "Splitting a length of ribbon",
+    ]
+
+    # The whole statement has to be a single operation on two fractions
+    _statement = re.compile(
+        r"(?:(?:calculate|evaluate|compute|work out|what is)\s*:?\s*)?"
+        r"(\d+)\s*/\s*(\d+)\s*([+\-×x*÷:])\s*(\d+)\s*/\s*(\d+)\s*[.?]?"
+        r"(?:\s*give your answer in (?:its )?simplest form\.?)?"
+    )
+    _symbols = {"+": "+", "-": "-", "×": "×", "x": "×", "*": "×", "÷": "÷", ":": "÷"}
+
+    @staticmethod
+    def _numerator(rng, denominator: int) -> int:
+        """A numerator that makes a proper fraction already in lowest terms"""
+        return rng.choice([n for n in range(1, denominator) if math.gcd(n, denominator) == 1])
+
+    def generate(self, rng, difficulty):
+        if difficulty == "easy":
+            d = rng.randint(5, 12)
+            a, c = rng.sample(range(1, d), 2)
+            op = rng.choice("+-")
+            if op == "-" and c > a:
+                a, c = c, a
+            return f"Calculate {a}/{d} {op} {c}/{d}. Give your answer in simplest form."
+        b, d = rng.sample(range(2, 13), 2)
+        a, c = self._numerator(rng, b), self._numerator(rng, d)
+        if difficulty == "medium":
+            op = rng.choice("+-")
+            if op == "-" and Fraction(c, d) > Fraction(a, b):
+                a, b, c, d = c, d, a, b
+            return f"Calculate {a}/{b} {op} {c}/{d}. Give your answer in simplest form."
+        return f"Calculate {a}/{b} {rng.choice('×÷')} {c}/{d}. Give your answer in simplest form."
+
+    def solve(self, text):
+        match = self._statement.fullmatch(" ".join(text.lower().replace("−", "-").split()))
+        if not match:
+            return None
+        a, b, symbol, c, d = match.groups()
+        a, b, c, d = int(a), int(b), int(c), int(d)
+        op = self._symbols[symbol]
+        if b == 0 or d == 0 or (op == "÷" and c == 0):
+            return None
+        left, right = Fraction(a, b), Fraction(c, d)
+
+        steps = []
+        if op in "+-":
+            result = left + right if op == "+" else left - right
+            word = "add" if op == "+" else "subtract"
+            if b == d:
+                numerator = a + c if op == "+" else a - c
+                steps.append(f"The denominators are both {b}, so {word} the numerators: {a} {op} {c} = {numerator}, giving {numerator}/{b}")
+            else:
+                lcd = b * d // math.gcd(b, d)
+                a2, c2 = a * (lcd // b), c * (lcd // d)
+                numerator = a2 + c2 if op == "+" else a2 - c2
+                steps.append(f"Find a common denominator: the least common multiple of {b} and {d} is {lcd}")
+                steps.append(f"Rewrite both fractions: {a}/{b} = {a2}/{lcd} and {c}/{d} = {c2}/{lcd}")
+                steps.append(f"{word.capitalize()} the numerators: {a2} {op} {c2} = {numerator}, giving {numerator}/{lcd}")
+                b = lcd
+            unsimplified = (numerator, b)
+            hints = [
+                f"To {word} fractions they need the same denominator.",
+                "The denominators already match, so only the numerators change." if len(steps) == 1
+                else "Use the least common multiple of the denominators as the new denominator.",
+                f"Rewrite each fraction over the common denominator, {word} the numerators, then simplify.",
+            ]
+            explanation = "Fractions can only be added or subtracted when they count the same size of piece, which is what a common denominator gives them."
+        else:
+            if op == "÷":
+                steps.append(f"Dividing by {c}/{d} is the same as multiplying by its reciprocal {d}/{c}: {a}/{b} × {d}/{c}")
+                c, d = d, c
+            result = Fraction(a, b) * Fraction(c, d)
+            unsimplified = (a * c, b * d)
+            steps.append(f"Multiply the numerators and the denominators: ({a} × {c})/({b} × {d}) = {a * c}/{b * d}")
+            hints = [
+                "Multiplying and dividing fractions does not need a common denominator.",
+                "To divide, flip the second fraction and multiply instead." if op == "÷"
+                else "Multiply the numerators together and the denominators together.",
+                "Multiply straight across, then simplify by dividing the top and bottom by their greatest common factor.",
+            ]
+            explanation = "The product of two fractions multiplies the numerators and the denominators; dividing by a fraction is multiplying by its reciprocal."
+
+        numerator, denominator = unsimplified
+        divisor = math.gcd(numerator, denominator)
+        if divisor > 1 and denominator != divisor:
+            steps.append(f"Simplify by dividing the numerator and denominator by {divisor}: {_fmt(result)}")
+        elif divisor > 1:
+            steps.append(f"Simplify: {numerator}/{denominator} = {_fmt(result)}")
+        if result.denominator != 1 and abs(result) > 1:
+            whole = int(abs(result)) * (1 if result > 0 else -1)
+            remainder = abs(result - whole)
+            steps.append(f"As a mixed number: {whole} {_fmt(remainder)}")
+        if Fraction(numerator, denominator) != result:
+            return None
+        steps = [f"Step {i}: {step}" for i, step in enumerate(steps, 1)]
+        return Worked(_fmt(result), steps, hints, explanation)
+
+
+class Percentages(TopicGenerator):
+    name = "percentages"
+    contexts = [
+        "Shopping during a sale",
+        "Reading survey results",
+        "Tracking a change over time",
+    ]
+
+    # Each pattern has to match the whole statement, so extra conditions fall back to the model
+    _part = re.compile(r"what is (\d+(?:\.\d+)?)\s*% of \$?(\d+(?:\.\d+)?)\s*\??")
+    _rate = re.compile(r"what percent(?:age)? of \$?(\d+(?:\.\d+)?) is \$?(\d+(?:\.\d+)?)\s*\??")
+    _discount = re.compile(r"an? [a-z ]+? costs \$(\d+(?:\.\d+)?)\. it is on sale for (\d+(?:\.\d+)?)% off\. what is the sale price\?")
+    _increase = re.compile(
+        r"the (?:size|population) of an? [a-z ]+? of (\d+(?:\.\d+)?) (?:grows|increases) by (\d+(?:\.\d+)?)%\. what is the new (?:size|population)\?"
+    )
+
+    def generate(self, rng, difficulty):
+        if difficulty == "easy":
+            percent = rng.choice([10, 20, 25, 50, 75, 5, 40])
+            return f"What is {percent}% of {rng.randint(1, 20) * 20}?"
+        if difficulty == "medium":
+            whole = rng.choice([20, 25, 40, 50, 80, 200, 400])
+            percent = rng.choice([5, 10, 15, 20, 25, 30, 45, 60, 75])
+            return f"What percent of {whole} is {_decimal(Fraction(percent * whole, 100))}?"
+        percent = rng.choice([5, 10, 15, 20, 25, 30, 40])
+        if rng.random() < 0.5:
+            item = rng.choice(["jacket", "bicycle", "pair of shoes", "video game", "backpack"])
+            return f"A {item} costs ${rng.randint(2, 30) * 10}. It is on sale for {percent}% off. What is the sale price?"
+        town = rng.choice(["town", "school", "library membership", "club"])
+        return f"The size of a {town} of {rng.randint(2, 40) * 50} grows by {percent}%. What is the new size?"
+
+    def solve(self, text):
+        text = " ".join(text.lower().replace(",", "").split())
+        match = self._part.fullmatch(text)
+        if match:
+            percent, whole = _number(match.group(1)), _number(match.group(2))
+            part = percent * whole / 100
+            steps = [
+                f"Write the percent as a decimal: {_decimal(percent)}% = {_decimal(percent / 100, 4)}",
+                f"Multiply by the whole: {_decimal(percent / 100, 4)} × {_decimal(whole)} = {_decimal(part)}",
+            ]
+            hints = [
+                "'Percent' means 'out of 100', and 'of' means multiply.",
+                f"Change {_decimal(percent)}% into a decimal or a fraction over 100.",
+                f"Multiply {_decimal(whole)} by {_decimal(percent)}/100.",
+            ]
+            explanation = "A percentage of a quantity is that quantity multiplied by the percentage divided by 100."
+            return self._worked(_decimal(part), steps, hints, explanation)
+
+        match = self._rate.fullmatch(text)
+        if match:
+            whole, part = _number(match.group(1)), _number(match.group(2))
+            if whole == 0:
+                return None
+            percent = part / whole * 100
+            steps = [
+                f"Write the part as a fraction of the whole: {_decimal(part)}/{_decimal(whole)}",
+                f"Divide: {_decimal(part)} ÷ {_decimal(whole)} = {_decimal(part / whole, 4)}",
+                f"Multiply by 100 to get a percentage: {_decimal(percent)}%",
+            ]
+            hints = [
+                "You are comparing a part to a whole.",
+                "Make a fraction with the part on top and the whole on the bottom.",
+                f"Divide {_decimal(part)} by {_decimal(whole)} and multiply the result by 100.",
+            ]
+            explanation = "A percentage is a fraction with a denominator of 100, so part ÷ whole × 100 gives the percent."
+            return self._worked(f"{_decimal(percent)}%", steps, hints, explanation)
+
+        match = self._discount.fullmatch(text)
+        if match:
+            price, percent = _number(match.group(1)), _number(match.group(2))
+            saving = price * percent / 100
+            steps = [
+                f"Find the discount: {_decimal(percent)}% of ${_decimal(price)} = ${_decimal(saving)}",
+                f"Subtract it from the original price: ${_decimal(price)} - ${_decimal(saving)} = ${_decimal(price - saving)}",
+            ]
+            hints = [
+                "A discount is a percentage of the original price that is taken off.",
+                f"Work out {_decimal(percent)}% of ${_decimal(price)} first.",
+                f"Subtract the discount from ${_decimal(price)}, or multiply ${_decimal(price)} by {_decimal(100 - percent)}%.",
+            ]
+            explanation = f"Taking {_decimal(percent)}% off leaves {_decimal(100 - percent)}% of the original price."
+            return self._worked(f"${_decimal(price - saving)}", steps, hints, explanation)
+
+        match = self._increase.fullmatch(text)
+        if match:
+            start, percent = _number(match.group(1)), _number(match.group(2))
+            growth = start * percent / 100
+            steps = [
+                f"Find the increase: {_decimal(percent)}% of {_decimal(start)} = {_decimal(growth)}",
+                f"Add it to the starting size: {_decimal(start)} + {_decimal(growth)} = {_decimal(start + growth)}",
+            ]
+            hints = [
+                "A percentage increase adds a percentage of the starting amount.",
+                f"Work out {_decimal(percent)}% of {_decimal(start)} first.",
+                f"Add the increase to {_decimal(start)}, or multiply {_decimal(start)} by {_decimal(100 + percent)}%.",
+            ]
+            explanation = f"Growing by {_decimal(percent)}% gives {_decimal(100 + percent)}% of the starting amount."
+            return self._worked(_decimal(start + growth), steps, hints, explanation)
+        return None
+
+    @staticmethod
+    def _worked(answer, steps, hints, explanation):
+        return Worked(answer, [f"Step {i}: {step}" for i, step in enumerate(steps, 1)], hints, explanation)
+
+
+class Arithmetic(TopicGenerator):
+    name = "arithmetic"
+    contexts = [
+        "Mental math warm-up",
+        "Working out a shop bill",
+        "Order of operations practice",
+    ]
+
+    _operators = {ast.Add: "+", ast.Sub: "-", ast.Mult: "×", ast.Div: "÷"}
+    _verbs = {"+": "Add", "-": "Subtract", "×": "Multiply", "÷": "Divide"}
+    _precedence = {"+": 1, "-": 1, "×": 2, "÷": 2}
+    _allowed = re.compile(r"[\d\s+\-*/().]+")
+    MAX_OPERATIONS = 12
+
+    def generate(self, rng, difficulty):
+        if difficulty == "easy":
+            a, b = rng.randint(10, 999), rng.randint(10, 999)
+            if rng.random() < 0.5:
+                return f"Calculate: {a} + {b}"
+            return f"Calculate: {max(a, b)} - {min(a, b)}"
+        if difficulty == "medium":
+            a, b = rng.randint(12, 99), rng.randint(3, 25)
+            if rng.random() < 0.5:
+                return f"Calculate: {a} × {b}"
+            return f"Calculate: {a * b} ÷ {b}"
+        a, b, c, d = rng.randint(2, 20), rng.randint(2, 9), rng.randint(6, 15), rng.randint(1, 5)
+        e = rng.randint(2, 6)
+        return rng.choice([
+            f"Calculate: {a} + {b} × ({c} - {d})",
+            f"Calculate: ({a} + {b}) × {d} - {c}",
+            f"Calculate: {a} × {b} - {c * e} ÷ {e}",
+        ])
+
+    def _tree(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return Fraction(str(node.value))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            value = self._tree(node.operand)
+            return -value if isinstance(value, Fraction) else ("-", Fraction(0), value)
+        if isinstance(node, ast.BinOp) and type(node.op) in self._operators:
+            return (self._operators[type(node.op)], self._tree(node.left), self._tree(node.right))
+        raise ValueError("unsupported expression")
+
+    def _render(self, node, parent: int = 0, right: bool = False) -> str:
+        if isinstance(node, Fraction):
+            text = _fmt(node)
+            return f"({text})" if node < 0 and parent else text
+        op, left, rhs = node
+        precedence = self._precedence[op]
+        text = f"{self._render(left, precedence)} {op} {self._render(rhs, precedence, True)}"
+        if precedence < parent or (right and precedence == parent):
+            return f"({text})"
+        return text
+
+    @staticmethod
+    def _apply(op, left, right):
+        if op == "+":
+            return left + right
+        if op == "-":
+            return left - right
+        if op == "×":
+            return left * right
+        if right == 0:
+            raise ZeroDivisionError
+        return left / right
+
+    def _reduce(self, node, steps):
+        """Evaluate the leftmost innermost operation, recording it as a step"""
+        if isinstance(node, Fraction):
+            return node
+        op, left, right = node
+        if not isinstance(left, Fraction):
+            return (op, self._reduce(left, steps), right)
+        if not isinstance(right, Fraction):
+            return (op, left, self._reduce(right, steps))
+        value = self._apply(op, left, right)
+        steps.append(f"{self._verbs[op]}: {self._render(node)} = {_fmt(value)}")
+        return value
+
+    def solve(self, text):
+        body = text.lower().replace("×", "*").replace("÷", "/").replace("−", "-")
+        body = re.sub(r"^\s*(?:calculate|evaluate|compute|work out|what is)\b", "", body.rsplit(":", 1)[-1]).strip().rstrip("?.= ")
+        if not body or not self._allowed.fullmatch(body) or not re.search(r"[+\-*/]", body.lstrip("-")):
+            return None
+        try:
+            tree = self._tree(ast.parse(body, mode="eval").body)
+        except (SyntaxError, ValueError):
+            return None
+        expression = self._render(tree)
+        if expression.count(" ") // 2 > self.MAX_OPERATIONS:
+            return None
+
+        steps, node = [], tree
+        try:
+            while not isinstance(node, Fraction):
+                node = self._reduce(node, steps)
+                if not isinstance(node, Fraction):
+                    steps[-1] += f", leaving {self._render(node)}"
+        except ZeroDivisionError:
+            return None
+        answer = _fmt(node) if node.denominator == 1 else f"{_fmt(node)} ({_decimal(node, 4)})"
+
+        several = len(steps) > 1
+        hints = [
+            "Use the order of operations: brackets first, then × and ÷, then + and -." if several
+            else "Line the numbers up by place value and work one column at a time.",
+            "Find the part of the expression that has to be worked out first." if several
+            else "Estimate the answer first so you can check your result.",
+            f"Work through it in {len(steps)} steps, rewriting the expression after each one." if several
+            else "Carry out the single operation carefully, then compare with your estimate.",
+        ]
+        explanation = "The order of operations fixes which part of an expression is evaluated first, so everyone gets the same answer." if several \
+            else "Written methods break the calculation into place-value columns that are easy to check."
+        return Worked(answer, [f"Step {i}: {step}" for i, step in enumerate(steps, 1)], hints, explanation)
+
+
+# Topic names, after lower-casing and collapsing whitespace, served by each built-in generator
+DEFAULT_TOPICS = {
+    LinearEquations: ["linear equations", "linear equation", "solving equations", "one step equations", "two step equations", "equations"],
+    Fractions: ["fractions", "fraction", "fraction operations", "adding fractions", "multiplying fractions", "dividing fractions"],
+    Percentages: ["percentages", "percentage", "percents", "percent", "percent change", "discounts"],
+    Arithmetic: ["arithmetic", "basic arithmetic", "mental math", "order of operations", "addition", "subtraction", "multiplication", "division"],
+}
+
+
+class LocalEngine:
+    """Deterministic generators and solvers for routine math topics.
+
+    The AI service asks the engine first. When the topic is registered (and,
+    for hints and solutions, the problem statement is one the generator can
+    parse) the answer is computed locally with no model call; otherwise the
+    engine returns None and the service falls back to the LLM.
+    """
+
+    def __init__(self, enabled: bool = None, seed: int = None):
+        self.enabled = enabled if enabled is not None else env_flag("LOCAL_ENGINE_ENABLED", True)
+        self.generators = {}
+        self.rng = random.Random(seed)
+        self.answered = Counter()
+        self.declined = Counter()
+        for generator, topics in DEFAULT_TOPICS.items():
+            self.register(generator(), *topics)
+
+    def register(self, generator: TopicGenerator, *topics: str):
+        """Serve `topics` with `generator`, replacing any earlier registration"""
+        for topic in topics:
+            self.generators[_normalize_topic(topic)] = generator
+
+    def generator_for(self, topic: str):
+        if not self.enabled:
+            return None
+        return self.generators.get(_normalize_topic(topic))
+
+    def _count(self, method: str, answered: bool):
+        if answered:
+            self.answered[method] += 1
+            LOCAL_ENGINE_ANSWERS.inc(method)
+        else:
+            self.declined[method] += 1
+
+    def _solve(self, method: str, topic: str, problem: str):
+        generator = self.generator_for(topic)
+        if generator is None:
+            return None
+        worked = generator.solve(problem)
+        self._count(method, worked is not None)
+        return worked
+
+    def hints(self, topic: str, problem: str):
+        """Three tiered hints, or None to use the LLM"""
+        worked = self._solve("generate_hints", topic, problem)
+        return list(worked.hints) if worked else None
+
+    def solution(self, topic: str, problem: str):
+        """A {"steps", "answer", "explanation"} solution, or None to use the LLM"""
+        worked = self._solve("generate_solution", topic, problem)
+        if worked is None:
+            return None
+        return {"steps": list(worked.steps), "answer": worked.answer, "explanation": worked.explanation}
+
+    def practice_problems(self, topic: str, difficulty: str, count: int):
+        """`count` distinct problems in the generator's usual shape, or None to use the LLM"""
+        generator = self.generator_for(topic)
+        if generator is None:
+            return None
+        difficulty = difficulty if difficulty in DIFFICULTIES else "medium"
+        problems, seen = [], set()
+        for _ in range(count * 20):
+            if len(problems) == count:
+                break
+            prompt = generator.generate(self.rng, difficulty)
+            # Only serve problems the solver can answer, so hints and solutions stay local too
+            if prompt in seen or generator.solve(prompt) is None:
+                continue
+            seen.add(prompt)
+            problems.append({"prompt": prompt, "difficulty": difficulty, "context": self.rng.choice(generator.contexts)})
+        self._count("generate_practice_problems", len(problems) == count)
+        return problems if len(problems) == count else None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "topics": sorted(self.generators),
+            "answered": dict(self.answered),
+            "declined": dict(self.declined),
+            "total_answered": sum(self.answered.values())
+        }
@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def mastery_scores(attempts_lists: list, hints_lists: list) -> list:
+    """Score many (attempts, hints_used) records in one vectorized pass.
+
+    Produces exactly what AIEducatorService.calculate_mastery_score returns
+    for each record: the share of correct attempts times 100, minus 5 points
+    per hint capped at 20, floored at 0 and rounded to 2 decimals.
+    """
+    n = len(attempts_lists)
+    if n == 0:
+        return []
+
+    # Flatten every record's attempts and hint lists, then sum per record
+    attempt_counts = np.fromiter((len(attempts) for attempts in attempts_lists), dtype=np.int64, count=n)
+    correct_flags = np.fromiter(
+        (bool(a.get('correct', False)) for attempts in attempts_lists for a in attempts),
+        dtype=np.float64,
+        count=int(attempt_counts.sum())
+    )
+    correct = np.bincount(np.repeat(np.arange(n), attempt_counts), weights=correct_flags, minlength=n)
+
+    hint_list_counts = np.fromiter((len(hints) for hints in hints_lists), dtype=np.int64, count=n)
+    hint_sizes = np.fromiter(
+        (len(h) for hints in hints_lists for h in hints),
+        dtype=np.float64,
+        count=int(hint_list_counts.sum())
+    )
+    total_hints = np.bincount(np.repeat(np.arange(n), hint_list_counts), weights=hint_sizes, minlength=n)
+
+    # Same operation order as the scalar formula, so float results are identical
+    base_scores = np.divide(correct, attempt_counts, out=np.zeros(n), where=attempt_counts > 0) * 100
+    hint_penalties = np.minimum(total_hints * 5, 20)
+    final_scores = np.maximum(0, base_scores - hint_penalties)
+    final_scores[attempt_counts == 0] = 0.0
+
+    # Python's round() is correctly rounded; np.round can differ in the last digit
+    return [round(float(score), 2) for score in final_scores]
@@ -0,0 +1,321 @@
+import bisect
+import sys
+import threading
+import time
+from collections import Counter as _Counts
+
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: tuple) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        return tuple(str(label) for label in labels)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, *labels):
+        """Context manager that observes the duration of its block"""
+        return _Timer(self, labels)
+
+    def render(self) -> list:
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        lines = self.header()
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                bucket = _labels(self.labelnames, key, 'le="%s"' % _number(bound))
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            bucket = _labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket} {values[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(values[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {values[-1]}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class Registry:
+    """Metrics plus gauge callbacks, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+        self._gauges = {}  # name -> (help, labelnames, callback returning {labels tuple: value})
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, callback, labelnames=()):
+        """Export values read from `callback` at scrape time; registering a name again replaces its callback"""
+        self._gauges[name] = (help_text, tuple(labelnames), callback)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for name, (help_text, labelnames, callback) in self._gauges.items():
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} gauge"])
+            for labels, value in sorted(callback().items()):
+                labels = labels if isinstance(labels, tuple) else (labels,)
+                lines.append(f"{name}{_labels(labelnames, labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time to serve an HTTP request, including streamed bodies",
+    ["method", "route", "status"]
+))
+LLM_CALL_SECONDS = REGISTRY.register(Histogram(
+    "llm_call_duration_seconds", "Duration of one model call, excluding queue wait", ["method"]
+))
+LLM_QUEUE_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "llm_queue_wait_seconds", "Time a model call waited for a scheduler slot", ["priority"]
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "llm_tokens_total", "Tokens sent to and received from the model", ["method", "direction"]
+))
+LLM_PARSE_OUTCOMES = REGISTRY.register(Counter(
+    "llm_parse_outcomes_total", "Model replies by parse outcome", ["method", "outcome"]
+))
+LLM_FALLBACKS = REGISTRY.register(Counter(
+    "llm_fallbacks_total", "Generations answered with placeholder content", ["method"]
+))
+LLM_UNAVAILABLE = REGISTRY.register(Counter(
+    "llm_unavailable_total", "Model calls given up on, by cause: deadline, timeout, circuit_open or provider_error", ["method", "cause"]
+))
+LLM_HEDGES = REGISTRY.register(Counter(
+    "llm_hedged_requests_total", "Duplicate requests sent for slow model calls, by which request answered first", ["method", "winner"]
+))
+LOCAL_ENGINE_ANSWERS = REGISTRY.register(Counter(
+    "local_engine_answers_total", "Generations answered by the local problem engine without a model call", ["method"]
+))
+SIMILAR_REUSE = REGISTRY.register(Counter(
+    "similar_problem_reuse_total", "Answers reused from a near-identical earlier problem", ["method"]
+))
+ATTEMPT_EVENTS = REGISTRY.register(Counter(
+    "attempt_events_total", "Attempt events received, by whether they were new or repeated idempotency keys", ["outcome"]
+))
+PREFETCHES = REGISTRY.register(Counter(
+    "prefetch_total", "Speculative hint and solution generations by outcome: started, completed, failed, wasted, or skipped for budget or load", ["kind", "outcome"]
+))
+PREFETCH_LOOKUPS = REGISTRY.register(Counter(
+    "prefetch_lookups_total", "Hint and solution requests for stored problems by source: prefetched, joined in flight, stored earlier or generated", ["kind", "source"]
+))
+JOB_OUTCOMES = REGISTRY.register(Counter(
+    "jobs_total", "Background job attempts by outcome: succeeded, retried, failed or released", ["kind", "outcome"]
+))
+JOB_SECONDS = REGISTRY.register(Histogram(
+    "job_duration_seconds", "Duration of one background job attempt", ["kind"]
+))
+DB_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "Duration of one database statement", ["operation"], buckets=DB_BUCKETS
+))
+
+
+def instrument_engine(engine):
+    """Time every statement run on a sync engine (use async_engine.sync_engine for async)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("_query_started")
+        if started:
+            operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started.pop(), operation)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        started = context.connection.info.get("_query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+class MetricsMiddleware:
+    """ASGI middleware that times every HTTP request per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope; unmatched paths share one label
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope.get("method", ""),
+                getattr(route, "path", "unmatched"),
+                status["code"]
+            )
+
+
+class SamplingProfiler:
+    """Statistical profiler that samples one thread's stack at a fixed interval.
+
+    Off by default and started and stopped at runtime. Samples are kept as
+    collapsed stacks ("outer;inner count"), the input format of flame graph
+    tools.
+    """
+
+    def __init__(self):
+        self.samples = _Counts()
+        self.interval = 0.01
+        self.started_at = None
+        self.sample_count = 0
+        self._thread = None
+        self._target = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval_seconds: float = 0.01, thread_id: int = None):
+        """Begin sampling `thread_id`, by default the calling thread (the event loop)"""
+        if self.running:
+            return
+        self.interval = max(interval_seconds, 0.001)
+        self._target = thread_id if thread_id is not None else threading.get_ident()
+        self.samples.clear()
+        self.sample_count = 0
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "started_at": self.started_at,
+            "samples": self.sample_count,
+            "distinct_stacks": len(self.samples)
+        }
+
+
+PROFILER = SamplingProfiler()
@@ -0,0 +1,134 @@
+import hashlib
+
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware
+
+from resilience import track_degraded
+
+
+class ETagMiddleware:
+    """Weak ETags for JSON GET responses, answering a matching If-None-Match with 304.
+
+    The tag is a hash of the body, so a client polling unchanged data gets
+    an empty 304 instead of the full document. Streamed responses and
+    responses that already carry an ETag are passed through.
+    """
+
+    def __init__(self, app, prefix: str = "/api/"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if message["status"] != 200 or "etag" in headers or not headers.get("content-type", "").startswith("application/json"):
+                    await send(message)
+                else:
+                    start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            if message.get("more_body", False):
+                # Streamed body: too late to tag it, send it as is
+                await send(start)
+                start = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            etag = 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+            headers = MutableHeaders(raw=start["headers"])
+            headers["ETag"] = etag
+            headers.setdefault("Cache-Control", "no-cache")
+            if if_none_match and _matches(if_none_match, etag):
+                del headers["Content-Length"]
+                del headers["Content-Type"]
+                await send({**start, "status": 304})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison against an If-None-Match header (RFC 9110, 13.1.2)"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+class DegradedMiddleware:
+    """Flags responses built with placeholder content because the model was unavailable.
+
+    They get an `X-Degraded` header listing the generations that fell back
+    and `Cache-Control: no-store`, and a JSON object body also gets a
+    `degraded` list. Other responses are passed through untouched; event
+    streams say so in their final event instead.
+    """
+
+    def __init__(self, app, prefix: str = "/api/"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        reasons = track_degraded()
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                if Headers(raw=message["headers"]).get("content-type", "").startswith("application/json"):
+                    start = message
+                else:
+                    await send(message)
+                return
+            if start is None:
+                await send(message)
+                return
+            if reasons and not message.get("more_body", False):
+                headers = MutableHeaders(raw=start["headers"])
+                flagged = sorted(reasons)
+                headers["X-Degraded"] = ",".join(flagged)
+                headers["Cache-Control"] = "no-store"
+                body = orjson.loads(message.get("body", b"") or b"null")
+                if isinstance(body, dict):
+                    body["degraded"] = flagged
+                    message = {**message, "body": orjson.dumps(body)}
+                    headers["Content-Length"] = str(len(message["body"]))
+            await send(start)
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Gzip large responses, except Server-Sent Event streams.
+
+    Compressing an event stream would hold events back in the compressor
+    until enough bytes pile up, so paths ending in /stream are skipped.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
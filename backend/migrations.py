@@ -0,0 +1,78 @@
+import logging
+import sys
+
+from sqlalchemy import inspect, select, text, update
+
+from database import Base, engine
+from models import LearningSession, PracticeProblem
+
+logger = logging.getLogger(__name__)
+
+
+def _add_missing_columns(connection) -> list:
+    """ALTER TABLE ... ADD COLUMN for model columns an existing table lacks.
+
+    Columns are added as nullable without their default, which works on every
+    backend without rewriting the table; rows written afterwards get the
+    model-side default as usual.
+    """
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(
+                f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column_type}"
+            ))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _backfill_problem_topics(connection):
+    """Problems stored before practice_problems.topic existed take the topic of their session"""
+    problems, sessions = PracticeProblem.__table__, LearningSession.__table__
+    connection.execute(
+        update(problems)
+        .where(problems.c.topic.is_(None), problems.c.session_id.is_not(None))
+        .values(topic=select(sessions.c.topic).where(sessions.c.id == problems.c.session_id).scalar_subquery())
+    )
+
+
+# Data to fill in for the rows a table already had when one of its columns was added
+BACKFILLS = {
+    "practice_problems.topic": _backfill_problem_topics,
+}
+
+
+def run_migrations(bind=None) -> dict:
+    """Bring the schema up to the models: new tables, new columns, new indexes.
+
+    Run once per deployment (python migrations.py, or by the parent process of
+    a multi-worker server) rather than in every worker as it boots.
+    """
+    bind = bind if bind is not None else engine
+    with bind.begin() as connection:
+        columns = _add_missing_columns(connection)
+        for column in columns:
+            if column in BACKFILLS:
+                BACKFILLS[column](connection)
+    Base.metadata.create_all(bind=bind)
+    # create_all skips tables that already exist, so add any indexes declared since
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    if columns:
+        logger.info("Added columns: %s", ", ".join(columns))
+    return {"tables": len(Base.metadata.sorted_tables), "columns_added": columns}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    result = run_migrations()
+    print(f"Schema up to date ({result['tables']} tables, {len(result['columns_added'])} columns added)", file=sys.stderr)
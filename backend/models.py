@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Text, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, String, Integer, Float, Boolean, Text, DateTime, JSON, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -16,16 +16,17 @@ class Student(Base):
     goals = Column(Text)
     pacing_pref = Column(String)  # slow/medium/fast
     accessibility_needs = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
     sessions = relationship("LearningSession", back_populates="student")
     progress_records = relationship("Progress", back_populates="student")
 
 class LearningSession(Base):
     __tablename__ = "learning_sessions"
+    __table_args__ = (Index("ix_learning_sessions_student_created", "student_id", "created_at"),)
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    student_id = Column(String, ForeignKey("students.id"))
+    student_id = Column(String, ForeignKey("students.id"), index=True)
     topic = Column(String, nullable=False)
     unit_outline = Column(JSON)
     lesson_plan = Column(JSON)
@@ -33,7 +34,7 @@ class LearningSession(Base):
     explanations = Column(JSON)
     progress_summary = Column(JSON)
     assessment = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
     student = relationship("Student", back_populates="sessions")
     problems = relationship("PracticeProblem", back_populates="session")
@@ -42,27 +43,144 @@ class PracticeProblem(Base):
     __tablename__ = "practice_problems"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    session_id = Column(String, ForeignKey("learning_sessions.id"))
+    session_id = Column(String, ForeignKey("learning_sessions.id"), index=True)
+    topic = Column(String)
     prompt_text = Column(Text, nullable=False)
+    context = Column(Text)
     difficulty = Column(String)  # easy/medium/hard
     hints = Column(JSON)  # Array of 3 hints
     solution_steps = Column(JSON)  # Step-by-step solution
     answer = Column(Text)
+    solution_explanation = Column(Text)
     mastery_indicator = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    inventory_key = Column(String, index=True)  # topic|difficulty|grade|style bucket for stocked problems
+    grade_level = Column(String)
+    learning_style = Column(String)
+    served_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
     session = relationship("LearningSession", back_populates="problems")
+    deliveries = relationship("ProblemDelivery", back_populates="problem")
+
+class ProblemDelivery(Base):
+    __tablename__ = "problem_deliveries"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    problem_id = Column(String, ForeignKey("practice_problems.id"), index=True)
+    student_id = Column(String, ForeignKey("students.id"), index=True)
+    delivered_at = Column(DateTime, default=datetime.utcnow)
+    
+    problem = relationship("PracticeProblem", back_populates="deliveries")
 
 class Progress(Base):
     __tablename__ = "progress"
+    __table_args__ = (Index("ix_progress_student_updated", "student_id", "last_updated"),)
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    student_id = Column(String, ForeignKey("students.id"))
+    student_id = Column(String, ForeignKey("students.id"), index=True)
     topic = Column(String, nullable=False)
     mastery_score = Column(Float, default=0.0)  # 0-100
     strengths = Column(JSON)
     target_areas = Column(JSON)
     recommendations = Column(JSON)
+    attempt_count = Column(Integer)
+    last_updated = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    student = relationship("Student", back_populates="progress_records")
+
+class ProgressRollup(Base):
+    __tablename__ = "progress_rollups"
+    __table_args__ = (UniqueConstraint("student_id", "topic", name="uq_progress_rollup_student_topic"),)
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    student_id = Column(String, ForeignKey("students.id"), nullable=False, index=True)
+    topic = Column(String, nullable=False)
+    mastery_score = Column(Float, default=0.0)  # latest score, 0-100
+    previous_score = Column(Float)
+    trend = Column(String)  # new/up/down/flat
+    attempt_count = Column(Integer, default=0)  # attempts across all records
+    record_count = Column(Integer, default=0)
+    strengths = Column(JSON)
+    target_areas = Column(JSON)
+    recommendations = Column(JSON)
+    latest_progress_id = Column(String)
+    last_updated = Column(DateTime, default=datetime.utcnow)
+
+class AttemptEvent(Base):
+    __tablename__ = "attempt_events"
+    __table_args__ = (
+        UniqueConstraint("student_id", "idempotency_key", name="uq_attempt_event_idempotency"),
+        Index("ix_attempt_events_student_occurred", "student_id", "occurred_at"),
+    )
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    student_id = Column(String, ForeignKey("students.id"), nullable=False)
+    topic = Column(String, nullable=False)
+    skill = Column(String, nullable=False)  # defaults to the topic
+    problem_id = Column(String)
+    correct = Column(Boolean, nullable=False)
+    hints_used = Column(Integer, default=0)
+    time_seconds = Column(Float)
+    idempotency_key = Column(String)  # client-chosen; a repeated key is acknowledged but not stored again
+    occurred_at = Column(DateTime, default=datetime.utcnow)
+    received_at = Column(DateTime, default=datetime.utcnow)
+
+class SkillState(Base):
+    __tablename__ = "skill_states"
+    __table_args__ = (UniqueConstraint("student_id", "topic", "skill", name="uq_skill_state_student_skill"),)
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    student_id = Column(String, ForeignKey("students.id"), nullable=False, index=True)
+    topic = Column(String, nullable=False)
+    skill = Column(String, nullable=False)
+    p_mastery = Column(Float, nullable=False)  # knowledge-tracing probability the skill is learned
+    attempt_count = Column(Integer, default=0)
+    correct_count = Column(Integer, default=0)
+    hint_count = Column(Integer, default=0)
+    last_event_at = Column(DateTime)
     last_updated = Column(DateTime, default=datetime.utcnow)
+
+class DiagnosticItem(Base):
+    __tablename__ = "diagnostic_items"
+    __table_args__ = (Index("ix_diagnostic_items_cell", "topic_key", "difficulty", "skill"),)
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    topic = Column(String, nullable=False)
+    topic_key = Column(String, nullable=False)  # normalized topic the bank is keyed by
+    skill = Column(String)
+    difficulty = Column(String, nullable=False)  # easy/medium/hard
+    question = Column(Text, nullable=False)
+    options = Column(JSON)
+    correct_answer = Column(Text)
+    served_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class CachedResponse(Base):
+    __tablename__ = "cached_responses"
     
-    student = relationship("Student", back_populates="progress_records")
\ No newline at end of file
+    key = Column(String, primary_key=True)  # sha256 of method, prompts and model
+    method = Column(String, nullable=False, index=True)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
+
+class Job(Base):
+    """A long generation run by the job workers instead of inside the HTTP request"""
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued/running/succeeded/failed
+    payload = Column(JSON)
+    result = Column(JSON)
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    session_id = Column(String, ForeignKey("learning_sessions.id"), index=True)
+    worker_id = Column(String)
+    run_after = Column(DateTime, default=datetime.utcnow)
+    lease_expires_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -0,0 +1,101 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+_NO_FALLBACK = object()
+
+
+class Step:
+    """One generation step of a composite endpoint.
+
+    `func` is called with the results of the steps named in `depends_on` as
+    keyword arguments and must return an awaitable. A step that fails or
+    exceeds `timeout` seconds resolves to `fallback` when one is given;
+    otherwise the whole run fails with the step's error.
+    """
+
+    def __init__(self, name: str, func: Callable[..., Awaitable], depends_on: Iterable[str] = (),
+                 timeout: Optional[float] = None, fallback: Any = _NO_FALLBACK):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        self.fallback = fallback
+
+    @property
+    def has_fallback(self) -> bool:
+        return self.fallback is not _NO_FALLBACK
+
+
+class StepResults:
+    """Values of a run, plus the error of every step that fell back"""
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self.errors: Dict[str, str] = {}
+
+    def __getitem__(self, name: str):
+        return self.values[name]
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.errors)
+
+
+def _check_graph(steps: Dict[str, Step]):
+    visiting, done = set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependency cycle at step '{name}'")
+        visiting.add(name)
+        for dep in steps[name].depends_on:
+            if dep not in steps:
+                raise ValueError(f"Step '{name}' depends on unknown step '{dep}'")
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+
+    for name in steps:
+        visit(name)
+
+
+async def run_steps(steps: Iterable[Step]) -> StepResults:
+    """Run steps as soon as their dependencies finish.
+
+    Independent steps run concurrently, so the run takes as long as its
+    slowest dependency chain rather than the sum of all steps.
+    """
+    by_name = {step.name: step for step in steps}
+    _check_graph(by_name)
+
+    results = StepResults()
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def execute(step: Step):
+        kwargs = {}
+        for dep in step.depends_on:
+            await tasks[dep]
+            kwargs[dep] = results.values[dep]
+        try:
+            value = await asyncio.wait_for(step.func(**kwargs), step.timeout)
+        except Exception as e:
+            if not step.has_fallback:
+                raise
+            message = f"timed out after {step.timeout}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+            results.errors[step.name] = message or type(e).__name__
+            value = step.fallback
+        results.values[step.name] = value
+
+    for step in by_name.values():
+        tasks[step.name] = asyncio.ensure_future(execute(step))
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+    return results
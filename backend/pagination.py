@@ -0,0 +1,60 @@
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(timestamp: datetime, row_id: str) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), row_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(query, timestamp_column, id_column, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+    """Keyset pagination, newest first, over (timestamp, id).
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    Each page is an index range scan, however deep the client pages.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            timestamp_column < timestamp,
+            and_(timestamp_column == timestamp, id_column < row_id)
+        ))
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
+
+
+def select_fields(model, default: list, optional: list, fields: str = None) -> list:
+    """Columns for a list endpoint: `default` plus any of `optional` named in `fields`.
+
+    `fields` is a comma separated list; "all" selects every optional column.
+    """
+    requested = [name.strip() for name in (fields or "").split(",") if name.strip()]
+    if requested == ["all"]:
+        requested = list(optional)
+    unknown = [name for name in requested if name not in optional and name not in default]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    names = list(default) + [name for name in optional if name in requested]
+    return [getattr(model, name) for name in names]
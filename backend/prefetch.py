@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, OrderedDict
+
+from dotenv import load_dotenv
+from sqlalchemy import update
+
+from config import env_flag
+from database import AsyncSessionLocal
+from metrics import PREFETCHES, PREFETCH_LOOKUPS
+from models import PracticeProblem
+from resilience import ProviderUnavailable, clear_deadline, collect_degraded, track_degraded
+from scheduler import SchedulerBusy, llm_priority
+from token_usage import set_endpoint
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("hints", "solution")
+
+# Prefetched results tracked for hit and waste accounting; the oldest are written off as wasted beyond this
+MAX_TRACKED = 10000
+
+
+def _parse_kinds(value: str) -> tuple:
+    kinds = tuple(kind.strip() for kind in value.split(",") if kind.strip())
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        raise ValueError(f"Unknown prefetch kinds: {', '.join(sorted(unknown))}")
+    return kinds
+
+
+def _values(kind: str, result) -> dict:
+    """PracticeProblem columns holding a generated result"""
+    if kind == "hints":
+        return {"hints": result}
+    answer, explanation = result.get("answer"), result.get("explanation")
+    return {
+        "solution_steps": result.get("steps", []),
+        "answer": None if answer is None else str(answer),
+        "solution_explanation": None if explanation is None else str(explanation)
+    }
+
+
+def _column(kind: str):
+    """The column that is NULL until a result of `kind` has been stored"""
+    return PracticeProblem.hints if kind == "hints" else PracticeProblem.solution_steps
+
+
+def _store(problem_id: str, kind: str, result):
+    """Write a result only where nothing is stored yet, so a concurrent write is never overwritten"""
+    return (
+        update(PracticeProblem)
+        .where(PracticeProblem.id == problem_id, _column(kind).is_(None))
+        .values(**_values(kind, result))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _stored(problem: PracticeProblem, kind: str):
+    if kind == "hints":
+        return problem.hints or None
+    if problem.solution_steps is None:
+        return None
+    return {"steps": problem.solution_steps, "answer": problem.answer, "explanation": problem.solution_explanation}
+
+
+class PrefetchBudget:
+    """Estimated tokens one request may still spend on prefetching"""
+
+    def __init__(self, tokens: int):
+        self.remaining = tokens
+
+    def spend(self, tokens: int) -> bool:
+        if tokens > self.remaining:
+            return False
+        self.remaining -= tokens
+        return True
+
+
+class Prefetcher:
+    """Speculative hints and solutions for practice problems just handed out.
+
+    Students usually open the hints or the solution of the problems they
+    were just given, so `schedule` starts generating them in the background
+    at the lowest scheduler priority and stores the results on the problem
+    rows. Asking for one while its prefetch is still running joins it, and
+    promotes its queued model calls to interactive priority, rather than
+    starting a second generation.
+
+    A request may spend at most `token_budget` estimated tokens on
+    prefetching, and nothing is prefetched while the model queue, counting
+    the prefetches already in flight, is half full. Prefetched results
+    nobody asks for within `use_window` seconds are counted as wasted.
+    """
+
+    def __init__(self, ai_service, enabled: bool = None, token_budget: int = None, kinds=None, use_window: float = None):
+        self.ai_service = ai_service
+        self.enabled = enabled if enabled is not None else env_flag("PREFETCH_ENABLED", False)
+        self.token_budget = token_budget if token_budget is not None else int(os.getenv("PREFETCH_TOKEN_BUDGET", "4000"))
+        self.kinds = tuple(kinds) if kinds is not None else _parse_kinds(os.getenv("PREFETCH_KINDS", "hints,solution"))
+        self.use_window = use_window if use_window is not None else float(os.getenv("PREFETCH_USE_WINDOW_SECONDS", "3600"))
+
+        self._tasks = {}  # (problem id, kind) -> prefetch task
+        self._unused = OrderedDict()  # (problem id, kind) -> when a prefetch finished that nobody has asked for yet
+        self.outcomes = Counter()
+        self.lookups = Counter()
+        self.tokens_budgeted = 0
+
+    def budget(self) -> PrefetchBudget:
+        """A fresh per-request budget, for callers that schedule problems in several batches"""
+        return PrefetchBudget(self.token_budget)
+
+    @staticmethod
+    def _tag(problem_id: str, kind: str) -> str:
+        return f"prefetch|{problem_id}|{kind}"
+
+    def _count(self, kind: str, outcome: str):
+        self.outcomes[outcome] += 1
+        PREFETCHES.inc(kind, outcome)
+
+    def _record(self, kind: str, source: str):
+        self.lookups[source] += 1
+        PREFETCH_LOOKUPS.inc(kind, source)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.use_window
+        while self._unused:
+            key, finished = next(iter(self._unused.items()))
+            if finished >= cutoff and len(self._unused) <= MAX_TRACKED:
+                break
+            del self._unused[key]
+            self._count(key[1], "wasted")
+
+    def _local(self, kind: str, topic: str, text: str):
+        if kind == "hints":
+            return self.ai_service.local.hints(topic, text)
+        return self.ai_service.local.solution(topic, text)
+
+    def _estimate(self, kind: str, topic: str, difficulty: str, text: str) -> int:
+        if kind == "hints":
+            return self.ai_service.estimate_tokens("generate_hints", topic=topic, difficulty=difficulty, problem=text)
+        return self.ai_service.estimate_tokens("generate_solution", topic=topic, problem=text)
+
+    async def _generate(self, kind: str, topic: str, difficulty: str, text: str):
+        if kind == "hints":
+            return await self.ai_service.generate_hints(problem=text, difficulty=difficulty, topic=topic)
+        return await self.ai_service.generate_solution(problem=text, topic=topic)
+
+    def schedule(self, problems: list, topic: str, budget: PrefetchBudget = None) -> int:
+        """Start prefetching for stored problems (dicts with id, prompt and difficulty); returns how many were started"""
+        if not self.enabled or not problems:
+            return 0
+        self._expire()
+        budget = budget if budget is not None else self.budget()
+        scheduler = self.ai_service.scheduler
+        started = 0
+        for problem in problems:
+            problem_id, text = problem.get("id"), problem.get("prompt")
+            if not problem_id or not text:
+                continue
+            difficulty = problem.get("difficulty") or "medium"
+            for kind in self.kinds:
+                key = (problem_id, kind)
+                if key in self._tasks or key in self._unused:
+                    continue
+                # The local engine answers instantly, so there is nothing to gain
+                if self._local(kind, topic, text) is not None:
+                    continue
+                # Each prefetch in flight is about to queue a model call too
+                if (scheduler.queue_depth + len(self._tasks)) * 2 >= scheduler.max_queue:
+                    self._count(kind, "skipped_busy")
+                    continue
+                estimate = self._estimate(kind, topic, difficulty, text)
+                if not budget.spend(estimate):
+                    self._count(kind, "skipped_budget")
+                    continue
+                self.tokens_budgeted += estimate
+                task = asyncio.create_task(self._prefetch(problem_id, kind, topic, difficulty, text))
+                self._tasks[key] = task
+                task.add_done_callback(lambda t, key=key: self._forget(key, t))
+                self._count(kind, "started")
+                started += 1
+        return started
+
+    async def _prefetch(self, problem_id: str, kind: str, topic: str, difficulty: str, text: str):
+        set_endpoint("prefetch")
+        # The task copied the context of the request that started it, which may already have been answered
+        clear_deadline()
+        # Its own set, so a failed prefetch does not flag the request that started it
+        reasons = track_degraded()
+        with llm_priority("background", tag=self._tag(problem_id, kind)):
+            result = await self._generate(kind, topic, difficulty, text)
+        # Placeholder content is not stored; asking for it later generates it again
+        if reasons:
+            raise ProviderUnavailable("degraded", f"Model unavailable for {', '.join(sorted(reasons))}")
+        # A student may have been served in the meantime
+        async with AsyncSessionLocal() as db:
+            await db.execute(_store(problem_id, kind, result))
+            await db.commit()
+        self._unused[(problem_id, kind)] = time.monotonic()
+        return result
+
+    def _forget(self, key: tuple, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if task.cancelled():
+            return
+        if isinstance(task.exception(), SchedulerBusy):
+            self._count(key[1], "skipped_busy")
+        elif task.exception() is not None:
+            self._count(key[1], "failed")
+            logger.warning("Prefetching %s for problem %s failed: %s", key[1], key[0], task.exception())
+        else:
+            self._count(key[1], "completed")
+
+    async def lookup(self, db, problem: PracticeProblem, kind: str):
+        """A stored problem's hints or solution: stored, joined from a prefetch in flight, or generated now and stored"""
+        self._expire()
+        key = (problem.id, kind)
+        stored = _stored(problem, kind)
+        if stored is not None:
+            self._record(kind, "prefetched" if self._unused.pop(key, None) is not None else "stored")
+            return stored
+
+        task = self._tasks.get(key)
+        if task is not None:
+            # A student is waiting now, so the prefetch should not wait behind other background work
+            self.ai_service.scheduler.promote(self._tag(problem.id, kind), "interactive")
+            try:
+                result = await asyncio.shield(task)
+            except Exception:
+                result = None
+            if result is not None:
+                self._unused.pop(key, None)
+                self._record(kind, "joined")
+                return result
+
+        self._record(kind, "generated")
+        with collect_degraded() as reasons:
+            result = await self._generate(kind, problem.topic or "General", problem.difficulty or "medium", problem.prompt_text)
+        if reasons:
+            # Placeholder content is served but not stored, so the next request asks the model again
+            return result
+        await db.execute(_store(problem.id, kind, result))
+        await db.commit()
+        # A prefetch that finished first keeps its result; serve whatever was stored
+        await db.refresh(problem)
+        self._unused.pop(key, None)
+        return _stored(problem, kind)
+
+    async def stop(self):
+        """Cancel the prefetches still running"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        self._expire()
+        lookups = sum(self.lookups.values())
+        served = self.lookups["prefetched"] + self.lookups["joined"]
+        settled = served + self.outcomes["wasted"]
+        return {
+            "enabled": self.enabled,
+            "kinds": list(self.kinds),
+            "token_budget_per_request": self.token_budget,
+            "in_flight": len(self._tasks),
+            "unused": len(self._unused),
+            "outcomes": dict(self.outcomes),
+            "lookups": dict(self.lookups),
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+            "waste_rate": round(self.outcomes["wasted"] / settled, 4) if settled else 0.0,
+            "tokens_budgeted": self.tokens_budgeted
+        }
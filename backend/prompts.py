@@ -0,0 +1,90 @@
+import os
+import string
+from collections import namedtuple
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROMPTS_DIR = Path(os.getenv("PROMPTS_DIR", Path(__file__).resolve().parent.parent / "prompts"))
+
+# Section headings in the prompt library and the generator each one belongs to
+SECTION_METHODS = {
+    "Hint Generation Prompt": "generate_hints",
+    "Solution Generation Prompt": "generate_solution",
+    "Problem Generation Prompt": "generate_practice_problems",
+    "Progress Summary Prompt": "generate_progress_summary",
+    "Lesson Plan Prompt": "generate_lesson_plan",
+    "Diagnostic Assessment Prompt": "generate_diagnostic_assessment",
+}
+
+
+class PromptTemplate(namedtuple("PromptTemplate", ["method", "system", "user", "fields"])):
+    """A static system message plus the user prompt template for one generator"""
+
+    def render(self, **values) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Prompt for {self.method} is missing values: {', '.join(sorted(missing))}")
+        return self.user.format(**{name: _clean(value) for name, value in values.items()})
+
+
+def _clean(value) -> str:
+    """Render a value without stray surrounding whitespace"""
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_clean(item) for item in value)
+    return str(value).strip()
+
+
+def parse_library(text: str) -> dict:
+    """Split a prompt library file into PromptTemplates keyed by method"""
+    sections, heading, lines = {}, None, []
+    for line in text.splitlines():
+        if line.startswith("## "):
+            if heading:
+                sections[heading] = lines
+            heading, lines = line[3:].strip(), []
+        elif heading:
+            lines.append(line)
+    if heading:
+        sections[heading] = lines
+
+    templates = {}
+    for heading, lines in sections.items():
+        method = SECTION_METHODS.get(heading)
+        if method is None:
+            continue
+        body = "\n".join(lines)
+        system, _, user = body.partition("\n### User\n")
+        system, user = system.strip(), user.strip()
+        if not user:
+            raise ValueError(f"Prompt section '{heading}' has no '### User' template")
+        fields = {name for _, name, _, _ in string.Formatter().parse(user) if name}
+        templates[method] = PromptTemplate(method, system, user, frozenset(fields))
+    return templates
+
+
+class PromptRegistry:
+    """Prompt templates for every generator, read from the prompts directory once.
+
+    System messages carry no per-request data, so every call for a method
+    starts with the same bytes and the provider can reuse its cached prefix.
+    """
+
+    def __init__(self, directory: Path = None):
+        self.directory = Path(directory) if directory is not None else PROMPTS_DIR
+        self.templates = {}
+        for path in sorted(self.directory.glob("*.txt")):
+            self.templates.update(parse_library(path.read_text(encoding="utf-8")))
+        missing = set(SECTION_METHODS.values()) - self.templates.keys()
+        if missing:
+            raise ValueError(f"No prompt templates in {self.directory} for: {', '.join(sorted(missing))}")
+
+    def render(self, method: str, **values):
+        """Return (system_message, prompt) for one call"""
+        template = self.templates[method]
+        return template.system, template.render(**values)
+
+    def system(self, method: str) -> str:
+        return self.templates[method].system
@@ -0,0 +1,177 @@
+import contextvars
+import os
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+import numpy as np
+from dotenv import load_dotenv
+
+from config import env_flag
+
+load_dotenv()
+
+_deadline = contextvars.ContextVar("llm_deadline", default=None)
+# One mutable set per request; tasks started by the request copy the context and so share it
+_degraded = contextvars.ContextVar("degraded_reasons", default=None)
+
+
+class ProviderUnavailable(Exception):
+    """A model call was not attempted or did not finish; `cause` says why"""
+
+    def __init__(self, cause: str, detail: str = ""):
+        super().__init__(detail or cause)
+        self.cause = cause
+
+
+def set_deadline(seconds: float):
+    """Give the model calls made from the current context `seconds` from now, in total"""
+    _deadline.set(time.monotonic() + seconds)
+
+
+def clear_deadline():
+    """Lift the deadline for the rest of the current context, e.g. in background work a request started"""
+    _deadline.set(None)
+
+
+def time_left():
+    """Seconds until the current deadline, or None without one"""
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+def track_degraded() -> set:
+    """Start collecting the degraded-content reasons of the current request"""
+    reasons = set()
+    _degraded.set(reasons)
+    return reasons
+
+
+def mark_degraded(reason: str):
+    """Record that the current request is being served placeholder or partial content"""
+    reasons = _degraded.get()
+    if reasons is not None:
+        reasons.add(reason)
+
+
+def degraded_reasons() -> list:
+    return sorted(_degraded.get() or ())
+
+
+@contextmanager
+def collect_degraded():
+    """Collect the degraded-content reasons of the calls made inside the block.
+
+    The reasons are also passed on to the enclosing request, if any, so its
+    response is still flagged.
+    """
+    outer = _degraded.get()
+    reasons = set()
+    token = _degraded.set(reasons)
+    try:
+        yield reasons
+    finally:
+        _degraded.reset(token)
+        if outer is not None:
+            outer.update(reasons)
+
+
+class CircuitBreaker:
+    """Stops sending requests to a provider that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls are refused at once, so requests get their fallback content
+    without waiting on the provider. Every `reset_seconds` one trial call
+    is let through; its success closes the circuit again, its failure
+    keeps it open.
+    """
+
+    def __init__(self, failure_threshold: int = None, reset_seconds: float = None, enabled: bool = None):
+        self.enabled = enabled if enabled is not None else env_flag("LLM_BREAKER_ENABLED", True)
+        self.failure_threshold = failure_threshold if failure_threshold is not None else int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+        self.reset_seconds = reset_seconds if reset_seconds is not None else float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if self._trial else "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; while open, one trial call per `reset_seconds` does"""
+        if not self.enabled or self._opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self._opened_at >= self.reset_seconds:
+            # Restarting the clock also covers a trial call that never reported back
+            self._opened_at = now
+            self._trial = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._trial or (self._opened_at is None and self._failures >= self.failure_threshold):
+            self._opened_at = time.monotonic()
+            self._trial = False
+            self.opened += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_seconds": self.reset_seconds,
+            "times_opened": self.opened,
+            "rejected_calls": self.rejected
+        }
+
+
+class LatencyTracker:
+    """Recent model call latencies per method, for picking the hedging delay"""
+
+    def __init__(self, percentile: float = None, min_delay: float = None, window: int = 200, min_samples: int = 20,
+                 enabled: bool = None):
+        self.enabled = enabled if enabled is not None else env_flag("LLM_HEDGE_ENABLED", True)
+        self.percentile = percentile if percentile is not None else float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+        self.min_delay = min_delay if min_delay is not None else float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1"))
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self.hedges = Counter()
+
+    def observe(self, method: str, seconds: float):
+        samples = self._samples.get(method)
+        if samples is None:
+            samples = self._samples[method] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def hedge_delay(self, method: str):
+        """How long to wait for a reply before sending a duplicate request, or None not to hedge"""
+        samples = self._samples.get(method)
+        if not self.enabled or samples is None or len(samples) < self.min_samples:
+            return None
+        return max(self.min_delay, float(np.percentile(samples, self.percentile)))
+
+    def stats(self) -> dict:
+        delays = {method: self.hedge_delay(method) for method in self._samples}
+        return {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "min_delay_seconds": self.min_delay,
+            "hedge_delay_seconds": {method: round(delay, 3) for method, delay in delays.items() if delay is not None},
+            "hedges": dict(self.hedges)
+        }
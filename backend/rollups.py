@@ -0,0 +1,103 @@
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Progress, ProgressRollup
+
+# Score changes smaller than this count as a flat trend
+TREND_TOLERANCE = 1.0
+
+
+def _trend(previous: float, current: float) -> str:
+    if previous is None:
+        return "new"
+    if current - previous > TREND_TOLERANCE:
+        return "up"
+    if previous - current > TREND_TOLERANCE:
+        return "down"
+    return "flat"
+
+
+def _load(db: Session, keys: set) -> dict:
+    student_ids = {student_id for student_id, _ in keys}
+    topics = {topic for _, topic in keys}
+    rows = db.query(ProgressRollup).filter(
+        ProgressRollup.student_id.in_(student_ids),
+        ProgressRollup.topic.in_(topics)
+    ).all()
+    return {(row.student_id, row.topic): row for row in rows if (row.student_id, row.topic) in keys}
+
+
+def _apply(db: Session, entries: list, rollups: dict):
+    for entry in entries:
+        key = (entry["student_id"], entry["topic"])
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollup = ProgressRollup(student_id=entry["student_id"], topic=entry["topic"], attempt_count=0, record_count=0)
+            db.add(rollup)
+            rollups[key] = rollup
+            previous = None
+        else:
+            previous = rollup.mastery_score
+
+        rollup.previous_score = previous
+        rollup.mastery_score = entry["mastery_score"]
+        rollup.trend = _trend(previous, entry["mastery_score"])
+        rollup.attempt_count = (rollup.attempt_count or 0) + (entry.get("attempt_count") or 0)
+        rollup.record_count = (rollup.record_count or 0) + 1
+        rollup.strengths = entry.get("strengths") or []
+        rollup.target_areas = entry.get("target_areas") or []
+        rollup.recommendations = entry.get("recommendations") or []
+        rollup.latest_progress_id = entry["id"]
+        rollup.last_updated = entry.get("last_updated") or datetime.utcnow()
+
+
+def record_progress(db: Session, entries: list):
+    """Fold new progress rows, given as dicts in write order, into their rollups.
+
+    Runs in the caller's transaction; the caller commits. Each entry costs
+    O(1) regardless of how much history the student has.
+    """
+    if not entries:
+        return
+    keys = {(entry["student_id"], entry["topic"]) for entry in entries}
+    try:
+        with db.begin_nested():
+            _apply(db, entries, _load(db, keys))
+    except IntegrityError:
+        # A concurrent request created one of the rollups first; fold into the stored row
+        _apply(db, entries, _load(db, keys))
+
+
+def update_summaries(db: Session, summaries: dict):
+    """Copy late-arriving summaries, keyed by progress id, onto rollups that still point at them"""
+    if not summaries:
+        return
+    rows = db.query(ProgressRollup).filter(ProgressRollup.latest_progress_id.in_(list(summaries))).all()
+    for rollup in rows:
+        summary = summaries[rollup.latest_progress_id]
+        rollup.strengths = summary.get("strengths", [])
+        rollup.target_areas = summary.get("target_areas", [])
+        rollup.recommendations = summary.get("recommendations", [])
+
+
+def rebuild_rollups(db: Session, student_id: str) -> list:
+    """Build a student's rollups from their full history, for data written before rollups existed"""
+    history = db.query(Progress).filter(Progress.student_id == student_id).order_by(Progress.last_updated, Progress.id).all()
+    record_progress(db, [
+        {
+            "id": row.id,
+            "student_id": row.student_id,
+            "topic": row.topic,
+            "mastery_score": row.mastery_score,
+            "strengths": row.strengths,
+            "target_areas": row.target_areas,
+            "recommendations": row.recommendations,
+            "attempt_count": row.attempt_count,
+            "last_updated": row.last_updated
+        }
+        for row in history
+    ])
+    db.commit()
+    return db.query(ProgressRollup).filter(ProgressRollup.student_id == student_id).all()
@@ -0,0 +1,202 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+
+from dotenv import load_dotenv
+
+from metrics import LLM_QUEUE_WAIT_SECONDS
+
+load_dotenv()
+
+# Lower value is served first
+PRIORITIES = {
+    "interactive": 0,
+    "standard": 1,
+    "batch": 2,
+    "background": 3,
+}
+
+METHOD_PRIORITIES = {
+    "generate_hints": "interactive",
+    "generate_solution": "interactive",
+    "generate_practice_problems": "standard",
+    "generate_progress_summary": "standard",
+    "generate_lesson_plan": "batch",
+    "generate_diagnostic_assessment": "batch",
+}
+
+_priority_override = contextvars.ContextVar("llm_priority_override", default=None)
+_priority_tags = contextvars.ContextVar("llm_priority_tags", default=())
+
+
+@contextmanager
+def llm_priority(name: str, tag: str = None):
+    """Run the LLM calls made inside this block at priority `name`.
+
+    Calls made under a `tag` can be moved up the queue later with
+    LLMScheduler.promote, e.g. once a user is waiting on background work.
+    """
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{name}'")
+    token = _priority_override.set(name)
+    tags_token = _priority_tags.set(_priority_tags.get() + ((tag,) if tag is not None else ()))
+    try:
+        yield
+    finally:
+        _priority_tags.reset(tags_token)
+        _priority_override.reset(token)
+
+
+@contextmanager
+def priority_tag(tag: str):
+    """Add `tag` to the LLM calls made inside this block, keeping their priority and outer tags"""
+    token = _priority_tags.set(_priority_tags.get() + (tag,))
+    try:
+        yield
+    finally:
+        _priority_tags.reset(token)
+
+
+def priority_for(method: str) -> str:
+    return _priority_override.get() or METHOD_PRIORITIES.get(method, "standard")
+
+
+class SchedulerBusy(Exception):
+    """Raised when the LLM queue is full; `retry_after` is a hint in seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """Admission control for LLM calls.
+
+    At most `max_concurrency` calls run at once. Further calls wait in a
+    priority queue, so interactive requests overtake queued lesson plans,
+    and are rejected with SchedulerBusy once `max_queue` calls are waiting.
+    """
+
+    def __init__(self, max_concurrency: int = None, max_queue: int = None):
+        self.max_concurrency = max_concurrency if max_concurrency is not None else int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("LLM_MAX_QUEUE", "64"))
+
+        self._active = 0
+        self._waiters = []  # heap of [priority value, sequence, future, priority name, tags]
+        self._sequence = itertools.count()
+        self._avg_service_seconds = 5.0
+
+        self.admitted = Counter()
+        self.rejected = Counter()
+        self.wait_seconds_total = Counter()
+        self.wait_seconds_max = {}
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Estimate how long until a queue slot frees up"""
+        waves = (self.queue_depth + 1) / max(self.max_concurrency, 1)
+        return min(max(math.ceil(waves * self._avg_service_seconds), 1), 60)
+
+    def check_capacity(self):
+        """Raise SchedulerBusy now if a new call would be rejected"""
+        if self._active >= self.max_concurrency and self.queue_depth >= self.max_queue:
+            raise SchedulerBusy(self.retry_after())
+
+    async def acquire(self, priority: str):
+        start = time.monotonic()
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self._record_wait(priority, 0.0)
+            return
+
+        if self.queue_depth >= self.max_queue:
+            self.rejected[priority] += 1
+            raise SchedulerBusy(self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [PRIORITIES[priority], next(self._sequence), future, priority, _priority_tags.get()]
+        heapq.heappush(self._waiters, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation
+                self.release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+        self._record_wait(priority, time.monotonic() - start)
+
+    def promote(self, tag: str, priority: str) -> int:
+        """Raise queued calls made under `tag` to `priority`; returns how many were waiting"""
+        promoted = 0
+        for entry in self._waiters:
+            if tag in entry[4] and entry[0] > PRIORITIES[priority]:
+                entry[0], entry[3] = PRIORITIES[priority], priority
+                promoted += 1
+        if promoted:
+            heapq.heapify(self._waiters)
+        return promoted
+
+    def try_acquire(self, priority: str) -> bool:
+        """Take a slot only if one is free right now, without queueing; pair a True with release()"""
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self._record_wait(priority, 0.0)
+            return True
+        return False
+
+    def release(self):
+        """Hand the slot to the most urgent waiter, or free it"""
+        while self._waiters:
+            future = heapq.heappop(self._waiters)[2]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: str):
+        """Hold one concurrency slot for the duration of the block"""
+        await self.acquire(priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_service_seconds = 0.9 * self._avg_service_seconds + 0.1 * (time.monotonic() - start)
+            self.release()
+
+    def _record_wait(self, priority: str, seconds: float):
+        self.admitted[priority] += 1
+        self.wait_seconds_total[priority] += seconds
+        self.wait_seconds_max[priority] = max(self.wait_seconds_max.get(priority, 0.0), seconds)
+        LLM_QUEUE_WAIT_SECONDS.observe(seconds, priority)
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "avg_service_seconds": round(self._avg_service_seconds, 3),
+            "priorities": {
+                name: {
+                    "admitted": self.admitted[name],
+                    "rejected": self.rejected[name],
+                    "avg_wait_ms": round(1000 * self.wait_seconds_total[name] / self.admitted[name], 2) if self.admitted[name] else 0.0,
+                    "max_wait_ms": round(1000 * self.wait_seconds_max.get(name, 0.0), 2),
+                    "queued": sum(1 for entry in self._waiters if entry[3] == name)
+                }
+                for name in PRIORITIES
+            }
+        }
@@ -0,0 +1,245 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class Payload(BaseModel):
+    """Generated content: the documented fields plus whatever else the model returned"""
+    model_config = ConfigDict(extra="allow")
+
+
+class StudentOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    name: Optional[str] = None
+    age_group: Optional[str] = None
+    grade_level: Optional[str] = None
+    learning_style: Optional[str] = None
+    prior_mastery: Optional[float] = None
+    goals: Optional[str] = None
+    pacing_pref: Optional[str] = None
+    accessibility_needs: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+class StudentPage(BaseModel):
+    items: List[StudentOut]
+    next_cursor: Optional[str] = None
+
+
+class HintsOut(BaseModel):
+    hints: List[Any]
+    problem: str
+
+
+class SolutionOut(Payload):
+    steps: List[Any] = []
+    answer: Any = None
+    explanation: Any = None
+
+
+class ProblemOut(Payload):
+    id: Optional[str] = None
+    prompt: Any = None
+    difficulty: Optional[str] = None
+    context: Any = None
+
+
+class ProblemsOut(BaseModel):
+    problems: List[ProblemOut]
+
+
+class ProblemHintOut(BaseModel):
+    problem_id: str
+    level: int
+    hint: Any
+
+
+class ProgressSummary(Payload):
+    strengths: List[Any] = []
+    target_areas: List[Any] = []
+    recommendations: List[Any] = []
+    motivational_message: Any = None
+
+
+class ProgressOut(BaseModel):
+    mastery_score: float
+    summary: ProgressSummary
+    errors: Dict[str, str] = {}
+
+
+class ProgressBatchResult(BaseModel):
+    progress_id: str
+    student_id: str
+    topic: str
+    mastery_score: float
+    summary: ProgressSummary
+
+
+class ProgressBatchOut(BaseModel):
+    results: List[ProgressBatchResult]
+    summaries: str
+    errors: Dict[str, str] = {}
+
+
+class ProgressRecordOut(BaseModel):
+    id: str
+    student_id: str
+    topic: str
+    mastery_score: Optional[float] = None
+    strengths: Optional[List[Any]] = None
+    target_areas: Optional[List[Any]] = None
+    recommendations: Optional[List[Any]] = None
+    attempt_count: Optional[int] = None
+    last_updated: Optional[datetime] = None
+
+
+class ProgressPage(BaseModel):
+    items: List[ProgressRecordOut]
+    next_cursor: Optional[str] = None
+
+
+class ProgressRollupOut(BaseModel):
+    student_id: str
+    topic: str
+    mastery_score: Optional[float] = None
+    previous_score: Optional[float] = None
+    trend: Optional[str] = None
+    attempt_count: Optional[int] = None
+    record_count: Optional[int] = None
+    strengths: Optional[List[Any]] = None
+    target_areas: Optional[List[Any]] = None
+    recommendations: Optional[List[Any]] = None
+    last_updated: Optional[datetime] = None
+
+
+class AttemptResult(BaseModel):
+    event_id: str
+    duplicate: bool
+    student_id: str
+    topic: str
+    skill: str
+    mastery_score: Optional[float] = None
+
+
+class AttemptsOut(BaseModel):
+    results: List[AttemptResult]
+    accepted: int
+    duplicates: int
+
+
+class RecomputeOut(BaseModel):
+    events: int
+    skills: int
+
+
+class SkillStateOut(BaseModel):
+    topic: str
+    skill: str
+    mastery_score: float
+    attempt_count: int
+    correct_count: int
+    hint_count: int
+    last_event_at: Optional[datetime] = None
+    last_updated: Optional[datetime] = None
+
+
+class LessonPlanOut(Payload):
+    objectives: List[Any] = []
+    activities: List[Any] = []
+    materials: List[Any] = []
+
+
+class AdaptiveQuestion(Payload):
+    id: Optional[str] = None
+    question: Any = None
+    options: List[Any] = []
+    difficulty: Optional[str] = None
+    skill_tested: Optional[str] = None
+
+
+class DiagnosticQuestion(AdaptiveQuestion):
+    correct_answer: Any = None
+
+
+class DiagnosticOut(BaseModel):
+    questions: List[DiagnosticQuestion]
+
+
+class DiagnosticEstimate(BaseModel):
+    ability: float
+    standard_error: float
+    mastery_score: float
+    level: str
+    answered: int
+    skills: Dict[str, Dict[str, int]]
+
+
+class DiagnosticStep(BaseModel):
+    done: bool
+    question: Optional[AdaptiveQuestion] = None
+    estimate: DiagnosticEstimate
+
+
+class SessionOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    student_id: Optional[str] = None
+    topic: Optional[str] = None
+    unit_outline: Any = None
+    lesson_plan: Any = None
+    practice_set: Any = None
+    explanations: Any = None
+    progress_summary: Any = None
+    assessment: Any = None
+    created_at: Optional[datetime] = None
+
+
+class SessionPage(BaseModel):
+    items: List[SessionOut]
+    next_cursor: Optional[str] = None
+
+
+class SessionCreated(BaseModel):
+    session_id: str
+    topic: str
+    lesson_plan: LessonPlanOut
+    practice_problems: List[ProblemOut]
+    errors: Dict[str, str] = {}
+
+
+class JobAccepted(BaseModel):
+    job_id: str
+    status: str
+    session_id: Optional[str] = None
+    poll_url: str
+
+
+class JobOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    kind: str
+    status: str
+    attempts: int
+    max_attempts: int
+    session_id: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class HealthOut(BaseModel):
+    status: str
+    service: str
+
+
+class ReadinessOut(BaseModel):
+    ready: bool
+    draining: bool
+    pid: int
@@ -1,36 +1,148 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Header, Query, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict, Literal, Union
+from contextlib import asynccontextmanager
+from functools import partial
+import asyncio
+import logging
 import os
-from datetime import datetime
+import orjson
+import uuid
+from datetime import datetime, timezone
 
-from database import get_db, init_db
-from models import Student, LearningSession, PracticeProblem, Progress
+from config import env_flag
+from database import AsyncSessionLocal, get_async_db
+from models import Job, Student, LearningSession, PracticeProblem, Progress, ProgressRollup, SkillState
 from ai_service import AIEducatorService
+from orchestrator import Step, run_steps
+from inventory import Bucket, ProblemInventory
+from knowledge import record_attempts, recompute_skill_states
+from diagnostic_bank import DiagnosticBank
+from jobs import JobFailed, JobQueue
+from migrations import run_migrations
+from prefetch import Prefetcher
+from resilience import clear_deadline, collect_degraded, degraded_reasons, set_deadline, track_degraded
+from scheduler import SchedulerBusy, llm_priority
+from mastery import mastery_scores
+from metrics import PROFILER, REGISTRY, MetricsMiddleware
+from middleware import CompressionMiddleware, DegradedMiddleware, ETagMiddleware
+from pagination import paginate, select_fields
+from rollups import record_progress, rebuild_rollups, update_summaries
+from schemas import (
+    AttemptsOut, DiagnosticOut, DiagnosticStep, HealthOut, HintsOut, JobAccepted, JobOut, LessonPlanOut, ProblemHintOut, ProblemsOut,
+    ProgressBatchOut, ProgressOut, ProgressPage, ProgressRollupOut, ReadinessOut, RecomputeOut, SessionCreated, SessionOut,
+    SessionPage, SkillStateOut, SolutionOut, StudentOut, StudentPage
+)
+from token_usage import set_endpoint
 
-app = FastAPI(title="AI Personalized Tutor Console")
+logger = logging.getLogger(__name__)
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Schema changes on worker boot; the multi-worker launcher migrates once and turns this off for its workers
+DB_MIGRATE_ON_STARTUP = env_flag("DB_MIGRATE_ON_STARTUP", True)
+
+# Seconds a stopping worker keeps finishing in-flight requests before closing them
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30"))
+
+# Seconds the model calls of one request may take in total before placeholder content is served; 0 for no limit
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "60"))
+
+# Tighter budgets where a student is waiting on the answer
+DEFAULT_LLM_DEADLINES = {
+    "POST /api/hints": 10,
+    "GET /api/problems/{problem_id}/hints/{level}": 10,
+    "POST /api/solutions": 20,
+    "POST /api/solutions/stream": 30,
+    "GET /api/problems/{problem_id}/solution": 20,
+    "POST /api/problems": 30,
+    "POST /api/problems/stream": 30,
+    "POST /api/progress": 20,
+    "POST /api/diagnostic/next": 20,
+}
+
+def _parse_deadlines(value: str) -> dict:
+    """Per-route overrides written as `METHOD /path=seconds`, separated by commas"""
+    deadlines = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        route, _, seconds = entry.rpartition("=")
+        if not route.strip():
+            raise ValueError(f"Invalid LLM_DEADLINES entry '{entry}'")
+        deadlines[" ".join(route.split())] = float(seconds)
+    return deadlines
+
+LLM_DEADLINES = {**DEFAULT_LLM_DEADLINES, **_parse_deadlines(os.getenv("LLM_DEADLINES", ""))}
+
+async def warm_up(app: FastAPI):
+    """Slow startup work, run after the worker starts accepting connections"""
+    try:
+        await app.state.services.warm_up()
+    except Exception:
+        logger.exception("Warm-up failed; serving without it")
+    app.state.ready = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    app.state.draining = False
+    if DB_MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(run_migrations)
+    app.state.services.start()
+    warming = asyncio.create_task(warm_up(app))
+    yield
+    # uvicorn has stopped accepting connections and finished in-flight requests (up to SHUTDOWN_DRAIN_SECONDS)
+    app.state.ready = False
+    app.state.draining = True
+    if not warming.done():
+        warming.cancel()
+    await app.state.services.stop()
+
+async def track_endpoint(request: Request):
+    """Attribute the LLM tokens spent while serving a request to its route, and start its model call deadline"""
+    route = request.scope.get("route")
+    endpoint = f"{request.method} {route.path if route else request.url.path}"
+    set_endpoint(endpoint)
+    deadline = LLM_DEADLINES.get(endpoint, LLM_DEADLINE_SECONDS)
+    if deadline > 0:
+        set_deadline(deadline)
 
-# Initialize database
-init_db()
+async def scheduler_busy_handler(request: Request, exc: SchedulerBusy):
+    """Shed load with 429 instead of queueing LLM calls without bound"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+router = APIRouter()
+
+# The sampling profiler costs a thread and a stack walk per sample, so it is opt-in
+METRICS_PROFILER_ENABLED = env_flag("METRICS_PROFILER_ENABLED", False)
+
+# Per-step timeout for composite endpoints that fan out LLM calls
+STEP_TIMEOUT_SECONDS = float(os.getenv("LLM_STEP_TIMEOUT_SECONDS", "90"))
+
+# Progress summaries generated at once by a batch progress request
+SUMMARY_CONCURRENCY = int(os.getenv("PROGRESS_BATCH_SUMMARY_CONCURRENCY", "4"))
+
+# Columns returned by list endpoints; the detail columns are opt-in through ?fields=
+STUDENT_LIST_FIELDS = ["id", "name", "age_group", "grade_level", "learning_style", "prior_mastery", "pacing_pref", "created_at"]
+STUDENT_DETAIL_FIELDS = ["goals", "accessibility_needs"]
+SESSION_LIST_FIELDS = ["id", "student_id", "topic", "created_at"]
+SESSION_DETAIL_FIELDS = ["unit_outline", "lesson_plan", "practice_set", "explanations", "progress_summary", "assessment"]
 
-# Initialize AI service
-ai_service = AIEducatorService()
+# Longest a GET /api/jobs/{job_id} request may wait for the job to finish
+JOB_LONG_POLL_MAX_SECONDS = float(os.getenv("JOB_LONG_POLL_MAX_SECONDS", "30"))
 
-# Serve static files
-app.mount("/static", StaticFiles(directory="/app/frontend/static"), name="static")
+# Frontend files; override to run the server outside the container layout
+FRONTEND_DIR = os.getenv("FRONTEND_DIR", "/app/frontend")
 
 # Pydantic models for requests
 class StudentCreate(BaseModel):
@@ -47,6 +159,9 @@ class ProblemRequest(BaseModel):
     topic: str
     difficulty: str
     count: int = 3
+    student_id: Optional[str] = None
+    grade_level: Optional[str] = None
+    learning_style: Optional[str] = None
 
 class HintRequest(BaseModel):
     problem: str
@@ -69,24 +184,430 @@ class ProgressRequest(BaseModel):
     attempts: List[Dict]
     hints_used: List[List[str]]
 
+class ProgressBatchRequest(BaseModel):
+    records: List[ProgressRequest]
+    summaries: Literal["inline", "deferred", "none"] = "inline"
+
+class AttemptEventRequest(BaseModel):
+    student_id: str
+    topic: str
+    skill: Optional[str] = None
+    problem_id: Optional[str] = None
+    correct: bool
+    hints_used: int = 0
+    time_seconds: Optional[float] = None
+    idempotency_key: Optional[str] = None
+    occurred_at: Optional[datetime] = None
+
+class AttemptBatchRequest(BaseModel):
+    events: List[AttemptEventRequest]
+
 class DiagnosticRequest(BaseModel):
     topic: str
     num_questions: int = 5
+    # With ?async=true, the assessment is also stored on a new learning session for this student
+    student_id: Optional[str] = None
+
+class DiagnosticAnswer(BaseModel):
+    item_id: str
+    answer: Optional[str] = None
+    correct: Optional[bool] = None
+
+class AdaptiveDiagnosticRequest(BaseModel):
+    topic: str
+    answers: List[DiagnosticAnswer] = []
+    max_questions: int = 10
+
+class Services:
+    """The model service, problem inventory, item bank, job queue and prefetcher one app serves requests with.
+
+    Each app builds its own in create_app, so each worker process has its
+    own caches, scheduler slots and connection pools. The lifespan starts
+    and stops them, and routes get them through the get_services dependency.
+    """
+
+    def __init__(self):
+        self.ai_service = AIEducatorService()
+        self.problem_inventory = ProblemInventory(self.ai_service)
+        self.diagnostic_bank = DiagnosticBank(self.ai_service)
+        self.job_queue = JobQueue()
+        self.prefetcher = Prefetcher(self.ai_service)
+        self.job_queue.register("lesson_plan", partial(run_lesson_plan_job, self))
+        self.job_queue.register("session", partial(run_session_job, self))
+        self.job_queue.register("diagnostic", partial(run_diagnostic_job, self))
+
+    def register_gauges(self):
+        """Point-in-time values read when /api/metrics is scraped"""
+        REGISTRY.gauge("llm_scheduler_active", "Model calls holding a scheduler slot", lambda: {(): self.ai_service.scheduler.stats()["active"]})
+        REGISTRY.gauge("llm_scheduler_queue_depth", "Model calls waiting for a scheduler slot", lambda: {(): self.ai_service.scheduler.queue_depth})
+        REGISTRY.gauge("llm_inflight_requests", "Distinct model requests in flight after coalescing", lambda: {(): self.ai_service.singleflight.stats()["in_flight"]})
+        REGISTRY.gauge("llm_circuit_open", "1 while model calls are refused because the provider keeps failing", lambda: {(): int(self.ai_service.breaker.state == "open")})
+        REGISTRY.gauge("jobs_running", "Background jobs being run by this process", lambda: {(): self.job_queue.running})
+        REGISTRY.gauge("llm_cache_memory_entries", "Responses held in the in-memory cache tier", lambda: {(): self.ai_service.cache.stats()["entries"]})
+
+    def start(self):
+        # Background workers that keep the problem inventory and the diagnostic item bank stocked
+        self.problem_inventory.start()
+        self.diagnostic_bank.start()
+        # Workers for lesson plans, sessions and diagnostics requested with ?async=true
+        self.job_queue.start()
+
+    async def warm_up(self):
+        # Keep-alive connections to the model provider, plus the model client import
+        await self.ai_service.pool.start()
+        # Near-duplicate problem index, restored from its last snapshot
+        await self.ai_service.similar.start()
+
+    async def stop(self):
+        await self.job_queue.stop()
+        await self.prefetcher.stop()
+        await self.diagnostic_bank.stop()
+        await self.problem_inventory.stop()
+        await self.ai_service.similar.stop()
+        await self.ai_service.pool.close()
+
+def get_services(request: Request) -> Services:
+    return request.app.state.services
+
+def save_problems(db: Session, problems: list, topic: str, difficulty: str, session_id: str = None,
+                  commit: bool = True) -> list:
+    """Persist generated problems and return them with their database ids"""
+    rows = [
+        PracticeProblem(
+            session_id=session_id,
+            topic=topic,
+            prompt_text=problem.get("prompt", ""),
+            context=problem.get("context"),
+            difficulty=problem.get("difficulty") or difficulty
+        )
+        for problem in problems
+    ]
+    db.add_all(rows)
+    db.flush()
+    ids = [row.id for row in rows]
+    if commit:
+        db.commit()
+    return [{**problem, "id": problem_id} for problem, problem_id in zip(problems, ids)]
+
+async def problem_bucket(request: ProblemRequest, db: AsyncSession) -> Bucket:
+    """Resolve the inventory bucket for a problem request, using the student's profile if given"""
+    student = None
+    if request.student_id:
+        student = await db.get(Student, request.student_id)
+        if not student:
+            raise HTTPException(status_code=404, detail="Student not found")
+    return Bucket(
+        topic=request.topic,
+        difficulty=request.difficulty,
+        grade_level=request.grade_level or (student and student.grade_level) or "General",
+        learning_style=request.learning_style or (student and student.learning_style) or "mixed"
+    )
+
+async def generate_summaries(services: Services, records: List[ProgressRequest], scores: List[float]):
+    """Generate progress summaries with bounded concurrency at batch priority.
+    
+    Returns the summaries in record order, a dict of error messages keyed by
+    record index with {} as the summary of every record that errored, and the
+    set of indexes whose summary is placeholder content because the model was
+    unavailable.
+    """
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+    
+    async def summarize(record: ProgressRequest, score: float):
+        async with semaphore:
+            with collect_degraded() as reasons:
+                summary = await asyncio.wait_for(services.ai_service.generate_progress_summary(
+                    student_id=record.student_id,
+                    topic=record.topic,
+                    mastery_score=score,
+                    attempts=record.attempts
+                ), STEP_TIMEOUT_SECONDS)
+            return summary, bool(reasons)
+    
+    with llm_priority("batch"):
+        results = await asyncio.gather(
+            *[summarize(record, score) for record, score in zip(records, scores)],
+            return_exceptions=True
+        )
+    
+    summaries, errors, placeholders = [], {}, set()
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            errors[str(index)] = str(result) or type(result).__name__
+            summaries.append({})
+        else:
+            summary, placeholder = result
+            summaries.append(summary)
+            if placeholder:
+                placeholders.add(index)
+    return summaries, errors, placeholders
+
+async def fill_progress_summaries(services: Services, records: List[ProgressRequest], scores: List[float],
+                                  progress_ids: List[str]):
+    """Background task that writes deferred summaries onto already stored progress rows"""
+    # The response has been sent; the request's deadline and degraded flags no longer apply
+    clear_deadline()
+    track_degraded()
+    summaries, _, placeholders = await generate_summaries(services, records, scores)
+    # Rows whose summary is placeholder content keep their empty summary
+    filled = {
+        progress_id: summary
+        for index, (progress_id, summary) in enumerate(zip(progress_ids, summaries))
+        if summary and index not in placeholders
+    }
+    if not filled:
+        return
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Progress), [
+            {
+                "id": progress_id,
+                "strengths": summary.get("strengths", []),
+                "target_areas": summary.get("target_areas", []),
+                "recommendations": summary.get("recommendations", [])
+            }
+            for progress_id, summary in filled.items()
+        ])
+        await db.run_sync(update_summaries, filled)
+        await db.commit()
+
+def progress_row(progress: Progress) -> dict:
+    return {
+        "id": progress.id,
+        "student_id": progress.student_id,
+        "topic": progress.topic,
+        "mastery_score": progress.mastery_score,
+        "strengths": progress.strengths,
+        "target_areas": progress.target_areas,
+        "recommendations": progress.recommendations,
+        "attempt_count": progress.attempt_count,
+        "last_updated": progress.last_updated
+    }
+
+def rollup_dict(rollup: ProgressRollup) -> dict:
+    return {
+        "student_id": rollup.student_id,
+        "topic": rollup.topic,
+        "mastery_score": rollup.mastery_score,
+        "previous_score": rollup.previous_score,
+        "trend": rollup.trend,
+        "attempt_count": rollup.attempt_count,
+        "record_count": rollup.record_count,
+        "strengths": rollup.strengths,
+        "target_areas": rollup.target_areas,
+        "recommendations": rollup.recommendations,
+        "last_updated": rollup.last_updated
+    }
+
+def naive_utc(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC, like datetime.utcnow()"""
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def skill_state_dict(state: SkillState) -> dict:
+    return {
+        "topic": state.topic,
+        "skill": state.skill,
+        "mastery_score": round(state.p_mastery * 100, 2),
+        "attempt_count": state.attempt_count,
+        "correct_count": state.correct_count,
+        "hint_count": state.hint_count,
+        "last_event_at": state.last_event_at,
+        "last_updated": state.last_updated
+    }
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()}\n\n"
+
+def sse_response(services: Services, events) -> StreamingResponse:
+    """Stream (event, data) pairs from an async generator as Server-Sent Events"""
+    # Reject before the 200 response starts if the LLM queue is already full
+    services.ai_service.scheduler.check_capacity()
+    
+    async def body():
+        try:
+            async for event, data in events:
+                # Headers are long gone by the end of a stream, so placeholder content is flagged in the last event
+                reasons = degraded_reasons() if event == "done" else None
+                if reasons and isinstance(data, dict):
+                    data = {**data, "degraded": reasons}
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def student_profile(student: Student) -> dict:
+    return {
+        "grade_level": student.grade_level,
+        "learning_style": student.learning_style,
+        "pacing_pref": student.pacing_pref
+    }
+
+async def require_student(db: AsyncSession, student_id: str) -> Student:
+    student = await db.get(Student, student_id)
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return student
+
+def job_accepted(job: Job) -> ORJSONResponse:
+    """202 for a queued job, pointing at where to poll for it"""
+    poll_url = f"/api/jobs/{job.id}"
+    return ORJSONResponse(
+        status_code=202,
+        content={"job_id": job.id, "status": job.status, "session_id": job.session_id, "poll_url": poll_url},
+        headers={"Location": poll_url}
+    )
+
+async def build_lesson_plan(services: Services, student: Student, request: LessonPlanRequest) -> dict:
+    return await services.ai_service.generate_lesson_plan(
+        topic=request.topic,
+        unit_outline=request.unit_outline,
+        student_profile=student_profile(student),
+        session_length=request.session_length
+    )
+
+async def build_session(services: Services, db: AsyncSession, student: Student, session: LearningSession) -> dict:
+    """Generate a session's lesson plan and practice problems and store them on it, uncommitted"""
+    profile = student_profile(student)
+    # Lesson plan and problems are independent, so generate them concurrently
+    results = await run_steps([
+        Step("lesson_plan", lambda: services.ai_service.generate_lesson_plan(
+            topic=session.topic,
+            unit_outline=session.unit_outline,
+            student_profile=profile
+        ), timeout=STEP_TIMEOUT_SECONDS),
+        Step("problems", lambda: services.ai_service.generate_practice_problems(
+            topic=session.topic,
+            difficulty="medium",
+            count=3,
+            student_profile=profile
+        ), timeout=STEP_TIMEOUT_SECONDS, fallback=[])
+    ])
+    # Added only now so no write is pending while the model calls run
+    db.add(session)
+    session.lesson_plan = results["lesson_plan"]
+    # Store problems so their hints can be served per tier
+    problems = await db.run_sync(save_problems, results["problems"], session.topic, "medium", session.id, commit=False)
+    session.practice_set = problems
+    return {
+        "session_id": session.id,
+        "topic": session.topic,
+        "lesson_plan": session.lesson_plan,
+        "practice_problems": problems,
+        "errors": results.errors
+    }
+
+async def build_diagnostic(services: Services, db: AsyncSession, request: DiagnosticRequest) -> dict:
+    if not services.diagnostic_bank.enabled:
+        return await services.ai_service.generate_diagnostic_assessment(
+            topic=request.topic,
+            num_questions=request.num_questions
+        )
+    return await services.diagnostic_bank.assemble(db, request.topic, request.num_questions)
+
+async def job_session(db: AsyncSession, job: Job) -> Optional[LearningSession]:
+    return await db.get(LearningSession, job.session_id) if job.session_id else None
+
+async def run_lesson_plan_job(services: Services, db: AsyncSession, job: Job) -> dict:
+    request = LessonPlanRequest(**job.payload)
+    student = await db.get(Student, request.student_id)
+    if not student:
+        raise JobFailed("Student not found")
+    lesson_plan = await build_lesson_plan(services, student, request)
+    session = await job_session(db, job)
+    if session:
+        session.lesson_plan = lesson_plan
+    return lesson_plan
+
+async def run_session_job(services: Services, db: AsyncSession, job: Job) -> dict:
+    session = await job_session(db, job)
+    student = await db.get(Student, session.student_id) if session else None
+    if not student:
+        raise JobFailed("Student not found")
+    return await build_session(services, db, student, session)
+
+async def run_diagnostic_job(services: Services, db: AsyncSession, job: Job) -> dict:
+    assessment = await build_diagnostic(services, db, DiagnosticRequest(**job.payload))
+    session = await job_session(db, job)
+    if session:
+        session.assessment = assessment
+    return assessment
 
 # API Routes
 
-@app.get("/")
+@router.get("/", response_class=FileResponse)
 def read_root():
     """Serve the main HTML page"""
-    return FileResponse("/app/frontend/templates/index.html")
+    return FileResponse(os.path.join(FRONTEND_DIR, "templates", "index.html"))
+
+@router.get("/api/live", response_model=HealthOut)
+def liveness():
+    """The process is up and serving; restart it only when this fails"""
+    return {"status": "alive", "service": "AI Personalized Tutor Console"}
 
-@app.get("/api/health")
+@router.get("/api/ready", response_model=ReadinessOut, responses={503: {"model": ReadinessOut}})
+def readiness(request: Request):
+    """Whether to route traffic here: false while warming up and while draining for shutdown"""
+    state = request.app.state
+    ready = getattr(state, "ready", False)
+    body = {"ready": ready, "draining": getattr(state, "draining", False), "pid": os.getpid()}
+    if not ready:
+        return ORJSONResponse(body, status_code=503)
+    return body
+
+@router.get("/api/health", response_model=HealthOut)
 def health_check():
     return {"status": "ok", "service": "AI Tutor Console"}
 
+@router.get("/api/cache/stats", response_model=Dict[str, Any])
+def cache_stats(services: Services = Depends(get_services)):
+    """Get hit/miss counters for the LLM response cache"""
+    return services.ai_service.cache.stats()
+
+@router.get("/api/llm/stats", response_model=Dict[str, Any])
+def llm_stats(services: Services = Depends(get_services)):
+    """Get counters for the cache, coalescing, scheduling and connection layers of the AI service"""
+    return services.ai_service.stats()
+
+@router.get("/api/llm/tokens", response_model=Dict[str, Any])
+def llm_tokens(services: Services = Depends(get_services)):
+    """Get input and output token usage per endpoint and generator method"""
+    return services.ai_service.tokens.report()
+
+@router.get("/api/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Latency histograms, counters and gauges in the Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def require_profiler():
+    if not METRICS_PROFILER_ENABLED:
+        raise HTTPException(status_code=403, detail="Profiler is disabled; set METRICS_PROFILER_ENABLED=true")
+
+@router.post("/api/metrics/profiler/start", response_model=Dict[str, Any])
+async def start_profiler(interval_ms: float = 10, _: None = Depends(require_profiler)):
+    """Start sampling the event loop thread's stack every `interval_ms`"""
+    # Async so this runs on the event loop thread, which is the one sampled
+    PROFILER.start(interval_ms / 1000)
+    return PROFILER.stats()
+
+@router.post("/api/metrics/profiler/stop", response_model=Dict[str, Any])
+def stop_profiler(_: None = Depends(require_profiler)):
+    """Stop sampling; collected stacks stay available until the next start"""
+    PROFILER.stop()
+    return PROFILER.stats()
+
+@router.get("/api/metrics/profiler", response_class=PlainTextResponse)
+def profiler_stacks(_: None = Depends(require_profiler)):
+    """Collected samples as collapsed stacks, ready for a flame graph tool"""
+    return PlainTextResponse(PROFILER.collapsed())
+
 # Student Management
-@app.post("/api/students")
-def create_student(student: StudentCreate, db: Session = Depends(get_db)):
+@router.post("/api/students", response_model=StudentOut)
+async def create_student(student: StudentCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new student profile"""
     db_student = Student(
         name=student.name,
@@ -99,30 +620,34 @@ def create_student(student: StudentCreate, db: Session = Depends(get_db)):
         accessibility_needs=student.accessibility_needs
     )
     db.add(db_student)
-    db.commit()
-    db.refresh(db_student)
+    await db.commit()
+    await db.refresh(db_student)
     return db_student
 
-@app.get("/api/students")
-def get_students(db: Session = Depends(get_db)):
-    """Get all students"""
-    students = db.query(Student).all()
-    return students
+@router.get("/api/students", response_model=StudentPage, response_model_exclude_unset=True)
+async def get_students(cursor: Optional[str] = None, limit: int = 50, fields: Optional[str] = None,
+                       db: AsyncSession = Depends(get_async_db)):
+    """List students, newest first, one page at a time"""
+    columns = select_fields(Student, STUDENT_LIST_FIELDS, STUDENT_DETAIL_FIELDS, fields)
+    rows, next_cursor = await db.run_sync(
+        lambda session: paginate(session.query(*columns), Student.created_at, Student.id, cursor, limit)
+    )
+    return {"items": [row._asdict() for row in rows], "next_cursor": next_cursor}
 
-@app.get("/api/students/{student_id}")
-def get_student(student_id: str, db: Session = Depends(get_db)):
+@router.get("/api/students/{student_id}", response_model=StudentOut)
+async def get_student(student_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get a specific student"""
-    student = db.query(Student).filter(Student.id == student_id).first()
+    student = await db.get(Student, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     return student
 
 # Hint System (Priority 1)
-@app.post("/api/hints")
-async def generate_hints(request: HintRequest):
+@router.post("/api/hints", response_model=HintsOut)
+async def generate_hints(request: HintRequest, services: Services = Depends(get_services)):
     """Generate 3 tiered hints for a problem"""
     try:
-        hints = await ai_service.generate_hints(
+        hints = await services.ai_service.generate_hints(
             problem=request.problem,
             difficulty=request.difficulty,
             topic=request.topic
@@ -131,57 +656,163 @@ async def generate_hints(request: HintRequest):
             "hints": hints,
             "problem": request.problem
         }
+    except (HTTPException, SchedulerBusy):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/solutions")
-async def generate_solution(request: SolutionRequest):
+@router.post("/api/solutions", response_model=SolutionOut)
+async def generate_solution(request: SolutionRequest, services: Services = Depends(get_services)):
     """Generate step-by-step solution"""
     try:
-        solution = await ai_service.generate_solution(
+        solution = await services.ai_service.generate_solution(
             problem=request.problem,
             topic=request.topic
         )
         return solution
+    except (HTTPException, SchedulerBusy):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/api/solutions/stream", response_class=StreamingResponse)
+async def stream_solution(request: SolutionRequest, services: Services = Depends(get_services)):
+    """Stream solution steps as Server-Sent Events while they are generated"""
+    return sse_response(services, services.ai_service.stream_solution(
+        problem=request.problem,
+        topic=request.topic
+    ))
+
 # Practice Problems
-@app.post("/api/problems")
-async def generate_problems(request: ProblemRequest, db: Session = Depends(get_db)):
-    """Generate adaptive practice problems"""
+@router.post("/api/problems", response_model=ProblemsOut)
+async def generate_problems(request: ProblemRequest, db: AsyncSession = Depends(get_async_db),
+                            services: Services = Depends(get_services)):
+    """Serve adaptive practice problems from the inventory, generating any shortfall"""
+    bucket = await problem_bucket(request, db)
     try:
-        # Get default student profile if needed
-        student_profile = {"grade_level": "General", "learning_style": "mixed"}
-        
-        problems = await ai_service.generate_practice_problems(
-            topic=request.topic,
-            difficulty=request.difficulty,
-            count=request.count,
-            student_profile=student_profile
-        )
+        problems = await services.problem_inventory.take(db, bucket, request.count, request.student_id)
+        # Hints and solutions for these problems are the likely next requests
+        services.prefetcher.schedule(problems, bucket.topic)
         return {"problems": problems}
+    except (HTTPException, SchedulerBusy):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/api/problems/stream", response_class=StreamingResponse)
+async def stream_problems(request: ProblemRequest, db: AsyncSession = Depends(get_async_db),
+                          services: Services = Depends(get_services)):
+    """Stream practice problems as Server-Sent Events: stocked ones first, then newly generated ones"""
+    bucket = await problem_bucket(request, db)
+    stocked = await db.run_sync(services.problem_inventory.claim, bucket, request.count, request.student_id)
+    services.problem_inventory.record_request(request.count, len(stocked))
+    
+    async def events():
+        # The request's session is closed once the response starts, so the stream opens its own
+        async with AsyncSessionLocal() as db:
+            budget = services.prefetcher.budget()
+            saved = list(stocked)
+            services.prefetcher.schedule(stocked, bucket.topic, budget)
+            for problem in stocked:
+                yield "problem", problem
+            
+            shortfall = request.count - len(stocked)
+            if shortfall > 0:
+                # Generated problems handled so far, whether sent to the client or stocked
+                streamed = 0
+                async for event, data in services.ai_service.stream_practice_problems(
+                    topic=bucket.topic,
+                    difficulty=bucket.difficulty,
+                    count=shortfall,
+                    student_profile=bucket.student_profile,
+                    use_cache=False
+                ):
+                    # Problems that only appear in the final document are stored and sent here
+                    new_problems = [data] if event == "problem" else data[streamed:]
+                    streamed += len(new_problems)
+                    needed = request.count - len(saved)
+                    if new_problems[needed:]:
+                        await db.run_sync(services.problem_inventory.stock, bucket, new_problems[needed:])
+                    if not new_problems[:needed]:
+                        continue
+                    for problem in await db.run_sync(services.problem_inventory.stock, bucket, new_problems[:needed],
+                                                     request.student_id, True):
+                        saved.append(problem)
+                        services.prefetcher.schedule([problem], bucket.topic, budget)
+                        yield "problem", problem
+            yield "done", {"problems": saved}
+    
+    return sse_response(services, events())
+
+@router.get("/api/problems/inventory/stats", response_model=Dict[str, Any])
+async def problem_inventory_stats(db: AsyncSession = Depends(get_async_db), services: Services = Depends(get_services)):
+    """Get stock levels per bucket and the inventory hit rate"""
+    return await db.run_sync(services.problem_inventory.stats)
+
+@router.get("/api/problems/prefetch/stats", response_model=Dict[str, Any])
+def prefetch_stats(services: Services = Depends(get_services)):
+    """Get outcome, hit and waste counters for hint and solution prefetching"""
+    return services.prefetcher.stats()
+
+@router.get("/api/problems/{problem_id}/hints/{level}", response_model=ProblemHintOut)
+async def get_problem_hint(problem_id: str, level: int, db: AsyncSession = Depends(get_async_db),
+                           services: Services = Depends(get_services)):
+    """Get one hint tier for a stored problem, generating all tiers on first use"""
+    if level < 1 or level > 3:
+        raise HTTPException(status_code=400, detail="Hint level must be 1, 2 or 3")
+    
+    problem = await db.get(PracticeProblem, problem_id)
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    
+    try:
+        hints = await services.prefetcher.lookup(db, problem, "hints")
+        return {
+            "problem_id": problem.id,
+            "level": level,
+            "hint": hints[level - 1]
+        }
+    except (HTTPException, SchedulerBusy):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/problems/{problem_id}/solution", response_model=SolutionOut)
+async def get_problem_solution(problem_id: str, db: AsyncSession = Depends(get_async_db),
+                               services: Services = Depends(get_services)):
+    """Get the step-by-step solution of a stored problem, generating it on first use"""
+    problem = await db.get(PracticeProblem, problem_id)
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    
+    try:
+        return await services.prefetcher.lookup(db, problem, "solution")
+    except (HTTPException, SchedulerBusy):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Progress Tracking (Priority 2)
-@app.post("/api/progress")
-async def calculate_progress(request: ProgressRequest, db: Session = Depends(get_db)):
+@router.post("/api/progress", response_model=ProgressOut)
+async def calculate_progress(request: ProgressRequest, db: AsyncSession = Depends(get_async_db),
+                             services: Services = Depends(get_services)):
     """Calculate mastery score and generate progress summary"""
     try:
-        # Calculate mastery score
-        mastery_score = await ai_service.calculate_mastery_score(
-            attempts=request.attempts,
-            hints_used=request.hints_used
-        )
-        
-        # Generate progress summary
-        summary = await ai_service.generate_progress_summary(
-            student_id=request.student_id,
-            topic=request.topic,
-            mastery_score=mastery_score,
-            attempts=request.attempts
-        )
+        # Summary depends on the score; a slow or failed summary still records the score
+        results = await run_steps([
+            Step("mastery_score", lambda: services.ai_service.calculate_mastery_score(
+                attempts=request.attempts,
+                hints_used=request.hints_used
+            )),
+            Step("summary", lambda mastery_score: services.ai_service.generate_progress_summary(
+                student_id=request.student_id,
+                topic=request.topic,
+                mastery_score=mastery_score,
+                attempts=request.attempts
+            ), depends_on=["mastery_score"], timeout=STEP_TIMEOUT_SECONDS, fallback={})
+        ])
+        mastery_score = results["mastery_score"]
+        summary = results["summary"]
         
         # Save progress to database
         progress = Progress(
@@ -190,127 +821,377 @@ async def calculate_progress(request: ProgressRequest, db: Session = Depends(get
             mastery_score=mastery_score,
             strengths=summary.get("strengths", []),
             target_areas=summary.get("target_areas", []),
-            recommendations=summary.get("recommendations", [])
+            recommendations=summary.get("recommendations", []),
+            attempt_count=len(request.attempts)
         )
         db.add(progress)
-        db.commit()
+        await db.flush()
+        await db.run_sync(record_progress, [progress_row(progress)])
+        await db.commit()
         
         return {
             "mastery_score": mastery_score,
-            "summary": summary
+            "summary": summary,
+            "errors": results.errors
         }
+    except (HTTPException, SchedulerBusy):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/progress/{student_id}")
-def get_student_progress(student_id: str, db: Session = Depends(get_db)):
-    """Get student's progress across all topics"""
-    progress_records = db.query(Progress).filter(Progress.student_id == student_id).all()
-    return progress_records
-
-# Lesson Plans (Priority 3)
-@app.post("/api/lesson-plans")
-async def generate_lesson_plan(request: LessonPlanRequest, db: Session = Depends(get_db)):
-    """Generate comprehensive lesson plan"""
+@router.post("/api/progress/batch", response_model=ProgressBatchOut)
+async def calculate_progress_batch(request: ProgressBatchRequest, background_tasks: BackgroundTasks,
+                                   db: AsyncSession = Depends(get_async_db),
+                                   services: Services = Depends(get_services)):
+    """Score and store progress for many students and topics in one request"""
+    student_ids = {record.student_id for record in request.records}
+    known = set(await db.scalars(select(Student.id).where(Student.id.in_(student_ids))))
+    if student_ids - known:
+        raise HTTPException(status_code=404, detail=f"Students not found: {', '.join(sorted(student_ids - known))}")
+    
     try:
-        # Get student profile
-        student = db.query(Student).filter(Student.id == request.student_id).first()
-        if not student:
-            raise HTTPException(status_code=404, detail="Student not found")
+        records = request.records
+        scores = mastery_scores([r.attempts for r in records], [r.hints_used for r in records])
         
-        student_profile = {
-            "grade_level": student.grade_level,
-            "learning_style": student.learning_style,
-            "pacing_pref": student.pacing_pref
-        }
+        errors, placeholders = {}, set()
+        if request.summaries == "inline":
+            summaries, errors, placeholders = await generate_summaries(services, records, scores)
+        else:
+            summaries = [{} for _ in records]
+        # Placeholder summaries are returned flagged as degraded but stored empty, as on the deferred path
+        stored = [{} if index in placeholders else summary for index, summary in enumerate(summaries)]
         
-        lesson_plan = await ai_service.generate_lesson_plan(
-            topic=request.topic,
-            unit_outline=request.unit_outline,
-            student_profile=student_profile,
-            session_length=request.session_length
-        )
+        # One multi-row INSERT in a single transaction
+        now = datetime.utcnow()
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "student_id": record.student_id,
+                "topic": record.topic,
+                "mastery_score": score,
+                "strengths": summary.get("strengths", []),
+                "target_areas": summary.get("target_areas", []),
+                "recommendations": summary.get("recommendations", []),
+                "attempt_count": len(record.attempts),
+                "last_updated": now
+            }
+            for record, score, summary in zip(records, scores, stored)
+        ]
+        if rows:
+            await db.execute(insert(Progress), rows)
+            await db.run_sync(record_progress, rows)
+        await db.commit()
+        
+        if request.summaries == "deferred" and rows:
+            background_tasks.add_task(fill_progress_summaries, services, records, scores, [row["id"] for row in rows])
         
-        return lesson_plan
+        return {
+            "results": [
+                {
+                    "progress_id": row["id"],
+                    "student_id": row["student_id"],
+                    "topic": row["topic"],
+                    "mastery_score": row["mastery_score"],
+                    "summary": summary
+                }
+                for row, summary in zip(rows, summaries)
+            ],
+            "summaries": request.summaries,
+            "errors": errors
+        }
+    except (HTTPException, SchedulerBusy):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/api/attempts", response_model=AttemptsOut)
+async def record_attempt_events(request: Union[AttemptBatchRequest, AttemptEventRequest],
+                                idempotency_key: Optional[str] = Header(None),
+                                db: AsyncSession = Depends(get_async_db)):
+    """Ingest one attempt event or a batch and update the students' skill mastery"""
+    if isinstance(request, AttemptEventRequest):
+        # A single event may carry its key in the Idempotency-Key header instead
+        if request.idempotency_key is None:
+            request.idempotency_key = idempotency_key
+        events = [request]
+    else:
+        events = request.events
+    
+    student_ids = {event.student_id for event in events}
+    known = set(await db.scalars(select(Student.id).where(Student.id.in_(student_ids))))
+    if student_ids - known:
+        raise HTTPException(status_code=404, detail=f"Students not found: {', '.join(sorted(student_ids - known))}")
+    
+    try:
+        now = datetime.utcnow()
+        rows = [
+            {
+                "student_id": event.student_id,
+                "topic": event.topic,
+                "skill": event.skill or event.topic,
+                "problem_id": event.problem_id,
+                "correct": event.correct,
+                "hints_used": max(event.hints_used, 0),
+                "time_seconds": event.time_seconds,
+                "idempotency_key": event.idempotency_key,
+                "occurred_at": naive_utc(event.occurred_at) if event.occurred_at else now
+            }
+            for event in events
+        ]
+        try:
+            results = await db.run_sync(record_attempts, rows)
+            await db.commit()
+        except IntegrityError:
+            # A concurrent request stored one of the idempotency keys first; those events are now duplicates
+            await db.rollback()
+            results = await db.run_sync(record_attempts, rows)
+            await db.commit()
+        return {
+            "results": results,
+            "accepted": sum(not result["duplicate"] for result in results),
+            "duplicates": sum(result["duplicate"] for result in results)
+        }
+    except (HTTPException, SchedulerBusy):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/api/attempts/recompute", response_model=RecomputeOut)
+async def recompute_attempts(student_id: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """Rebuild skill mastery from the stored attempt history, for one student or everyone"""
+    return await db.run_sync(recompute_skill_states, student_id)
+
+@router.get("/api/progress/{student_id}/skills", response_model=List[SkillStateOut])
+async def get_skill_mastery(student_id: str, topic: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """Get a student's current mastery per skill, as traced from their attempt events"""
+    query = select(SkillState).where(SkillState.student_id == student_id)
+    if topic:
+        query = query.where(SkillState.topic == topic)
+    states = (await db.scalars(query.order_by(SkillState.topic, SkillState.skill))).all()
+    return [skill_state_dict(state) for state in states]
+
+@router.get("/api/progress/{student_id}", response_model=List[ProgressRollupOut])
+async def get_student_progress(student_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Get student's current progress, one rollup per topic"""
+    rollups = (await db.scalars(select(ProgressRollup).where(ProgressRollup.student_id == student_id))).all()
+    if not rollups and await db.scalar(select(Progress.id).where(Progress.student_id == student_id).limit(1)):
+        rollups = await db.run_sync(rebuild_rollups, student_id)
+    return [rollup_dict(rollup) for rollup in sorted(rollups, key=lambda r: r.topic)]
+
+@router.get("/api/progress/{student_id}/history", response_model=ProgressPage)
+async def get_progress_history(student_id: str, topic: Optional[str] = None, cursor: Optional[str] = None,
+                               limit: int = 50, db: AsyncSession = Depends(get_async_db)):
+    """Page through a student's progress records, newest first"""
+    def page(session: Session):
+        query = session.query(Progress).filter(Progress.student_id == student_id)
+        if topic:
+            query = query.filter(Progress.topic == topic)
+        return paginate(query, Progress.last_updated, Progress.id, cursor, limit)
+    
+    rows, next_cursor = await db.run_sync(page)
+    return {"items": [progress_row(row) for row in rows], "next_cursor": next_cursor}
+
+# Lesson Plans (Priority 3)
+@router.post("/api/lesson-plans", response_model=LessonPlanOut, responses={202: {"model": JobAccepted}})
+async def generate_lesson_plan(request: LessonPlanRequest, run_async: bool = Query(False, alias="async"),
+                               db: AsyncSession = Depends(get_async_db), services: Services = Depends(get_services)):
+    """Generate comprehensive lesson plan, or with ?async=true queue it and return a job id"""
+    try:
+        student = await require_student(db, request.student_id)
+        if run_async:
+            # The plan is written to this session when the job finishes
+            session = LearningSession(student_id=student.id, topic=request.topic, unit_outline=request.unit_outline)
+            db.add(session)
+            await db.flush()
+            return job_accepted(await services.job_queue.submit(db, "lesson_plan", request.model_dump(), session.id))
+        return await build_lesson_plan(services, student, request)
+    except (HTTPException, SchedulerBusy):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/api/lesson-plans/stream", response_class=StreamingResponse)
+async def stream_lesson_plan(request: LessonPlanRequest, db: AsyncSession = Depends(get_async_db),
+                             services: Services = Depends(get_services)):
+    """Stream a lesson plan as Server-Sent Events while it is generated"""
+    student = await require_student(db, request.student_id)
+    return sse_response(services, services.ai_service.stream_lesson_plan(
+        topic=request.topic,
+        unit_outline=request.unit_outline,
+        student_profile=student_profile(student),
+        session_length=request.session_length
+    ))
+
 # Diagnostic Assessment (Priority 4)
-@app.post("/api/diagnostic")
-async def generate_diagnostic(request: DiagnosticRequest):
-    """Generate diagnostic assessment"""
+@router.post("/api/diagnostic", response_model=DiagnosticOut, responses={202: {"model": JobAccepted}})
+async def generate_diagnostic(request: DiagnosticRequest, run_async: bool = Query(False, alias="async"),
+                              db: AsyncSession = Depends(get_async_db), services: Services = Depends(get_services)):
+    """Assemble a diagnostic assessment from the item bank, generating only what it lacks"""
     try:
-        assessment = await ai_service.generate_diagnostic_assessment(
-            topic=request.topic,
-            num_questions=request.num_questions
+        if run_async:
+            session_id = None
+            if request.student_id:
+                student = await require_student(db, request.student_id)
+                session = LearningSession(student_id=student.id, topic=request.topic)
+                db.add(session)
+                await db.flush()
+                session_id = session.id
+            return job_accepted(await services.job_queue.submit(db, "diagnostic", request.model_dump(), session_id))
+        return await build_diagnostic(services, db, request)
+    except (HTTPException, SchedulerBusy):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/api/diagnostic/next", response_model=DiagnosticStep)
+async def next_diagnostic_question(request: AdaptiveDiagnosticRequest, db: AsyncSession = Depends(get_async_db),
+                                   services: Services = Depends(get_services)):
+    """Pick the next diagnostic question from the answers so far, or report the final estimate"""
+    try:
+        return await services.diagnostic_bank.next_question(
+            db,
+            request.topic,
+            [answer.model_dump() for answer in request.answers],
+            request.max_questions
         )
-        return assessment
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except (HTTPException, SchedulerBusy):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/api/diagnostic/bank/stats", response_model=Dict[str, Any])
+async def diagnostic_bank_stats(db: AsyncSession = Depends(get_async_db), services: Services = Depends(get_services)):
+    """Get item counts per topic and difficulty and the bank hit rate"""
+    return await db.run_sync(services.diagnostic_bank.stats)
+
 # Learning Session Management
-@app.post("/api/sessions")
+@router.post("/api/sessions", response_model=SessionCreated, responses={202: {"model": JobAccepted}})
 async def create_learning_session(
     student_id: str,
     topic: str,
     unit_outline: List[str],
-    db: Session = Depends(get_db)
+    run_async: bool = Query(False, alias="async"),
+    db: AsyncSession = Depends(get_async_db),
+    services: Services = Depends(get_services)
 ):
-    """Create a complete learning session"""
+    """Create a complete learning session, or with ?async=true queue its generation and return a job id"""
     try:
-        # Get student
-        student = db.query(Student).filter(Student.id == student_id).first()
-        if not student:
-            raise HTTPException(status_code=404, detail="Student not found")
-        
-        student_profile = {
-            "grade_level": student.grade_level,
-            "learning_style": student.learning_style,
-            "pacing_pref": student.pacing_pref
-        }
-        
-        # Generate lesson plan
-        lesson_plan = await ai_service.generate_lesson_plan(
-            topic=topic,
-            unit_outline=unit_outline,
-            student_profile=student_profile
-        )
-        
-        # Generate practice problems
-        problems = await ai_service.generate_practice_problems(
-            topic=topic,
-            difficulty="medium",
-            count=3,
-            student_profile=student_profile
-        )
-        
-        # Create session
-        session = LearningSession(
-            student_id=student_id,
-            topic=topic,
-            unit_outline=unit_outline,
-            lesson_plan=lesson_plan,
-            practice_set=problems
-        )
-        db.add(session)
-        db.commit()
-        db.refresh(session)
-        
-        return {
-            "session_id": session.id,
-            "topic": topic,
-            "lesson_plan": lesson_plan,
-            "practice_problems": problems
-        }
+        student = await require_student(db, student_id)
+        session = LearningSession(id=str(uuid.uuid4()), student_id=student_id, topic=topic, unit_outline=unit_outline)
+        if run_async:
+            # The session row exists at once; its lesson plan and practice set are filled in by the job
+            db.add(session)
+            await db.flush()
+            return job_accepted(await services.job_queue.submit(db, "session", {}, session.id))
+        response = await build_session(services, db, student, session)
+        await db.commit()
+        services.prefetcher.schedule(response["practice_problems"], topic)
+        return response
+    except (HTTPException, SchedulerBusy):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/sessions/{student_id}")
-def get_student_sessions(student_id: str, db: Session = Depends(get_db)):
-    """Get all learning sessions for a student"""
-    sessions = db.query(LearningSession).filter(LearningSession.student_id == student_id).all()
-    return sessions
+@router.get("/api/sessions/{student_id}", response_model=SessionPage, response_model_exclude_unset=True)
+async def get_student_sessions(student_id: str, cursor: Optional[str] = None, limit: int = 50,
+                               fields: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """List a student's learning sessions, newest first, without the generated content by default"""
+    columns = select_fields(LearningSession, SESSION_LIST_FIELDS, SESSION_DETAIL_FIELDS, fields)
+    rows, next_cursor = await db.run_sync(lambda session: paginate(
+        session.query(*columns).filter(LearningSession.student_id == student_id),
+        LearningSession.created_at, LearningSession.id, cursor, limit
+    ))
+    return {"items": [row._asdict() for row in rows], "next_cursor": next_cursor}
+
+@router.get("/api/sessions/{student_id}/{session_id}", response_model=SessionOut)
+async def get_student_session(student_id: str, session_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Get one learning session with all of its generated content"""
+    session = await db.scalar(select(LearningSession).where(
+        LearningSession.id == session_id,
+        LearningSession.student_id == student_id
+    ))
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+@router.get("/api/jobs/{job_id}", response_model=JobOut)
+async def get_job(job_id: str, wait: float = 0, services: Services = Depends(get_services)):
+    """Job status and result; with ?wait=N, hold the request up to N seconds for the job to finish"""
+    job = await services.job_queue.wait(job_id, min(max(wait, 0), JOB_LONG_POLL_MAX_SECONDS))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def create_app() -> FastAPI:
+    """Build the ASGI app with its own services; the lifespan starts them"""
+    # Responses are validated against their response_model and rendered with orjson
+    app = FastAPI(title="AI Personalized Tutor Console", lifespan=lifespan, dependencies=[Depends(track_endpoint)],
+                  default_response_class=ORJSONResponse)
+    app.state.services = Services()
+    app.state.services.register_gauges()
+
+    # Innermost, so the flag it adds to placeholder responses is part of what gets tagged and compressed
+    app.add_middleware(DegradedMiddleware)
+    # Unchanged read responses become empty 304s; added early so it hashes the uncompressed body
+    app.add_middleware(ETagMiddleware)
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=int(os.getenv("GZIP_MINIMUM_SIZE", "1000")),
+        compresslevel=int(os.getenv("GZIP_LEVEL", "6"))
+    )
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Latency histograms per route; added last so it also times the CORS layer
+    app.add_middleware(MetricsMiddleware)
+
+    app.add_exception_handler(SchedulerBusy, scheduler_busy_handler)
+    app.include_router(router)
+
+    # Serve static files
+    static_dir = os.path.join(FRONTEND_DIR, "static")
+    if os.path.isdir(static_dir):
+        app.mount("/static", StaticFiles(directory=static_dir), name="static")
+    return app
+
+_app = None
+
+def __getattr__(name: str):
+    """`server.app`, built on first access so that importing this module builds nothing"""
+    global _app
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _app is None:
+        _app = create_app()
+    return _app
+
+def server_workers() -> int:
+    """SERVER_WORKERS as a process count; "auto" means one per CPU"""
+    value = os.getenv("SERVER_WORKERS", "1").strip().lower()
+    if value == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(value))
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    workers = server_workers()
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8001"))
+    if workers == 1:
+        uvicorn.run(create_app(), host=host, port=port, timeout_graceful_shutdown=SHUTDOWN_DRAIN_SECONDS)
+    else:
+        # Migrate once here rather than racing the same DDL in every worker
+        if DB_MIGRATE_ON_STARTUP:
+            run_migrations()
+        os.environ["DB_MIGRATE_ON_STARTUP"] = "false"
+        uvicorn.run("server:create_app", factory=True, host=host, port=port, workers=workers,
+                    timeout_graceful_shutdown=SHUTDOWN_DRAIN_SECONDS)
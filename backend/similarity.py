@@ -0,0 +1,342 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from collections import Counter
+from fractions import Fraction
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+from config import env_flag
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 64 MinHash values per problem, banded as 8 bands of 8 rows: pairs at the
+# default threshold of 0.9 become LSH candidates ~99% of the time, pairs
+# below 0.6 almost never do
+NUM_PERM = 64
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 4
+_PRIME = 4294967291  # largest prime below 2**32, so signatures fit in uint32
+
+# Fixed seed: signatures in a saved snapshot must match the ones computed after a restart
+_rng = np.random.RandomState(20240611)
+_PERM_A = _rng.randint(1, 2 ** 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 2 ** 31, size=NUM_PERM).astype(np.uint64)
+_BAND_MULT = _rng.randint(1, 2 ** 62, size=(BANDS, ROWS), dtype=np.int64).astype(np.uint64) | np.uint64(1)
+_BAND_SEED = _rng.randint(0, 2 ** 62, size=BANDS, dtype=np.int64).astype(np.uint64)
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_TOKEN = re.compile(r"[a-z]+|#|[+\-*/=^()<>%]")
+# Single letters that are usually words rather than variables
+_NOT_VARIABLES = {"a", "i"}
+_SYMBOLS = str.maketrans({"−": "-", "–": "-", "×": "*", "·": "*", "÷": "/"})
+
+
+def _tokenize(text: str):
+    """(canonical tokens, numbers, variable names in order of first appearance)"""
+    text = unicodedata.normalize("NFKC", text or "").lower().translate(_SYMBOLS)
+    numbers = tuple(str(Fraction(number)) for number in _NUMBER.findall(text))
+    tokens, variables = [], {}
+    for token in _TOKEN.findall(_NUMBER.sub(" # ", text)):
+        if len(token) == 1 and token.isalpha() and token not in _NOT_VARIABLES:
+            token = variables.setdefault(token, f"v{len(variables) + 1}")
+        tokens.append(token)
+    return tokens, numbers, tuple(variables)
+
+
+def canonicalize(text: str):
+    """Return (canonical text, numbers) for a problem statement.
+
+    Case, whitespace, punctuation and variable names are normalized away
+    ("Solve for y: 2y+3=7" and "solve for x: 2x + 3 = 7." are identical).
+    Numbers are replaced by "#" in the text and returned separately in
+    order, because two problems only share an answer if their numbers match.
+    """
+    tokens, numbers, _ = _tokenize(text)
+    return " ".join(tokens), numbers
+
+
+def _fingerprint(tokens: list, variables: tuple) -> int:
+    """Hash of the exact token sequence, with the original variable names"""
+    text = f"{' '.join(tokens)}|{' '.join(variables)}"
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def signature(canonical: str) -> np.ndarray:
+    """MinHash signature of the character shingles of a canonical text"""
+    if len(canonical) <= SHINGLE_SIZE:
+        shingles = {canonical}
+    else:
+        shingles = {canonical[i:i + SHINGLE_SIZE] for i in range(len(canonical) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % np.uint64(_PRIME)).min(axis=1).astype(np.uint32)
+
+
+def _salt(scope: str, numbers: tuple) -> int:
+    """Scope and numbers are part of every band key, so only exact matches on both collide"""
+    digest = hashlib.blake2b(f"{scope}|{','.join(numbers)}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _band_keys(signatures: np.ndarray, salts: np.ndarray) -> np.ndarray:
+    """(n, BANDS) LSH bucket keys for n signatures"""
+    bands = signatures.astype(np.uint64).reshape(len(signatures), BANDS, ROWS)
+    keys = (bands * _BAND_MULT).sum(axis=2, dtype=np.uint64) ^ _BAND_SEED
+    return keys ^ salts.astype(np.uint64)[:, None]
+
+
+class SimilarityIndex:
+    """In-memory MinHash/LSH index of answered problems, mapped to their cache keys.
+
+    `lookup` finds previously answered problems in the same scope whose
+    canonical text is at least `threshold` similar (estimated Jaccard
+    similarity of character shingles) and whose numbers are identical, and
+    returns the response cache key of one whose tokens also match exactly,
+    variable names included. Near-duplicates that differ in a word or an
+    operator ("increased" and "decreased") or only in which variable is
+    which are refused, since their answers differ. The index is saved to a
+    snapshot file periodically and on shutdown, and loaded on startup.
+
+    LSH buckets live in one sorted array searched with searchsorted, plus a
+    small dict for recent additions that is merged into the array as it
+    grows, which keeps memory at a few dozen bytes per entry.
+    """
+
+    def __init__(self, threshold: float = None, max_entries: int = None, snapshot_path: str = None,
+                 snapshot_interval: float = None, enabled: bool = None):
+        self.enabled = enabled if enabled is not None else env_flag("SIMILARITY_ENABLED", True)
+        self.threshold = threshold if threshold is not None else float(os.getenv("SIMILARITY_THRESHOLD", "0.9"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("SIMILARITY_MAX_ENTRIES", "500000"))
+        default_path = Path(__file__).resolve().parent.parent / "data" / "similarity_index.npz"
+        path = snapshot_path if snapshot_path is not None else os.getenv("SIMILARITY_SNAPSHOT_PATH", str(default_path))
+        self.snapshot_path = Path(path) if path else None
+        self.snapshot_interval = snapshot_interval if snapshot_interval is not None else float(os.getenv("SIMILARITY_SNAPSHOT_INTERVAL_SECONDS", "300"))
+
+        self._lock = threading.Lock()
+        self._reset(np.zeros((0, NUM_PERM), dtype=np.uint32), np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64), [])
+        self._dirty = False
+        self._task = None
+
+        self.lookups = Counter()
+        self.hits = Counter()
+        self.stale = 0
+        self.refused = 0
+        self.skipped_full = 0
+        self.snapshots_saved = 0
+
+    def _reset(self, signatures: np.ndarray, salts: np.ndarray, fingerprints: np.ndarray, keys: list):
+        count = len(keys)
+        capacity = max(1024, count * 2)
+        self._signatures = np.zeros((capacity, NUM_PERM), dtype=np.uint32)
+        self._signatures[:count] = signatures
+        self._salts = np.zeros(capacity, dtype=np.uint64)
+        self._salts[:count] = salts
+        self._fingerprints = np.zeros(capacity, dtype=np.uint64)
+        self._fingerprints[:count] = fingerprints
+        self._keys = list(keys)
+        self._by_key = {key: entry for entry, key in enumerate(keys)}
+        self._base_keys = np.zeros(0, dtype=np.uint64)
+        self._base_ids = np.zeros(0, dtype=np.int32)
+        self._delta = {}  # band key -> entry id, or a list of ids on collision
+        self._merged = 0
+        self._merge()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _merge(self):
+        """Fold every entry added since the last merge into the sorted bucket array"""
+        count = len(self._keys)
+        if count == self._merged:
+            return
+        # In chunks, to bound the temporary (chunk, BANDS, ROWS) arrays
+        parts_keys, parts_ids = [self._base_keys], [self._base_ids]
+        for start in range(self._merged, count, 65536):
+            stop = min(start + 65536, count)
+            keys = _band_keys(self._signatures[start:stop], self._salts[start:stop])
+            parts_keys.append(keys.ravel())
+            parts_ids.append(np.repeat(np.arange(start, stop, dtype=np.int32), BANDS))
+        keys, ids = np.concatenate(parts_keys), np.concatenate(parts_ids)
+        order = np.argsort(keys, kind="stable")
+        self._base_keys, self._base_ids = keys[order], ids[order]
+        self._delta = {}
+        self._merged = count
+
+    def _insert(self, sig: np.ndarray, salt: int, fingerprint: int, key: str):
+        entry = len(self._keys)
+        if entry == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.zeros_like(self._signatures)])
+            self._salts = np.concatenate([self._salts, np.zeros_like(self._salts)])
+            self._fingerprints = np.concatenate([self._fingerprints, np.zeros_like(self._fingerprints)])
+        self._signatures[entry] = sig
+        self._salts[entry] = salt
+        self._fingerprints[entry] = fingerprint
+        self._keys.append(key)
+        self._by_key[key] = entry
+        for band_key in _band_keys(sig[None, :], np.array([salt], dtype=np.uint64))[0].tolist():
+            current = self._delta.get(band_key)
+            if current is None:
+                self._delta[band_key] = entry
+            elif isinstance(current, list):
+                current.append(entry)
+            else:
+                self._delta[band_key] = [current, entry]
+        # Merging costs O(n log n), so let the delta grow with the index
+        if entry + 1 - self._merged >= max(4096, self._merged // 8):
+            self._merge()
+
+    def add(self, scope: str, problem: str, key: str):
+        """Index an answered problem whose answer is cached under `key`"""
+        if not self.enabled or key in self._by_key:
+            return
+        if len(self._keys) >= self.max_entries:
+            self.skipped_full += 1
+            return
+        tokens, numbers, variables = _tokenize(problem)
+        sig = signature(" ".join(tokens))
+        with self._lock:
+            self._insert(sig, _salt(scope, numbers), _fingerprint(tokens, variables), key)
+            self._dirty = True
+
+    def lookup(self, scope: str, problem: str, exclude: str = None):
+        """Cache key of the most similar answered problem, or None"""
+        if not self.enabled or not self._keys:
+            return None
+        self.lookups[scope] += 1
+        tokens, numbers, variables = _tokenize(problem)
+        sig = signature(" ".join(tokens))
+        salt = _salt(scope, numbers)
+        fingerprint = _fingerprint(tokens, variables)
+        band_keys = _band_keys(sig[None, :], np.array([salt], dtype=np.uint64))[0]
+
+        candidates = set()
+        lo = np.searchsorted(self._base_keys, band_keys, side="left")
+        hi = np.searchsorted(self._base_keys, band_keys, side="right")
+        for start, stop in zip(lo.tolist(), hi.tolist()):
+            if stop > start:
+                candidates.update(self._base_ids[start:stop].tolist())
+        for band_key in band_keys.tolist():
+            found = self._delta.get(band_key)
+            if found is not None:
+                candidates.update(found if isinstance(found, list) else (found,))
+
+        best, refused = None, False
+        for entry in candidates:
+            # A different scope or different numbers can still collide in one band
+            if int(self._salts[entry]) != salt or self._keys[entry] == exclude:
+                continue
+            if float(np.count_nonzero(self._signatures[entry] == sig)) / NUM_PERM < self.threshold:
+                continue
+            if int(self._fingerprints[entry]) != fingerprint:
+                refused = True
+                continue
+            best = entry
+            break
+        if best is None:
+            self.refused += refused
+            return None
+        self.hits[scope] += 1
+        return self._keys[best]
+
+    def record_stale(self):
+        """The answer behind a returned key had already left the cache"""
+        self.stale += 1
+
+    def save(self, path: Path = None):
+        path = Path(path) if path is not None else self.snapshot_path
+        if path is None:
+            return
+        with self._lock:
+            count = len(self._keys)
+            signatures = self._signatures[:count].copy()
+            salts = self._salts[:count].copy()
+            fingerprints = self._fingerprints[:count].copy()
+            keys = list(self._keys)
+            self._dirty = False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Per-process temporary name: several server workers may save the same snapshot
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temporary, "wb") as f:
+            np.savez_compressed(
+                f,
+                version=np.array([NUM_PERM, BANDS, SHINGLE_SIZE]),
+                signatures=signatures,
+                salts=salts,
+                fingerprints=fingerprints,
+                keys=np.array(keys, dtype=np.str_) if keys else np.zeros(0, dtype="<U1")
+            )
+        os.replace(temporary, path)
+        self.snapshots_saved += 1
+
+    def load(self, path: Path = None) -> int:
+        """Replace the index with a saved snapshot; returns the number of entries loaded"""
+        path = Path(path) if path is not None else self.snapshot_path
+        if path is None or not path.exists():
+            return 0
+        with np.load(path) as snapshot:
+            if snapshot["version"].tolist() != [NUM_PERM, BANDS, SHINGLE_SIZE]:
+                logger.warning("Ignoring similarity snapshot %s built with different parameters", path)
+                return 0
+            signatures, salts, keys = snapshot["signatures"], snapshot["salts"], snapshot["keys"].tolist()
+            fingerprints = snapshot["fingerprints"]
+        with self._lock:
+            self._reset(signatures, salts, fingerprints, keys)
+            self._dirty = False
+        return len(keys)
+
+    async def _autosave(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            if self._dirty:
+                try:
+                    await asyncio.to_thread(self.save)
+                except Exception:
+                    logger.exception("Saving the similarity snapshot failed")
+
+    async def start(self):
+        """Load the snapshot and start saving it periodically"""
+        if not self.enabled or self.snapshot_path is None:
+            return
+        try:
+            loaded = await asyncio.to_thread(self.load)
+            logger.info("Loaded %d entries into the similarity index", loaded)
+        except Exception:
+            logger.exception("Loading the similarity snapshot failed")
+        if self.snapshot_interval > 0:
+            self._task = asyncio.create_task(self._autosave())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.enabled and self._dirty:
+            await asyncio.to_thread(self.save)
+
+    def stats(self) -> dict:
+        lookups = sum(self.lookups.values())
+        hits = sum(self.hits.values())
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._keys),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "stale": self.stale,
+            "refused": self.refused,
+            "skipped_full": self.skipped_full,
+            "snapshot_path": str(self.snapshot_path) if self.snapshot_path else None,
+            "snapshots_saved": self.snapshots_saved,
+            "scopes": {scope: {"lookups": count, "hits": self.hits.get(scope, 0)} for scope, count in self.lookups.items()}
+        }
@@ -0,0 +1,50 @@
+import asyncio
+import copy
+from collections import Counter
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one in-flight call.
+
+    The first caller for a key starts the work; callers arriving while it
+    is still running wait on the same task and receive a copy of its result
+    or its exception. The task is shielded, so a waiter that disconnects
+    does not cancel the work for everyone else.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.executions = Counter()
+        self.coalesced = Counter()
+
+    def in_flight(self, key: str) -> bool:
+        """Whether a call for `key` is running, so a call now would join it"""
+        return key in self._inflight
+
+    async def do(self, key: str, func, label: str = "default"):
+        """Await `func()` once for all concurrent callers with the same key"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced[label] += 1
+            return copy.deepcopy(await asyncio.shield(task))
+
+        task = asyncio.ensure_future(func())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+        self.executions[label] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "executions": dict(self.executions),
+            "coalesced": dict(self.coalesced),
+            "total_coalesced": sum(self.coalesced.values())
+        }
@@ -0,0 +1,113 @@
+import contextvars
+import importlib
+from collections import defaultdict
+
+from metrics import LLM_TOKENS
+
+_UNRESOLVED = object()
+_token_counter = _UNRESOLVED
+
+_endpoint = contextvars.ContextVar("llm_endpoint", default="background")
+
+
+def set_endpoint(name: str):
+    """Attribute the LLM calls made from the current context to `name`"""
+    _endpoint.set(name)
+
+
+def current_endpoint() -> str:
+    return _endpoint.get()
+
+
+def _tokenizer():
+    """litellm.token_counter, imported on first use since litellm takes seconds to import; None if unavailable"""
+    global _token_counter
+    if _token_counter is _UNRESOLVED:
+        try:
+            _token_counter = importlib.import_module("litellm").token_counter
+        except (ImportError, AttributeError):  # emergentintegrations normally brings it in
+            _token_counter = None
+    return _token_counter
+
+
+def count_tokens(text: str, model: str = None) -> int:
+    """Count tokens with the provider tokenizer when available, else estimate"""
+    if not text:
+        return 0
+    token_counter = _tokenizer()
+    if token_counter is not None:
+        try:
+            return token_counter(model=model, text=text)
+        except Exception:
+            pass
+    # Roughly four characters per token for English prose
+    return (len(text) + 3) // 4
+
+
+class TokenMeter:
+    """Input and output token totals per endpoint and per generator method.
+
+    `prefix_tokens` is the part of the input that is the static system
+    message, i.e. what provider-side prompt caching can serve.
+    """
+
+    def __init__(self, model: str = None):
+        self.model = model
+        self._prefix_counts = {}
+        self.usage = defaultdict(lambda: defaultdict(lambda: {"calls": 0, "input_tokens": 0, "prefix_tokens": 0, "output_tokens": 0}))
+
+    def _prefix_tokens(self, system_message: str) -> int:
+        # System messages are static, so each is only tokenized once
+        count = self._prefix_counts.get(system_message)
+        if count is None:
+            count = self._prefix_counts[system_message] = count_tokens(system_message, self.model)
+        return count
+
+    def record(self, method: str, system_message: str, prompt: str, output: str):
+        prefix = self._prefix_tokens(system_message)
+        entry = self.usage[current_endpoint()][method]
+        entry["calls"] += 1
+        entry["prefix_tokens"] += prefix
+        input_tokens = prefix + count_tokens(prompt, self.model)
+        output_tokens = count_tokens(output, self.model)
+        entry["input_tokens"] += input_tokens
+        entry["output_tokens"] += output_tokens
+        LLM_TOKENS.inc(method, "input", amount=input_tokens)
+        LLM_TOKENS.inc(method, "output", amount=output_tokens)
+
+    def estimate(self, method: str, system_message: str, prompt: str, default_output: int = 400) -> int:
+        """Expected tokens for one call: the exact input plus the average output `method` has produced so far"""
+        calls = output = 0
+        for methods in self.usage.values():
+            entry = methods.get(method)
+            if entry:
+                calls += entry["calls"]
+                output += entry["output_tokens"]
+        expected_output = output // calls if calls else default_output
+        return self._prefix_tokens(system_message) + count_tokens(prompt, self.model) + expected_output
+
+    def report(self) -> dict:
+        """Token totals per endpoint, largest consumer first"""
+        endpoints = []
+        for endpoint, methods in self.usage.items():
+            totals = {key: sum(entry[key] for entry in methods.values()) for key in ("calls", "input_tokens", "prefix_tokens", "output_tokens")}
+            endpoints.append({
+                "endpoint": endpoint,
+                **totals,
+                "total_tokens": totals["input_tokens"] + totals["output_tokens"],
+                "methods": {method: dict(entry) for method, entry in methods.items()}
+            })
+        endpoints.sort(key=lambda e: e["total_tokens"], reverse=True)
+
+        grand_total = sum(e["total_tokens"] for e in endpoints)
+        input_tokens = sum(e["input_tokens"] for e in endpoints)
+        for e in endpoints:
+            e["share"] = round(e["total_tokens"] / grand_total, 4) if grand_total else 0.0
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": sum(e["output_tokens"] for e in endpoints),
+            "prefix_tokens": sum(e["prefix_tokens"] for e in endpoints),
+            "prefix_share": round(sum(e["prefix_tokens"] for e in endpoints) / input_tokens, 4) if input_tokens else 0.0,
+            "total_tokens": grand_total,
+            "endpoints": endpoints
+        }
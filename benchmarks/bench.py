@@ -0,0 +1,252 @@
+"""Offline load test for the tutor API.
+
+Runs the FastAPI app in-process against the LLM simulator and a throwaway
+SQLite database (or any DATABASE_URL), drives it with a traffic mix and
+reports throughput and latency percentiles per endpoint. No network access
+is needed.
+
+    python benchmarks/bench.py --mix classroom --requests 2000 --concurrency 40
+    python benchmarks/bench.py --mix full --output benchmarks/baseline.json
+    python benchmarks/bench.py --mix full --baseline benchmarks/baseline.json
+
+With --baseline the run exits with status 1 if any endpoint regressed.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+import httpx
+
+import simulator
+import traffic
+
+# Endpoints with fewer samples than this are reported but not compared
+MIN_SAMPLES = 50
+
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    return values[max(math.ceil(q / 100 * len(values)) - 1, 0)]
+
+
+def summarize(latencies: list, statuses: Counter) -> dict:
+    values = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if not isinstance(status, int) or status >= 500)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "shed": statuses.get(429, 0),
+        "mean_ms": round(1000 * sum(values) / len(values), 2) if values else 0.0,
+        "p50_ms": round(1000 * percentile(values, 50), 2),
+        "p95_ms": round(1000 * percentile(values, 95), 2),
+        "p99_ms": round(1000 * percentile(values, 99), 2),
+        "max_ms": round(1000 * values[-1], 2) if values else 0.0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+
+
+async def drive(client, state, mix: dict, total: int, concurrency: int, seed: int):
+    """Run `total` requests from `concurrency` virtual users; returns (latencies, statuses, elapsed)"""
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    tickets = iter(range(total))
+
+    async def user(number: int):
+        rng = random.Random(seed * 1000 + number)
+        for _ in tickets:
+            operation = traffic.choose(mix, rng)
+            start = time.perf_counter()
+            try:
+                label, response = await operation(client, state, rng)
+                status = response.status_code
+            except Exception as e:
+                label, status = operation.__name__, type(e).__name__
+            latencies[label].append(time.perf_counter() - start)
+            statuses[label][status] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(number) for number in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+async def run(args, sim) -> dict:
+    mix = traffic.MIXES[args.mix]
+    state = traffic.TrafficState(args.problem_variety)
+
+    async def measure(client):
+        rng = random.Random(args.seed)
+        await traffic.setup(client, state, rng, args.students)
+        if args.warmup:
+            await drive(client, state, mix, args.warmup, args.concurrency, args.seed + 1)
+        latencies, statuses, elapsed = await drive(client, state, mix, args.requests, args.concurrency, args.seed)
+        service = (await client.get("/api/llm/stats")).json()
+        return latencies, statuses, elapsed, service
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+            latencies, statuses, elapsed, service = await measure(client)
+    else:
+        import server
+        app = server.create_app()
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                latencies, statuses, elapsed, service = await measure(client)
+
+    everything = [value for values in latencies.values() for value in values]
+    overall = summarize(everything, sum(statuses.values(), Counter()))
+    overall["throughput_rps"] = round(len(everything) / elapsed, 2) if elapsed else 0.0
+    overall["elapsed_seconds"] = round(elapsed, 3)
+    return {
+        "config": {
+            "mix": args.mix,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "database": "external" if args.url else args.database_url.split(":", 1)[0],
+            "simulator": asdict(sim.config) if sim else None,
+            "python": platform.python_version(),
+        },
+        "overall": overall,
+        "endpoints": {label: summarize(latencies[label], statuses[label]) for label in sorted(latencies)},
+        "simulator": sim.stats() if sim else None,
+        "service": {key: service.get(key) for key in ("cache", "coalescing", "scheduler", "parsing")},
+    }
+
+
+def print_report(report: dict):
+    overall = report["overall"]
+    config = report["config"]
+    print(f"mix={config['mix']} requests={config['requests']} concurrency={config['concurrency']} database={config['database']}")
+    print(f"{overall['throughput_rps']} req/s over {overall['elapsed_seconds']}s, {overall['errors']} errors, {overall['shed']} shed (429)\n")
+    print(f"{'endpoint':<48} {'n':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = list(report["endpoints"].items()) + [("overall", overall)]
+    for label, row in rows:
+        print(f"{label:<48} {row['requests']:>6} {row['errors']:>5} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}")
+    if report["simulator"]:
+        print(f"\nsimulated model calls: {report['simulator']['total_calls']}, injected faults: {report['simulator']['injected']}")
+    cache = report["service"].get("cache") or {}
+    if cache:
+        print(f"response cache hit rate: {cache.get('hit_rate')}")
+
+
+def compare(report: dict, baseline: dict, tolerance: float, slack_ms: float) -> list:
+    """Return a description of every metric that regressed against `baseline`"""
+    regressions = []
+    if report["config"] != baseline["config"]:
+        print("warning: run configuration differs from the baseline's; comparisons may not be meaningful")
+
+    rows = [("overall", report["overall"], baseline["overall"])]
+    rows += [(label, row, baseline["endpoints"][label]) for label, row in report["endpoints"].items() if label in baseline["endpoints"]]
+    for label, current, previous in rows:
+        if min(current["requests"], previous["requests"]) < MIN_SAMPLES:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            limit = previous[key] * (1 + tolerance)
+            if current[key] > limit and current[key] - previous[key] > slack_ms:
+                regressions.append(f"{label} {key}: {current[key]} > {previous[key]} (+{tolerance:.0%})")
+        current_rate = current["errors"] / current["requests"]
+        previous_rate = previous["errors"] / previous["requests"]
+        if current_rate > previous_rate + 0.01:
+            regressions.append(f"{label} error rate: {current_rate:.2%} > {previous_rate:.2%}")
+
+    current, previous = report["overall"]["throughput_rps"], baseline["overall"]["throughput_rps"]
+    if current < previous * (1 - tolerance):
+        regressions.append(f"throughput: {current} req/s < {previous} req/s (-{tolerance:.0%})")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline load test for the AI tutor API")
+    parser.add_argument("--mix", choices=sorted(traffic.MIXES), default="classroom")
+    parser.add_argument("--requests", type=int, default=1000, help="measured requests")
+    parser.add_argument("--warmup", type=int, default=100, help="requests sent before measuring")
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users")
+    parser.add_argument("--students", type=int, default=40, help="students created during setup")
+    parser.add_argument("--problem-variety", type=int, default=200, help="distinct problem texts in hint and solution requests")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh SQLite file; point at a local Postgres to test that path")
+    parser.add_argument("--url", default=None, help="benchmark a running server instead (see benchmarks/serve.py)")
+    parser.add_argument("--latency-ms", type=float, default=None, help="median simulated model latency")
+    parser.add_argument("--latency-sigma", type=float, default=None, help="log-normal spread of the simulated latency")
+    parser.add_argument("--malformed-rate", type=float, default=None)
+    parser.add_argument("--truncated-rate", type=float, default=None)
+    parser.add_argument("--garbage-rate", type=float, default=None)
+    parser.add_argument("--no-stream", action="store_true", help="simulate a client without streaming support")
+    parser.add_argument("--output", default=None, help="write the report as JSON, e.g. to save a baseline")
+    parser.add_argument("--baseline", default=None, help="compare against a saved report and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="ignore latency regressions smaller than this")
+    return parser.parse_args()
+
+
+def simulator_config(args) -> simulator.SimulatorConfig:
+    config = simulator.SimulatorConfig.from_env()
+    overrides = {
+        "latency_median_ms": args.latency_ms,
+        "latency_sigma": args.latency_sigma,
+        "malformed_rate": args.malformed_rate,
+        "truncated_rate": args.truncated_rate,
+        "garbage_rate": args.garbage_rate,
+        "seed": args.seed,
+    }
+    for name, value in overrides.items():
+        if value is not None:
+            setattr(config, name, value)
+    if args.no_stream:
+        config.streaming = False
+    return config
+
+
+def configure_environment(args):
+    """Point the backend at local resources; must run before the backend is imported"""
+    if args.database_url is None:
+        args.database_url = f"sqlite:///{tempfile.mkdtemp(prefix='tutor-bench-')}/bench.db"
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("EMERGENT_LLM_KEY", "benchmark")
+    os.environ["FRONTEND_DIR"] = str(ROOT / "frontend")
+    # Never reach out to the provider
+    os.environ["LLM_WARMUP_URL"] = ""
+
+
+def main():
+    args = parse_args()
+    sim = None
+    if not args.url:
+        configure_environment(args)
+        sim = simulator.install(simulator_config(args))
+
+    report = asyncio.run(run(args, sim))
+    print_report(report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nreport written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance, args.slack_ms)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nno regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
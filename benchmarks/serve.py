@@ -0,0 +1,42 @@
+"""Run the API under uvicorn with the LLM simulator in place of the provider.
+
+Useful for pointing bench.py --url, or any external load tool, at a real
+HTTP server without network access:
+
+    python benchmarks/serve.py --port 8001
+    python benchmarks/bench.py --url http://localhost:8001 --mix full
+
+Simulator settings come from LLM_SIM_* environment variables (see
+simulator.SimulatorConfig); the database from DATABASE_URL.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+import simulator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the tutor API against the LLM simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='tutor-bench-')}/bench.db")
+    os.environ.setdefault("EMERGENT_LLM_KEY", "benchmark")
+    os.environ["FRONTEND_DIR"] = str(ROOT / "frontend")
+    os.environ["LLM_WARMUP_URL"] = ""
+    simulator.install(simulator.SimulatorConfig.from_env())
+
+    import uvicorn
+    import server
+    uvicorn.run(server.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Offline stand-in for emergentintegrations' LlmChat.
+
+The simulator answers every generator with valid JSON in the shape its
+prompt asks for, after a latency drawn from a log-normal distribution. A
+configurable share of replies is made malformed or cut short, so the
+repair, re-ask and fallback paths run under load as they do in production.
+
+Call install() before importing the backend; it registers this module as
+emergentintegrations.llm.chat.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import sys
+import types
+from collections import Counter
+from dataclasses import dataclass, asdict
+
+from prompts import PromptRegistry
+
+TOPIC_WORDS = ["ratio", "slope", "area", "fraction", "equation", "angle", "probability", "percent", "volume", "mean"]
+
+
+@dataclass
+class SimulatorConfig:
+    latency_median_ms: float = 800.0
+    latency_sigma: float = 0.5          # log-normal shape; 0.5 puts p99 at ~3.2x the median
+    latency_max_ms: float = 30000.0
+    first_token_share: float = 0.2      # share of the latency spent before the first streamed chunk
+    stream_chunk_chars: int = 24
+    streaming: bool = True
+    malformed_rate: float = 0.02        # prose around the JSON plus trailing commas; repairable
+    truncated_rate: float = 0.01        # reply cut off mid-document
+    garbage_rate: float = 0.005         # no JSON at all; forces a re-ask
+    seed: int = 7
+
+    @classmethod
+    def from_env(cls) -> "SimulatorConfig":
+        """Read overrides from LLM_SIM_<FIELD> environment variables"""
+        values = {}
+        for name, default in asdict(cls()).items():
+            raw = os.getenv(f"LLM_SIM_{name.upper()}")
+            if raw is None:
+                continue
+            if isinstance(default, bool):
+                values[name] = raw.strip().lower() in ("1", "true", "yes", "on")
+            else:
+                values[name] = type(default)(raw)
+        return cls(**values)
+
+
+class Simulator:
+    """Shared state for every simulated chat: configuration, RNG and counters"""
+
+    def __init__(self, config: SimulatorConfig = None):
+        self.config = config or SimulatorConfig()
+        self.rng = random.Random(self.config.seed)
+        self.methods = {template.system: method for method, template in PromptRegistry().templates.items()}
+        self.calls = Counter()
+        self.injected = Counter()
+
+    def latency(self) -> float:
+        c = self.config
+        sample = self.rng.lognormvariate(math.log(c.latency_median_ms), c.latency_sigma)
+        return min(sample, c.latency_max_ms) / 1000
+
+    def reply(self, system_message: str, prompt: str) -> str:
+        method = self.methods.get(system_message, "unknown")
+        self.calls[method] += 1
+        text = json.dumps(self._payload(method, prompt), indent=2)
+        return self._corrupt(text)
+
+    def _corrupt(self, text: str) -> str:
+        c = self.config
+        roll = self.rng.random()
+        if roll < c.garbage_rate:
+            self.injected["garbage"] += 1
+            return "I'm sorry, I can't produce that right now."
+        roll -= c.garbage_rate
+        if roll < c.truncated_rate:
+            self.injected["truncated"] += 1
+            return text[:self.rng.randint(len(text) // 3, len(text) - 2)]
+        roll -= c.truncated_rate
+        if roll < c.malformed_rate:
+            self.injected["malformed"] += 1
+            broken = re.sub(r'"\n(\s*)([\]}])', r'",\n\1\2', text, count=1)
+            return f"Sure! Here is the JSON you asked for:\n```json\n{broken}\n```\nLet me know if you need more."
+        return f"```json\n{text}\n```"
+
+    def _words(self, count: int) -> str:
+        return " ".join(self.rng.choice(TOPIC_WORDS) for _ in range(count))
+
+    def _sentence(self, lead: str, words: int = 12) -> str:
+        return f"{lead} {self._words(words)}."
+
+    def _payload(self, method: str, prompt: str) -> dict:
+        if method == "generate_hints":
+            return {f"hint{i}": self._sentence(f"Hint {i}:", 10 + 6 * i) for i in (1, 2, 3)}
+        if method == "generate_solution":
+            steps = [self._sentence(f"Step {i}:", 14) for i in range(1, self.rng.randint(3, 6) + 1)]
+            return {"steps": steps, "answer": str(self.rng.randint(2, 99)), "explanation": self._sentence("The key idea is", 20)}
+        if method == "generate_practice_problems":
+            count = _number_after(prompt, "Number of problems:", 3)
+            return {"problems": [
+                {
+                    "prompt": self._sentence(f"Problem {self.rng.randint(1, 10**6)}: find the", 18),
+                    "difficulty": self.rng.choice(["easy", "medium", "hard"]),
+                    "context": self._sentence("A class project about", 10)
+                }
+                for _ in range(count)
+            ]}
+        if method == "generate_progress_summary":
+            return {
+                "strengths": [self._sentence("Strong at", 5) for _ in range(2)],
+                "target_areas": [self._sentence("Practice", 5) for _ in range(2)],
+                "recommendations": [self._sentence("Next, try", 8) for _ in range(3)],
+                "motivational_message": self._sentence("Great work on", 10)
+            }
+        if method == "generate_lesson_plan":
+            return {
+                "objectives": [self._sentence("Students will", 8) for _ in range(3)],
+                "activities": [
+                    {"title": self._sentence("Activity", 3), "description": self._sentence("Students", 25), "time_minutes": self.rng.choice([5, 10, 15])}
+                    for _ in range(self.rng.randint(3, 5))
+                ],
+                "materials": [self._words(2) for _ in range(3)]
+            }
+        if method == "generate_diagnostic_assessment":
+            count = _number_after(prompt, "Number of questions:", 5)
+            requested = re.search(r"Difficulty:\s*(easy|medium|hard)", prompt)
+            return {"questions": [
+                {
+                    "question": self._sentence(f"Q{i + 1}: what is the", 12),
+                    "options": ["A", "B", "C", "D"],
+                    "correct_answer": self.rng.choice("ABCD"),
+                    "difficulty": requested.group(1) if requested else ["easy", "medium", "hard"][i % 3],
+                    "skill_tested": self.rng.choice(TOPIC_WORDS)
+                }
+                for i in range(count)
+            ]}
+        return {}
+
+    def stats(self) -> dict:
+        return {"calls": dict(self.calls), "total_calls": sum(self.calls.values()), "injected": dict(self.injected)}
+
+
+def _number_after(prompt: str, label: str, default: int) -> int:
+    match = re.search(re.escape(label) + r"\s*(\d+)", prompt)
+    return int(match.group(1)) if match else default
+
+
+SIMULATOR = None
+
+
+class UserMessage:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class LlmChat:
+    """Same constructor and call surface as the real client"""
+
+    def __init__(self, api_key: str, session_id: str, system_message: str):
+        self.session_id = session_id
+        self.system_message = system_message
+
+    def with_model(self, provider: str, model: str):
+        return self
+
+    async def send_message(self, message: UserMessage) -> str:
+        await asyncio.sleep(SIMULATOR.latency())
+        return SIMULATOR.reply(self.system_message, message.text)
+
+
+class StreamingLlmChat(LlmChat):
+    async def stream_message(self, message: UserMessage):
+        total = SIMULATOR.latency()
+        text = SIMULATOR.reply(self.system_message, message.text)
+        size = SIMULATOR.config.stream_chunk_chars
+        chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        first = total * SIMULATOR.config.first_token_share
+        await asyncio.sleep(first)
+        gap = (total - first) / len(chunks)
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(gap)
+
+
+def install(config: SimulatorConfig = None) -> Simulator:
+    """Register the simulator as emergentintegrations.llm.chat and return it"""
+    global SIMULATOR
+    SIMULATOR = Simulator(config)
+
+    chat = types.ModuleType("emergentintegrations.llm.chat")
+    chat.UserMessage = UserMessage
+    chat.LlmChat = StreamingLlmChat if SIMULATOR.config.streaming else LlmChat
+    llm = types.ModuleType("emergentintegrations.llm")
+    llm.chat = chat
+    package = types.ModuleType("emergentintegrations")
+    package.llm = llm
+    sys.modules.update({
+        "emergentintegrations": package,
+        "emergentintegrations.llm": llm,
+        "emergentintegrations.llm.chat": chat,
+    })
+    return SIMULATOR
@@ -0,0 +1,320 @@
+"""Classroom traffic mixes for the benchmark.
+
+Each operation makes one request and returns it with the route template
+it hit, so results group by endpoint the same way /api/metrics does. A mix is a
+weighted set of operations; `full` touches every route in server.py.
+"""
+import random
+
+TOPICS = ["Algebra", "Geometry", "Fractions", "Percentages", "Linear Equations", "Statistics", "Ratios"]
+DIFFICULTIES = ["easy", "medium", "hard"]
+GRADES = ["6th Grade", "7th Grade", "8th Grade", "9th Grade"]
+STYLES = ["visual", "auditory", "kinesthetic", "mixed"]
+PROBLEMS = [
+    "Solve for x: {a}x + {b} = {c}",
+    "What is {a}% of {c}?",
+    "Simplify the fraction {a}/{c}",
+    "Find the area of a rectangle with sides {a} cm and {b} cm",
+    "A car travels {c} km in {a} hours. What is its average speed?",
+    "Find the slope of the line through (0, {b}) and ({a}, {c})",
+    "The ratio of boys to girls is {a}:{b}. If there are {c} students, how many are girls?",
+]
+
+
+class TrafficState:
+    """Ids created during setup and by earlier requests, shared by all virtual users"""
+
+    def __init__(self, problem_variety: int):
+        self.problem_variety = problem_variety
+        self.students = []
+        self.problem_ids = []
+        self.sessions = []  # (student_id, session_id)
+        self.diagnostic_items = {}  # topic -> item ids
+        self.jobs = []  # queued job ids
+
+    def problem(self, rng: random.Random) -> str:
+        # A small pool of numbers makes repeats, and so cache hits, about as common as in a class
+        variant = rng.randrange(self.problem_variety)
+        numbers = random.Random(variant)
+        template = PROBLEMS[variant % len(PROBLEMS)]
+        return template.format(a=numbers.randint(2, 12), b=numbers.randint(1, 20), c=numbers.randint(20, 200))
+
+
+def _attempts(rng: random.Random, count: int) -> dict:
+    attempts = [{"correct": rng.random() < 0.65, "time_seconds": rng.randint(10, 240)} for _ in range(count)]
+    hints = [["hint1"] * rng.randint(0, 2) for _ in range(count)]
+    return {"attempts": attempts, "hints_used": hints}
+
+
+def _remember_problems(state: TrafficState, problems: list):
+    state.problem_ids.extend(p["id"] for p in problems if p.get("id"))
+    del state.problem_ids[:-2000]
+
+
+async def health(client, state, rng):
+    return "GET /api/health", await client.get("/api/health")
+
+
+async def index_page(client, state, rng):
+    return "GET /", await client.get("/")
+
+
+async def cache_stats(client, state, rng):
+    return "GET /api/cache/stats", await client.get("/api/cache/stats")
+
+
+async def llm_stats(client, state, rng):
+    return "GET /api/llm/stats", await client.get("/api/llm/stats")
+
+
+async def llm_tokens(client, state, rng):
+    return "GET /api/llm/tokens", await client.get("/api/llm/tokens")
+
+
+async def metrics(client, state, rng):
+    return "GET /api/metrics", await client.get("/api/metrics")
+
+
+async def create_student(client, state, rng):
+    response = await client.post("/api/students", json={
+        "name": f"Student {rng.randint(1, 10**6)}",
+        "grade_level": rng.choice(GRADES),
+        "learning_style": rng.choice(STYLES),
+        "pacing_pref": rng.choice(["slow", "medium", "fast"])
+    })
+    if response.status_code == 200:
+        state.students.append(response.json()["id"])
+    return "POST /api/students", response
+
+
+async def list_students(client, state, rng):
+    return "GET /api/students", await client.get("/api/students", params={"limit": 50})
+
+
+async def get_student(client, state, rng):
+    return "GET /api/students/{student_id}", await client.get(f"/api/students/{rng.choice(state.students)}")
+
+
+async def hints(client, state, rng):
+    return "POST /api/hints", await client.post("/api/hints", json={"problem": state.problem(rng), "difficulty": rng.choice(DIFFICULTIES), "topic": rng.choice(TOPICS)})
+
+
+async def solution(client, state, rng):
+    return "POST /api/solutions", await client.post("/api/solutions", json={"problem": state.problem(rng), "topic": rng.choice(TOPICS)})
+
+
+async def solution_stream(client, state, rng):
+    return "POST /api/solutions/stream", await client.post("/api/solutions/stream", json={"problem": state.problem(rng), "topic": rng.choice(TOPICS)})
+
+
+def _problem_request(state, rng) -> dict:
+    return {
+        "topic": rng.choice(TOPICS),
+        "difficulty": rng.choice(DIFFICULTIES),
+        "count": rng.choice([3, 5]),
+        "student_id": rng.choice(state.students)
+    }
+
+
+async def problems(client, state, rng):
+    response = await client.post("/api/problems", json=_problem_request(state, rng))
+    if response.status_code == 200:
+        _remember_problems(state, response.json()["problems"])
+    return "POST /api/problems", response
+
+
+async def problems_stream(client, state, rng):
+    return "POST /api/problems/stream", await client.post("/api/problems/stream", json=_problem_request(state, rng))
+
+
+async def inventory_stats(client, state, rng):
+    return "GET /api/problems/inventory/stats", await client.get("/api/problems/inventory/stats")
+
+
+async def problem_hint(client, state, rng):
+    if not state.problem_ids:
+        return await problems(client, state, rng)
+    return "GET /api/problems/{problem_id}/hints/{level}", await client.get(f"/api/problems/{rng.choice(state.problem_ids)}/hints/{rng.randint(1, 3)}")
+
+
+async def problem_solution(client, state, rng):
+    if not state.problem_ids:
+        return await problems(client, state, rng)
+    return "GET /api/problems/{problem_id}/solution", await client.get(f"/api/problems/{rng.choice(state.problem_ids)}/solution")
+
+
+async def prefetch_stats(client, state, rng):
+    return "GET /api/problems/prefetch/stats", await client.get("/api/problems/prefetch/stats")
+
+
+async def progress(client, state, rng):
+    return "POST /api/progress", await client.post("/api/progress", json={
+        "student_id": rng.choice(state.students),
+        "topic": rng.choice(TOPICS),
+        **_attempts(rng, rng.randint(3, 12))
+    })
+
+
+async def progress_batch(client, state, rng):
+    records = [
+        {"student_id": student_id, "topic": rng.choice(TOPICS), **_attempts(rng, rng.randint(3, 12))}
+        for student_id in rng.sample(state.students, min(len(state.students), 10))
+    ]
+    return "POST /api/progress/batch", await client.post("/api/progress/batch", json={"records": records, "summaries": "deferred"})
+
+
+def _attempt_event(state, rng) -> dict:
+    return {
+        "student_id": rng.choice(state.students),
+        "topic": rng.choice(TOPICS),
+        "correct": rng.random() < 0.65,
+        "hints_used": rng.choice([0, 0, 0, 1, 2]),
+        "time_seconds": rng.randint(10, 240),
+        "idempotency_key": f"{rng.getrandbits(64):x}"
+    }
+
+
+async def attempt(client, state, rng):
+    return "POST /api/attempts", await client.post("/api/attempts", json=_attempt_event(state, rng))
+
+
+async def attempt_batch(client, state, rng):
+    return "POST /api/attempts (batch)", await client.post("/api/attempts", json={"events": [_attempt_event(state, rng) for _ in range(rng.randint(10, 50))]})
+
+
+async def skill_mastery(client, state, rng):
+    return "GET /api/progress/{student_id}/skills", await client.get(f"/api/progress/{rng.choice(state.students)}/skills")
+
+
+async def get_progress(client, state, rng):
+    return "GET /api/progress/{student_id}", await client.get(f"/api/progress/{rng.choice(state.students)}")
+
+
+async def progress_history(client, state, rng):
+    return "GET /api/progress/{student_id}/history", await client.get(f"/api/progress/{rng.choice(state.students)}/history", params={"limit": 20})
+
+
+def _lesson_request(state, rng) -> dict:
+    return {
+        "student_id": rng.choice(state.students),
+        "topic": rng.choice(TOPICS),
+        "unit_outline": rng.sample(["Warm-up", "Concept review", "Worked example", "Guided practice", "Exit ticket"], 3),
+        "session_length": rng.choice([30, 45, 60])
+    }
+
+
+async def lesson_plan(client, state, rng):
+    return "POST /api/lesson-plans", await client.post("/api/lesson-plans", json=_lesson_request(state, rng))
+
+
+async def lesson_plan_stream(client, state, rng):
+    return "POST /api/lesson-plans/stream", await client.post("/api/lesson-plans/stream", json=_lesson_request(state, rng))
+
+
+async def diagnostic(client, state, rng):
+    topic = rng.choice(TOPICS)
+    response = await client.post("/api/diagnostic", json={"topic": topic, "num_questions": rng.choice([5, 10])})
+    if response.status_code == 200:
+        items = state.diagnostic_items.setdefault(topic, [])
+        items.extend(q["id"] for q in response.json()["questions"] if q.get("id") and q["id"] not in items)
+    return "POST /api/diagnostic", response
+
+
+async def diagnostic_next(client, state, rng):
+    # One step of an adaptive diagnostic a few answers in
+    topic = rng.choice(TOPICS)
+    items = state.diagnostic_items.get(topic, [])
+    answers = [{"item_id": item_id, "correct": rng.random() < 0.6} for item_id in rng.sample(items, min(len(items), rng.randint(0, 4)))]
+    return "POST /api/diagnostic/next", await client.post("/api/diagnostic/next", json={"topic": topic, "answers": answers})
+
+
+async def diagnostic_bank_stats(client, state, rng):
+    return "GET /api/diagnostic/bank/stats", await client.get("/api/diagnostic/bank/stats")
+
+
+async def create_session(client, state, rng):
+    lesson = _lesson_request(state, rng)
+    response = await client.post(
+        "/api/sessions",
+        params={"student_id": lesson["student_id"], "topic": lesson["topic"]},
+        json=lesson["unit_outline"]
+    )
+    if response.status_code == 200:
+        body = response.json()
+        state.sessions.append((lesson["student_id"], body["session_id"]))
+        _remember_problems(state, body["practice_problems"])
+    return "POST /api/sessions", response
+
+
+async def create_session_async(client, state, rng):
+    # Queue the session, then long-poll the job as a browser would
+    lesson = _lesson_request(state, rng)
+    response = await client.post(
+        "/api/sessions",
+        params={"student_id": lesson["student_id"], "topic": lesson["topic"], "async": "true"},
+        json=lesson["unit_outline"]
+    )
+    if response.status_code == 202:
+        state.jobs.append(response.json()["job_id"])
+        state.sessions.append((lesson["student_id"], response.json()["session_id"]))
+    return "POST /api/sessions?async", response
+
+
+async def get_job(client, state, rng):
+    if not state.jobs:
+        return await create_session_async(client, state, rng)
+    return "GET /api/jobs/{job_id}", await client.get(f"/api/jobs/{rng.choice(state.jobs)}", params={"wait": 5})
+
+
+async def list_sessions(client, state, rng):
+    return "GET /api/sessions/{student_id}", await client.get(f"/api/sessions/{rng.choice(state.students)}", params={"limit": 20})
+
+
+async def get_session(client, state, rng):
+    if not state.sessions:
+        return await create_session(client, state, rng)
+    student_id, session_id = rng.choice(state.sessions)
+    return "GET /api/sessions/{student_id}/{session_id}", await client.get(f"/api/sessions/{student_id}/{session_id}")
+
+
+MIXES = {
+    # Students working through practice sets during a lesson
+    "classroom": {
+        problems: 20, problem_hint: 20, problem_solution: 8, hints: 12, solution: 10, solution_stream: 4, problems_stream: 4,
+        attempt: 16, attempt_batch: 2, progress: 10, get_progress: 6, progress_history: 2, get_student: 4, list_students: 2, health: 1,
+    },
+    # Teachers preparing lessons and reviewing their class
+    "teacher": {
+        lesson_plan: 12, lesson_plan_stream: 4, create_session: 10, create_session_async: 4, get_job: 4,
+        list_sessions: 12, get_session: 8,
+        diagnostic: 10, diagnostic_next: 6, progress_batch: 6, list_students: 14, get_student: 8, get_progress: 10,
+        progress_history: 4, create_student: 2,
+    },
+    # Dashboards polling read endpoints; no model calls once caches are warm
+    "dashboard": {
+        list_students: 20, get_student: 10, get_progress: 20, skill_mastery: 10, progress_history: 10, list_sessions: 15,
+        get_session: 5, inventory_stats: 5, prefetch_stats: 2, diagnostic_bank_stats: 2, cache_stats: 3, llm_stats: 3, llm_tokens: 2, metrics: 5, health: 2,
+    },
+}
+# Every route, weighted towards the classroom traffic that dominates production
+MIXES["full"] = {
+    **MIXES["dashboard"],
+    **MIXES["teacher"],
+    **MIXES["classroom"],
+    create_student: 2, index_page: 1,
+}
+
+
+def choose(mix: dict, rng: random.Random):
+    operations = list(mix)
+    return rng.choices(operations, weights=[mix[op] for op in operations])[0]
+
+
+async def setup(client, state: TrafficState, rng: random.Random, students: int):
+    """Seed students, problems, progress and sessions so read endpoints have data"""
+    for _ in range(students):
+        await create_student(client, state, rng)
+    for _ in range(max(students // 4, 1)):
+        await problems(client, state, rng)
+        await progress(client, state, rng)
+        await create_session(client, state, rng)
@@ -49,11 +49,25 @@ function showSection(sectionName) {
     }
 }
 
+// Follow next_cursor until every page of a list endpoint has been read
+async function fetchAllPages(url) {
+    const items = [];
+    let cursor = null;
+    do {
+        const separator = url.includes('?') ? '&' : '?';
+        const pageUrl = cursor ? `${url}${separator}limit=200&cursor=${encodeURIComponent(cursor)}` : `${url}${separator}limit=200`;
+        const response = await fetch(pageUrl);
+        const page = await response.json();
+        items.push(...page.items);
+        cursor = page.next_cursor;
+    } while (cursor);
+    return items;
+}
+
 // Student Management
 async function loadStudents() {
     try {
-        const response = await fetch(`${API_BASE}/students`);
-        const students = await response.json();
+        const students = await fetchAllPages(`${API_BASE}/students`);
         displayStudents(students);
         updateStudentSelects(students);
     } catch (error) {
@@ -152,15 +166,17 @@ async function generateProblems() {
     container.innerHTML = '<div class=\"loading\"><div class=\"spinner-border text-primary\" role=\"status\"></div><p class=\"mt-2\">Generating problems...</p></div>';
     
     try {
-        const response = await fetch(`${API_BASE}/problems`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ topic, difficulty, count })
+        // Render each problem as soon as the server finishes generating it
+        currentProblems = [];
+        hintsUsed = [];
+        await streamEvents(`${API_BASE}/problems/stream`, { topic, difficulty, count }, (event, data) => {
+            if (event === 'problem') {
+                currentProblems.push(data);
+                displayProblems(currentProblems, topic, difficulty);
+            } else if (event === 'done' && currentProblems.length === 0) {
+                displayProblems(data.problems, topic, difficulty);
+            }
         });
-        
-        const data = await response.json();
-        currentProblems = data.problems;
-        displayProblems(data.problems, topic, difficulty);
     } catch (error) {
         console.error('Error generating problems:', error);
         container.innerHTML = '<div class=\"alert alert-danger\">Error generating problems</div>';
@@ -184,13 +200,13 @@ function displayProblems(problems, topic, difficulty) {
             </div>
             
             <div class=\"btn-group mb-3\" role=\"group\">
-                <button class=\"btn btn-hint\" onclick=\"revealHint(${index}, 0, '${topic}', '${problem.prompt}', '${difficulty}')\">
+                <button class=\"btn btn-hint\" onclick=\"revealHint(${index}, 0, '${topic}', '${problem.prompt}', '${difficulty}', '${problem.id || ''}')\">
                     💡 Hint 1
                 </button>
-                <button class=\"btn btn-hint\" onclick=\"revealHint(${index}, 1, '${topic}', '${problem.prompt}', '${difficulty}')\">
+                <button class=\"btn btn-hint\" onclick=\"revealHint(${index}, 1, '${topic}', '${problem.prompt}', '${difficulty}', '${problem.id || ''}')\">
                     💡 Hint 2
                 </button>
-                <button class=\"btn btn-hint\" onclick=\"revealHint(${index}, 2, '${topic}', '${problem.prompt}', '${difficulty}')\">
+                <button class=\"btn btn-hint\" onclick=\"revealHint(${index}, 2, '${topic}', '${problem.prompt}', '${difficulty}', '${problem.id || ''}')\">
                     💡 Hint 3
                 </button>
                 <button class=\"btn btn-info\" onclick=\"showSolution(${index}, '${topic}', '${problem.prompt}')\">
@@ -204,13 +220,21 @@ function displayProblems(problems, topic, difficulty) {
     `).join('');
 }
 
-async function revealHint(problemIndex, hintLevel, topic, problem, difficulty) {
+async function revealHint(problemIndex, hintLevel, topic, problem, difficulty, problemId) {
     const hintsContainer = document.getElementById(`hints-${problemIndex}`);
     
-    // Check if hints already exist
     if (!hintsUsed[problemIndex]) {
         hintsUsed[problemIndex] = [];
-        
+    }
+    
+    if (problemId) {
+        // Stored problems serve each hint tier from the database
+        if (!hintsUsed[problemIndex][hintLevel]) {
+            const response = await fetch(`${API_BASE}/problems/${problemId}/hints/${hintLevel + 1}`);
+            const data = await response.json();
+            hintsUsed[problemIndex][hintLevel] = data.hint;
+        }
+    } else if (hintsUsed[problemIndex].length === 0) {
         // Generate all hints at once
         const response = await fetch(`${API_BASE}/hints`, {
             method: 'POST',
@@ -241,32 +265,39 @@ async function showSolution(problemIndex, topic, problem) {
     solutionContainer.innerHTML = '<div class=\"loading\"><div class=\"spinner-border spinner-border-sm text-info\"></div> Generating solution...</div>';
     
     try {
-        const response = await fetch(`${API_BASE}/solutions`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ problem: problem, topic: topic })
+        const steps = [];
+        await streamEvents(`${API_BASE}/solutions/stream`, { problem: problem, topic: topic }, (event, data) => {
+            if (event === 'step') {
+                steps.push(data);
+                displaySolution(solutionContainer, { steps: steps });
+            } else if (event === 'done') {
+                displaySolution(solutionContainer, data);
+            }
         });
-        
-        const solution = await response.json();
-        
-        solutionContainer.innerHTML = `
-            <div class=\"solution-box\">
-                <h6>Step-by-Step Solution:</h6>
-                ${solution.steps.map((step, i) => `
-                    <div class=\"step\">${i + 1}. ${step}</div>
-                `).join('')}
+    } catch (error) {
+        console.error('Error generating solution:', error);
+        solutionContainer.innerHTML = '<div class=\"alert alert-danger\">Error generating solution</div>';
+    }
+}
+
+function displaySolution(container, solution) {
+    // Answer and explanation arrive with the final event
+    container.innerHTML = `
+        <div class=\"solution-box\">
+            <h6>Step-by-Step Solution:</h6>
+            ${solution.steps.map((step, i) => `
+                <div class=\"step\">${i + 1}. ${step}</div>
+            `).join('')}
+            ${solution.answer === undefined ? '' : `
                 <div class=\"mt-3\">
                     <strong>Answer:</strong> ${solution.answer}
                 </div>
                 <div class=\"mt-2\">
                     <em>${solution.explanation}</em>
                 </div>
-            </div>
-        `;
-    } catch (error) {
-        console.error('Error generating solution:', error);
-        solutionContainer.innerHTML = '<div class=\"alert alert-danger\">Error generating solution</div>';
-    }
+            `}
+        </div>
+    `;
 }
 
 // Progress Tracking
@@ -306,6 +337,7 @@ function displayProgress(progressData) {
                 <div class=\"col-md-3 text-center\">
                     <div class=\"mastery-score\">${progress.mastery_score}</div>
                     <div>Mastery Score</div>
+                    <small class=\"text-muted\">${progress.attempt_count || 0} attempts · trend: ${progress.trend || 'new'}</small>
                 </div>
                 <div class=\"col-md-9\">
                     <h5>${progress.topic}</h5>
@@ -351,19 +383,21 @@ async function generateLessonPlan() {
     container.innerHTML = '<div class=\"loading\"><div class=\"spinner-border text-success\"></div><p class=\"mt-2\">Generating lesson plan...</p></div>';
     
     try {
-        const response = await fetch(`${API_BASE}/lesson-plans`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                student_id: studentId,
-                topic: topic,
-                unit_outline: unitOutline,
-                session_length: duration
-            })
+        const plan = { objectives: [], activities: [], materials: [] };
+        const fields = { objective: 'objectives', activity: 'activities', material: 'materials' };
+        await streamEvents(`${API_BASE}/lesson-plans/stream`, {
+            student_id: studentId,
+            topic: topic,
+            unit_outline: unitOutline,
+            session_length: duration
+        }, (event, data) => {
+            if (fields[event]) {
+                plan[fields[event]].push(data);
+                displayLessonPlan(plan, topic);
+            } else if (event === 'done') {
+                displayLessonPlan(data, topic);
+            }
         });
-        
-        const lessonPlan = await response.json();
-        displayLessonPlan(lessonPlan, topic);
     } catch (error) {
         console.error('Error generating lesson plan:', error);
         container.innerHTML = '<div class=\"alert alert-danger\">Error generating lesson plan</div>';
@@ -476,6 +510,46 @@ function checkAnswer(questionIndex, selected, correct) {
 }
 
 // Utility functions
+async function streamEvents(url, body, onEvent) {
+    // POST a JSON body and call onEvent(event, data) for each Server-Sent Event in the response
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    if (!response.ok) {
+        throw new Error(`Request failed with status ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const message = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            message.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            
+            if (event === 'error') {
+                throw new Error(JSON.parse(data).detail);
+            }
+            onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
 function showAlert(message, type = 'info') {
     const alertDiv = document.createElement('div');
     alertDiv.className = `alert alert-${type} alert-dismissible fade show position-fixed top-0 start-50 translate-middle-x mt-3`;
@@ -0,0 +1,86 @@
+"""Shared setup: the backend runs in-process against the LLM simulator and a throwaway SQLite database."""
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "backend"), str(ROOT / "benchmarks")]
+
+# The backend reads its settings at import, so they are set before anything imports it
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{tempfile.mkdtemp(prefix='tutor-tests-')}/tests.db",
+    "EMERGENT_LLM_KEY": "test",
+    "FRONTEND_DIR": str(ROOT / "frontend"),
+    "LLM_WARMUP_URL": "",
+    "SIMILARITY_SNAPSHOT_PATH": "",
+    "DIAGNOSTIC_BANK_ENABLED": "false",
+    "JOB_POLL_SECONDS": "0.05",
+    "JOB_RETRY_BACKOFF_SECONDS": "0.05",
+})
+
+import simulator  # noqa: E402
+
+SIMULATOR = simulator.install(simulator.SimulatorConfig(
+    latency_median_ms=5,
+    latency_sigma=0.1,
+    malformed_rate=0,
+    truncated_rate=0,
+    garbage_rate=0
+))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def sim():
+    """The simulated model; tests that change its config get it restored afterwards"""
+    config = simulator.SimulatorConfig(**vars(SIMULATOR.config))
+    yield SIMULATOR
+    SIMULATOR.config = config
+
+
+@pytest.fixture
+async def app():
+    """A fresh app with its own services, started and stopped through its lifespan"""
+    import server
+    app = server.create_app()
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+@pytest.fixture
+def services(app):
+    return app.state.services
+
+
+@pytest.fixture
+async def client(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    from database import SessionLocal
+    from migrations import run_migrations
+    run_migrations()
+    with SessionLocal() as session:
+        yield session
+
+
+def sse_events(text: str) -> list:
+    """(event, data) pairs of a Server-Sent Events body"""
+    events = []
+    for message in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
@@ -0,0 +1,56 @@
+import json
+import random
+from collections import Counter
+
+import pytest
+
+import bench
+import simulator
+import traffic
+from prompts import PromptRegistry
+
+
+def test_simulator_answers_each_generator_in_its_shape(sim):
+    prompts = PromptRegistry()
+    system, prompt = prompts.render("generate_practice_problems", count=4, topic="Ratios", difficulty="easy", grade_level="7th Grade", learning_style="visual")
+    reply = sim.reply(system, prompt)
+    assert reply.startswith("```json\n")
+    assert len(json.loads(reply[8:-4])["problems"]) == 4
+
+
+def test_simulator_injects_faults_at_the_configured_rate(sim):
+    sim.config.garbage_rate = 1.0
+    system = PromptRegistry().system("generate_hints")
+    injected = sim.injected["garbage"]
+    assert sim.reply(system, "Problem: 1 + 1") == "I'm sorry, I can't produce that right now."
+    assert sim.injected["garbage"] == injected + 1
+
+
+def test_config_reads_overrides_from_the_environment(monkeypatch):
+    monkeypatch.setenv("LLM_SIM_LATENCY_MEDIAN_MS", "120")
+    monkeypatch.setenv("LLM_SIM_STREAMING", "off")
+    config = simulator.SimulatorConfig.from_env()
+    assert (config.latency_median_ms, config.streaming, config.seed) == (120.0, False, 7)
+
+
+def test_regressions_are_reported_against_a_baseline():
+    def report(p95, rps):
+        row = {"requests": 100, "errors": 0, "p50_ms": 10.0, "p95_ms": p95, "p99_ms": 40.0}
+        return {"config": {}, "overall": {**row, "throughput_rps": rps}, "endpoints": {"GET /api/health": row}}
+
+    baseline = report(20.0, 100.0)
+    assert bench.compare(report(22.0, 95.0), baseline, tolerance=0.2, slack_ms=1.0) == []
+    regressions = bench.compare(report(30.0, 70.0), baseline, tolerance=0.2, slack_ms=1.0)
+    assert "GET /api/health p95_ms: 30.0 > 20.0 (+20%)" in regressions
+    assert "throughput: 70.0 req/s < 100.0 req/s (-20%)" in regressions
+
+
+@pytest.mark.anyio
+async def test_full_traffic_mix_runs_without_server_errors(client):
+    state = traffic.TrafficState(problem_variety=20)
+    await traffic.setup(client, state, random.Random(1), students=4)
+    latencies, statuses, _ = await bench.drive(client, state, traffic.MIXES["full"], total=150, concurrency=6, seed=1)
+
+    assert sum(len(values) for values in latencies.values()) == 150
+    overall = bench.summarize([v for values in latencies.values() for v in values], sum(statuses.values(), Counter()))
+    assert overall["errors"] == 0, {label: dict(counts) for label, counts in statuses.items()}
@@ -0,0 +1,57 @@
+import pytest
+
+from cache import ResponseCache, make_cache_key
+
+
+def test_key_ignores_whitespace_differences():
+    assert make_cache_key("m", "system", "Solve  2x = 4\n", "model") == make_cache_key("m", "system", "Solve 2x = 4", "model")
+    assert make_cache_key("m", "system", "Solve 2x = 4", "model") != make_cache_key("m", "system", "Solve 2x = 5", "model")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, persistent=False)
+    cache.set("a", "m", {"n": 1})
+    cache.set("b", "m", {"n": 2})
+    assert cache.get("a") == {"n": 1}
+    cache.set("c", "m", {"n": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1}
+    assert cache.stats()["entries"] == 2
+
+
+def test_memory_tier_expires_entries():
+    cache = ResponseCache(ttl_seconds=0, persistent=False)
+    cache.set("a", "m", {"n": 1})
+    assert cache.get("a") is None
+
+
+def test_cached_values_are_copies():
+    cache = ResponseCache(persistent=False)
+    value = {"hints": ["h1"]}
+    cache.set("a", "m", value)
+    value["hints"].append("changed")
+    cache.get("a")["hints"].append("changed too")
+    assert cache.get("a") == {"hints": ["h1"]}
+
+
+def test_database_tier_survives_a_new_cache(db):
+    ResponseCache().set("persisted-key", "generate_hints", {"hints": ["h1", "h2", "h3"]})
+    cache = ResponseCache()
+    assert cache.get("persisted-key") == {"hints": ["h1", "h2", "h3"]}
+    assert cache.stats()["db_hits"] == 1
+    # The hit was copied into the memory tier
+    assert cache.get("persisted-key") is not None
+    assert cache.stats()["memory_hits"] == 1
+
+
+@pytest.mark.anyio
+async def test_repeated_generation_is_served_from_cache(client, sim):
+    body = {"problem": "Explain the metaphor in the opening stanza", "difficulty": "medium", "topic": "Poetry"}
+    calls = sum(sim.calls.values())
+    first = await client.post("/api/hints", json=body)
+    assert sum(sim.calls.values()) == calls + 1
+    calls += 1
+    second = await client.post("/api/hints", json=body)
+    assert first.status_code == second.status_code == 200
+    assert second.json()["hints"] == first.json()["hints"]
+    assert sum(sim.calls.values()) == calls
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from database import async_database_url
+
+
+def test_async_url_swaps_in_the_asyncio_driver():
+    assert async_database_url("postgresql://u:p@db:5432/tutor") == "postgresql+asyncpg://u:p@db:5432/tutor"
+    assert async_database_url("postgresql+psycopg2://u@db/tutor") == "postgresql+asyncpg://u@db/tutor"
+    assert async_database_url("sqlite:////tmp/tutor.db") == "sqlite+aiosqlite:////tmp/tutor.db"
+    assert async_database_url("mysql+aiomysql://u@db/tutor") == "mysql+aiomysql://u@db/tutor"
+
+
+@pytest.mark.anyio
+async def test_concurrent_requests_each_get_their_own_async_session(client):
+    created = await asyncio.gather(*[client.post("/api/students", json={"name": f"Student {i}"}) for i in range(20)])
+    ids = [response.json()["id"] for response in created]
+    fetched = await asyncio.gather(*[client.get(f"/api/students/{student_id}") for student_id in ids])
+    assert len(set(ids)) == 20
+    assert [response.json()["id"] for response in fetched] == ids
+
+
+@pytest.mark.anyio
+async def test_async_session_dependency():
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from database import get_async_db
+    sessions = get_async_db()
+    db = await sessions.__anext__()
+    assert isinstance(db, AsyncSession)
+    await sessions.aclose()
@@ -0,0 +1,73 @@
+import pytest
+
+from diagnostic_bank import DiagnosticBank, estimate_ability, is_correct
+from models import DiagnosticItem
+
+
+@pytest.fixture
+def bank(services):
+    """The app's item bank switched on, with no background refills"""
+    bank = services.diagnostic_bank
+    bank.enabled, bank.target_per_difficulty = True, 0
+    return bank
+
+
+def test_questions_are_spread_over_difficulties():
+    assert DiagnosticBank.plan(5) == {"medium": 2, "easy": 2, "hard": 1}
+    assert sum(DiagnosticBank.plan(7).values()) == 7
+
+
+def test_answers_grade_by_letter_or_option_text():
+    item = DiagnosticItem(options=["12", "14", "16", "18"], correct_answer="B")
+    assert is_correct(item, "b") and is_correct(item, " 14 ")
+    assert not is_correct(item, "A") and not is_correct(item, "16")
+    item = DiagnosticItem(options=["12", "14"], correct_answer="14")
+    assert is_correct(item, "B")
+
+
+def test_ability_estimate_follows_the_answers():
+    low, _ = estimate_ability([("easy", False), ("medium", False)])
+    high, _ = estimate_ability([("medium", True), ("hard", True)])
+    _, few = estimate_ability([("medium", True)])
+    _, many = estimate_ability([("medium", True), ("medium", False)] * 4)
+    assert low < 0 < high
+    assert many < few
+
+
+@pytest.mark.anyio
+async def test_second_diagnostic_is_served_from_the_bank(client, bank, sim):
+    calls = sim.calls["generate_diagnostic_assessment"]
+    first = await client.post("/api/diagnostic", json={"topic": "Bank Chemistry", "num_questions": 5})
+    assert first.status_code == 200
+    assert sim.calls["generate_diagnostic_assessment"] == calls + 3
+    assert [q["difficulty"] for q in first.json()["questions"]] == ["easy", "easy", "medium", "medium", "hard"]
+
+    second = await client.post("/api/diagnostic", json={"topic": "bank  chemistry", "num_questions": 5})
+    assert second.status_code == 200
+    assert sim.calls["generate_diagnostic_assessment"] == calls + 3
+    assert {q["id"] for q in second.json()["questions"]} == {q["id"] for q in first.json()["questions"]}
+    stats = (await client.get("/api/diagnostic/bank/stats")).json()
+    assert (stats["misses"], stats["hits"]) == (1, 1)
+    medium = stats["cells"]["bank chemistry|medium"]
+    assert (medium["items"], medium["times_served"]) == (2, 4)
+
+
+@pytest.mark.anyio
+async def test_adaptive_diagnostic_never_repeats_a_question(client, bank):
+    await client.post("/api/diagnostic", json={"topic": "Bank Optics", "num_questions": 6})
+    answers, asked = [], []
+    for _ in range(4):
+        step = (await client.post("/api/diagnostic/next", json={"topic": "Bank Optics", "answers": answers, "max_questions": 4})).json()
+        if step["done"]:
+            break
+        assert "correct_answer" not in step["question"]
+        asked.append(step["question"]["id"])
+        answers.append({"item_id": step["question"]["id"], "correct": True})
+    assert len(set(asked)) == len(asked) == 4
+
+    step = (await client.post("/api/diagnostic/next", json={"topic": "Bank Optics", "answers": answers, "max_questions": 4})).json()
+    assert step["done"] and step["estimate"]["answered"] == 4
+    assert step["estimate"]["ability"] > 0
+
+    missing = await client.post("/api/diagnostic/next", json={"topic": "Bank Optics", "answers": [{"item_id": "nope", "correct": True}]})
+    assert missing.status_code == 404
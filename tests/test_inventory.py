@@ -0,0 +1,65 @@
+import uuid
+
+import pytest
+from sqlalchemy import update
+
+from conftest import sse_events
+from inventory import Bucket, ProblemInventory
+from models import PracticeProblem
+
+
+def _bucket() -> Bucket:
+    return Bucket(f"Topic {uuid.uuid4().hex[:8]}", "medium", "General", "mixed")
+
+
+def _served_counts(db, bucket: Bucket) -> dict:
+    db.expire_all()
+    rows = db.query(PracticeProblem).filter(PracticeProblem.inventory_key == bucket.key)
+    return {row.prompt_text: row.served_count for row in rows}
+
+
+def test_claim_counts_each_serving_and_never_repeats_a_problem_for_a_student(db):
+    inventory = ProblemInventory(ai_service=None, low_water=0)
+    bucket = _bucket()
+    inventory.stock(db, bucket, [{"prompt": f"p{i}"} for i in range(3)])
+
+    first = inventory.claim(db, bucket, 2, "student-a")
+    second = inventory.claim(db, bucket, 3, "student-a")
+    assert {p["prompt"] for p in first} | {p["prompt"] for p in second} == {"p0", "p1", "p2"}
+    assert len(second) == 1
+
+    inventory.claim(db, bucket, 3, "student-b")
+    assert _served_counts(db, bucket) == {"p0": 2, "p1": 2, "p2": 2}
+
+
+def test_claim_counts_rows_migrated_without_a_served_count(db):
+    inventory = ProblemInventory(ai_service=None, low_water=0)
+    bucket = _bucket()
+    inventory.stock(db, bucket, [{"prompt": "old"}])
+    db.execute(update(PracticeProblem).where(PracticeProblem.inventory_key == bucket.key).values(served_count=None))
+    db.commit()
+
+    assert [p["prompt"] for p in inventory.claim(db, bucket, 1)] == ["old"]
+    assert _served_counts(db, bucket) == {"old": 1}
+
+
+@pytest.mark.anyio
+async def test_streamed_problems_beyond_the_request_are_stocked_once(client, services, db, monkeypatch):
+    topic = f"Topic {uuid.uuid4().hex[:8]}"
+    services.problem_inventory.low_water = 0
+
+    async def over_generating_stream(**kwargs):
+        problems = [{"prompt": f"generated {i}", "difficulty": "medium"} for i in range(3)]
+        yield "problem", problems[0]
+        yield "problem", problems[1]
+        # The last problem only shows up in the final document
+        yield "done", problems
+
+    monkeypatch.setattr(services.ai_service, "stream_practice_problems", over_generating_stream)
+    response = await client.post("/api/problems/stream", json={"topic": topic, "difficulty": "medium", "count": 1})
+    events = sse_events(response.text)
+
+    assert [event for event, _ in events] == ["problem", "done"]
+    assert _served_counts(db, Bucket(topic, "medium", "General", "mixed")) == {
+        "generated 0": 1, "generated 1": 0, "generated 2": 0
+    }
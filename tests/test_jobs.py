@@ -0,0 +1,84 @@
+import pytest
+
+from database import AsyncSessionLocal
+from jobs import JobFailed
+from resilience import mark_degraded
+
+
+async def _student(client) -> str:
+    return (await client.post("/api/students", json={"name": "Queued Student", "grade_level": "7th Grade"})).json()["id"]
+
+
+async def _submit(queue, kind: str) -> str:
+    async with AsyncSessionLocal() as db:
+        return (await queue.submit(db, kind, {})).id
+
+
+@pytest.mark.anyio
+async def test_async_lesson_plan_is_queued_and_polled(client):
+    student_id = await _student(client)
+    response = await client.post("/api/lesson-plans?async=true", json={"student_id": student_id, "topic": "Poetry", "unit_outline": ["Rhyme", "Meter"]})
+    assert response.status_code == 202
+    accepted = response.json()
+    assert response.headers["location"] == accepted["poll_url"] == f"/api/jobs/{accepted['job_id']}"
+
+    job = (await client.get(f"{accepted['poll_url']}?wait=5")).json()
+    assert (job["status"], job["attempts"], job["kind"]) == ("succeeded", 1, "lesson_plan")
+    assert job["result"]["objectives"]
+
+
+@pytest.mark.anyio
+async def test_async_session_row_exists_at_once_and_is_filled_by_the_job(client):
+    student_id = await _student(client)
+    response = await client.post(f"/api/sessions?student_id={student_id}&topic=Poetry&async=true", json=["Rhyme", "Meter"])
+    assert response.status_code == 202
+    session_id = response.json()["session_id"]
+    assert (await client.get(f"/api/sessions/{student_id}/{session_id}")).status_code == 200
+
+    job = (await client.get(f"/api/jobs/{response.json()['job_id']}?wait=5")).json()
+    assert job["status"] == "succeeded"
+    session = (await client.get(f"/api/sessions/{student_id}/{session_id}")).json()
+    assert session["lesson_plan"]["objectives"] and session["practice_set"]
+
+
+@pytest.mark.anyio
+async def test_failed_attempts_are_retried_until_one_succeeds(client, services):
+    queue, calls = services.job_queue, []
+
+    async def flaky(db, job):
+        calls.append(job.attempts)
+        if len(calls) < 3:
+            raise RuntimeError("provider hiccup")
+        return {"ok": True}
+
+    queue.register("flaky", flaky)
+    job = (await client.get(f"/api/jobs/{await _submit(queue, 'flaky')}?wait=5")).json()
+    assert (job["status"], job["attempts"], job["result"], job["error"]) == ("succeeded", 3, {"ok": True}, None)
+    assert calls == [1, 2, 3]
+
+
+@pytest.mark.anyio
+async def test_permanent_failures_and_placeholder_results(client, services):
+    queue = services.job_queue
+
+    async def broken(db, job):
+        raise JobFailed("Student not found")
+
+    async def degraded(db, job):
+        mark_degraded("generate_lesson_plan")
+        return {"objectives": []}
+
+    queue.register("broken", broken)
+    queue.register("degraded", degraded)
+    failed = (await client.get(f"/api/jobs/{await _submit(queue, 'broken')}?wait=5")).json()
+    assert (failed["status"], failed["attempts"], failed["error"]) == ("failed", 1, "Student not found")
+
+    # Placeholder content is retried, and the last attempt keeps it flagged
+    kept = (await client.get(f"/api/jobs/{await _submit(queue, 'degraded')}?wait=5")).json()
+    assert (kept["status"], kept["attempts"]) == ("succeeded", queue.max_attempts)
+    assert kept["result"] == {"objectives": [], "degraded": ["generate_lesson_plan"]}
+
+
+@pytest.mark.anyio
+async def test_unknown_job_is_404(client):
+    assert (await client.get("/api/jobs/no-such-job")).status_code == 404
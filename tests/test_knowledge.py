@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from knowledge import P_INIT, bkt_step, trace
+
+
+def test_tracing_many_sequences_matches_stepping_each_one():
+    sequences = [[(True, 0), (True, 1), (False, 0)], [(False, 2)], []]
+    expected = []
+    for sequence in sequences:
+        p = P_INIT
+        for correct, hints in sequence:
+            p = bkt_step(p, correct, hints)
+        expected.append(p)
+
+    correct, hints = np.zeros((3, 3), dtype=bool), np.zeros((3, 3))
+    for row, sequence in enumerate(sequences):
+        for step, (c, h) in enumerate(sequence):
+            correct[row, step], hints[row, step] = c, h
+    assert np.allclose(trace(correct, hints, np.array([3, 1, 0])), expected)
+
+
+def test_hints_weaken_the_evidence_of_a_correct_answer():
+    assert bkt_step(0.5, True, 0) > bkt_step(0.5, True, 2) > 0.5
+    assert bkt_step(0.5, False, 0) < 0.5
+
+
+async def _student(client) -> str:
+    return (await client.post("/api/students", json={"name": "Tracing Student"})).json()["id"]
+
+
+def _event(student_id: str, correct: bool, minutes: int, **fields) -> dict:
+    occurred_at = datetime(2024, 5, 1, 9) + timedelta(minutes=minutes)
+    return {"student_id": student_id, "topic": "Fractions", "skill": "adding", "correct": correct,
+            "occurred_at": occurred_at.isoformat(), **fields}
+
+
+@pytest.mark.anyio
+async def test_repeated_idempotency_keys_are_applied_once(client):
+    student_id = await _student(client)
+    first = await client.post("/api/attempts", json=_event(student_id, True, 0), headers={"Idempotency-Key": "try-1"})
+    again = await client.post("/api/attempts", json=_event(student_id, True, 0), headers={"Idempotency-Key": "try-1"})
+    assert first.json()["accepted"] == 1
+    assert again.json()["duplicates"] == 1
+    assert again.json()["results"][0]["event_id"] == first.json()["results"][0]["event_id"]
+
+    batch = await client.post("/api/attempts", json={"events": [
+        _event(student_id, False, 1, idempotency_key="try-2"),
+        _event(student_id, False, 1, idempotency_key="try-2"),
+    ]})
+    assert (batch.json()["accepted"], batch.json()["duplicates"]) == (1, 1)
+
+    skills = (await client.get(f"/api/progress/{student_id}/skills")).json()
+    assert (skills[0]["attempt_count"], skills[0]["correct_count"]) == (2, 1)
+
+
+@pytest.mark.anyio
+async def test_late_events_give_the_same_mastery_as_a_full_recompute(client):
+    student_id = await _student(client)
+    for minutes, correct in [(0, True), (2, True), (3, False)]:
+        await client.post("/api/attempts", json=_event(student_id, correct, minutes, hints_used=1))
+    # Arrives after the later events but happened between them
+    response = await client.post("/api/attempts", json=_event(student_id, False, 1))
+    incremental = response.json()["results"][0]["mastery_score"]
+
+    p = P_INIT
+    for correct, hints in [(True, 1), (False, 0), (True, 1), (False, 1)]:
+        p = bkt_step(p, correct, hints)
+    assert incremental == round(float(p) * 100, 2)
+
+    rebuilt = await client.post(f"/api/attempts/recompute?student_id={student_id}")
+    assert rebuilt.json() == {"events": 4, "skills": 1}
+    skills = (await client.get(f"/api/progress/{student_id}/skills")).json()
+    assert skills[0]["mastery_score"] == incremental
+
+
+@pytest.mark.anyio
+async def test_events_for_unknown_students_are_rejected(client):
+    response = await client.post("/api/attempts", json=_event("no-such-student", True, 0))
+    assert response.status_code == 404
@@ -0,0 +1,54 @@
+import pytest
+
+from llm_json import ResponseParser, close_truncated, strip_trailing_commas
+
+
+@pytest.fixture
+def parser():
+    return ResponseParser(reask=False)
+
+
+def test_fenced_reply_with_prose_parses_untouched(parser):
+    reply = 'Sure! Here you go:\n```json\n{"hint1": "a", "hint2": "b", "hint3": "c"}\n```\nGood luck!'
+    assert parser.parse("generate_hints", reply) == ({"hint1": "a", "hint2": "b", "hint3": "c"}, "ok", None)
+
+
+def test_trailing_commas_are_repaired(parser):
+    assert strip_trailing_commas('{"a": [1, 2,], "b": "x,]",}') == '{"a": [1, 2], "b": "x,]"}'
+    result = parser.parse("generate_solution", '{"steps": ["one", "two",], "answer": "4",}')
+    assert result.outcome == "repaired"
+    assert result.data == {"steps": ["one", "two"], "answer": "4"}
+
+
+def test_malformed_items_are_dropped(parser):
+    result = parser.parse("generate_practice_problems", '{"problems": [{"prompt": "x"}, {"difficulty": "easy"}, "junk"]}')
+    assert result.outcome == "repaired"
+    assert result.data == {"problems": [{"prompt": "x"}]}
+
+
+def test_truncated_reply_keeps_only_complete_values(parser):
+    data, lost = close_truncated('{"steps": ["one", "two", "thr')
+    assert (data, lost) == ({"steps": ["one", "two"]}, True)
+
+    reply = '{"problems": [{"prompt": "Add 2 and 3"}, {"prompt": "Subtract 4 fr'
+    result = parser.parse("generate_practice_problems", reply)
+    assert result.outcome == "salvaged"
+    assert result.data == {"problems": [{"prompt": "Add 2 and 3"}]}
+
+
+def test_unusable_replies_fail_with_a_reason(parser):
+    assert parser.parse("generate_hints", "I cannot help with that.") == (None, "failed", "no JSON object found")
+    result = parser.parse("generate_solution", '{"steps": [], "answer": "4"}')
+    assert (result.outcome, result.error) == ("failed", "'steps' has no usable items")
+    assert parser.stats()["failed"] == 2
+
+
+@pytest.mark.anyio
+async def test_unusable_reply_is_asked_for_once_more_then_falls_back(client, services, sim):
+    sim.config.garbage_rate = 1.0
+    calls = sim.calls["generate_solution"]
+    response = await client.post("/api/solutions", json={"problem": "Explain enjambment in this couplet", "topic": "Poetry"})
+    assert response.status_code == 200
+    assert sim.calls["generate_solution"] == calls + 2
+    assert services.ai_service.parser.stats()["reasks"] == 1
+    assert response.json()["degraded"] == ["generate_solution"]
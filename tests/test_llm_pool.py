@@ -0,0 +1,86 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from llm_pool import LLMClientPool
+
+
+class _Provider(BaseHTTPRequestHandler):
+    """Keep-alive HTTP server that answers like a model provider"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, body: bytes = b""):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._reply()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self._reply(json.dumps({"ok": True}).encode())
+
+
+@pytest.fixture
+def provider_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Provider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_warmup_defaults_to_the_provider_url(monkeypatch):
+    monkeypatch.delenv("LLM_WARMUP_URL", raising=False)
+    assert LLMClientPool("key", "anthropic", "model").warmup_url == "https://api.anthropic.com"
+    monkeypatch.setenv("LLM_WARMUP_URL", "")
+    assert LLMClientPool("key", "anthropic", "model").warmup_url == ""
+
+
+def test_every_chat_gets_its_own_session():
+    pool = LLMClientPool("key", "anthropic", "model")
+    sessions = {pool.chat("system").session_id for _ in range(3)}
+    assert len(sessions) == 3
+    assert pool.stats()["chats_created"] == 3
+
+
+@pytest.mark.anyio
+async def test_warmup_connection_is_reused(provider_url):
+    pool = LLMClientPool("key", "anthropic", "model", warmup_url=provider_url)
+    await pool.start()
+    try:
+        for _ in range(3):
+            assert (await pool.client.post(provider_url + "/v1/messages", json={})).status_code == 200
+    finally:
+        await pool.close()
+    stats = pool.stats()
+    assert (stats["http_requests"], stats["connections_opened"]) == (4, 1)
+
+
+@pytest.mark.anyio
+async def test_litellm_provider_handlers_send_through_the_pool(provider_url):
+    pytest.importorskip("litellm")
+    from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler, get_async_httpx_client
+
+    pool = LLMClientPool("key", "anthropic", "model", warmup_url=provider_url)
+    await pool.start()
+    try:
+        handler = get_async_httpx_client(llm_provider="anthropic")
+        response = await handler.post(provider_url + "/v1/messages", json={"messages": []})
+        assert response.status_code == 200
+        # litellm closes its handlers' clients; the pooled connections stay open
+        await handler.close()
+        assert (await pool.client.head(provider_url)).status_code == 200
+    finally:
+        await pool.close()
+    assert pool.stats()["http_requests"] == 3
+    assert pool.stats()["connections_opened"] == 1
+    assert not hasattr(AsyncHTTPHandler.create_client, "pool")
@@ -0,0 +1,61 @@
+import pytest
+
+from local_engine import DIFFICULTIES, LocalEngine
+
+
+@pytest.fixture
+def engine():
+    return LocalEngine(enabled=True, seed=1)
+
+
+@pytest.mark.parametrize("topic, problem, answer", [
+    ("Linear Equations", "Solve for x: 3x + 4 = 19", "x = 5"),
+    ("Fractions", "What is 1/2 + 1/3?", "5/6"),
+    ("Percentages", "What is 25% of 80?", "20"),
+    ("Order of Operations", "Calculate: 2 + 3 × 4", "14"),
+])
+def test_routine_problems_are_solved_locally(engine, topic, problem, answer):
+    solution = engine.solution(topic, problem)
+    assert solution["answer"] == answer
+    assert solution["steps"][0].startswith("Step 1:")
+    assert len(engine.hints(topic, problem)) == 3
+
+
+def test_unknown_topics_and_statements_fall_back_to_the_model(engine):
+    assert engine.solution("Poetry", "Explain enjambment") is None
+    assert engine.hints("Fractions", "Why do we need common denominators?") is None
+    assert engine.stats()["declined"] == {"generate_hints": 1}
+    assert LocalEngine(enabled=False).solution("Fractions", "What is 1/2 + 1/3?") is None
+
+
+@pytest.mark.parametrize("topic, problem", [
+    ("Percentages", "What is 20% of 50 plus 10?"),
+    ("Fractions", "Calculate 1/2 + 1/3, then multiply the result by 4."),
+    ("Percentages", "A jacket costs $40. After 25% off, a further 10% off is applied. What is the final price?"),
+    ("Percentages", "The population of 500 increases by 10% each year for 2 years. What is the final population?"),
+])
+def test_statements_with_extra_conditions_are_not_solved_locally(engine, topic, problem):
+    assert engine.solution(topic, problem) is None
+
+
+@pytest.mark.parametrize("difficulty", DIFFICULTIES)
+@pytest.mark.parametrize("topic", ["linear equations", "fractions", "percentages", "arithmetic"])
+def test_generated_problems_are_distinct_and_solvable(engine, topic, difficulty):
+    problems = engine.practice_problems(topic, difficulty, 5)
+    assert len({p["prompt"] for p in problems}) == 5
+    generator = engine.generator_for(topic)
+    assert all(generator.solve(p["prompt"]) is not None for p in problems)
+    assert all(p["difficulty"] == difficulty for p in problems)
+
+
+@pytest.mark.anyio
+async def test_local_topics_make_no_model_calls(client, sim):
+    calls = sum(sim.calls.values())
+    response = await client.post("/api/problems", json={"topic": "Fractions", "difficulty": "easy", "count": 3})
+    assert response.status_code == 200
+    problems = response.json()["problems"]
+    assert len(problems) == 3
+    response = await client.post("/api/solutions", json={"problem": problems[0]["prompt"], "topic": "Fractions"})
+    assert response.status_code == 200
+    assert response.json()["answer"]
+    assert sum(sim.calls.values()) == calls
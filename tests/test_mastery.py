@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from ai_service import AIEducatorService
+from mastery import mastery_scores
+
+
+@pytest.mark.anyio
+async def test_vectorized_scores_match_the_scalar_formula():
+    service = AIEducatorService()
+    rng = random.Random(3)
+    records = [
+        ([{"correct": rng.random() < 0.6} for _ in range(rng.randint(0, 9))],
+         [["h"] * rng.randint(0, 3) for _ in range(rng.randint(0, 3))])
+        for _ in range(300)
+    ]
+    expected = [await service.calculate_mastery_score(attempts, hints) for attempts, hints in records]
+    assert mastery_scores([attempts for attempts, _ in records], [hints for _, hints in records]) == expected
+
+
+def test_no_records_and_no_attempts():
+    assert mastery_scores([], []) == []
+    assert mastery_scores([[]], [[["h1", "h2"]]]) == [0.0]
+
+
+@pytest.mark.anyio
+async def test_batch_progress_scores_and_stores_every_record(client):
+    student_id = (await client.post("/api/students", json={"name": "Batch Student"})).json()["id"]
+    records = [
+        {"student_id": student_id, "topic": "Poetry", "attempts": [{"correct": True}, {"correct": False}], "hints_used": [["h1"]]},
+        {"student_id": student_id, "topic": "Prose", "attempts": [{"correct": True}], "hints_used": []},
+    ]
+    response = await client.post("/api/progress/batch", json={"records": records, "summaries": "none"})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(r["topic"], r["mastery_score"]) for r in results] == [("Poetry", 45.0), ("Prose", 100.0)]
+    assert all(r["progress_id"] for r in results)
+
+    unknown = dict(records[0], student_id="no-such-student")
+    assert (await client.post("/api/progress/batch", json={"records": [unknown]})).status_code == 404
@@ -0,0 +1,56 @@
+import pytest
+
+from metrics import Counter, Histogram, Registry
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    registry = Registry()
+    counter = registry.register(Counter("requests_total", "Requests", ["route"]))
+    histogram = registry.register(Histogram("latency_seconds", "Latency", ["route"], buckets=(0.1, 1.0)))
+    counter.inc('/a"b')
+    counter.inc('/a"b', amount=2)
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5.0, "/a")
+
+    lines = registry.render().splitlines()
+    assert 'requests_total{route="/a\\"b"} 3' in lines
+    assert lines[lines.index("# TYPE latency_seconds histogram") + 1:] == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 5.55',
+        'latency_seconds_count{route="/a"} 3',
+    ]
+    with pytest.raises(ValueError):
+        counter.inc()
+
+
+def test_registering_a_gauge_again_replaces_its_callback():
+    registry = Registry()
+    registry.gauge("queue_depth", "Waiting calls", lambda: {(): 1})
+    registry.gauge("queue_depth", "Waiting calls", lambda: {(): 7})
+    text = registry.render()
+    assert text.count("# TYPE queue_depth gauge") == 1
+    assert "queue_depth 7" in text.splitlines()
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_reports_requests_and_the_latest_app(client, services):
+    await client.get("/api/health")
+    response = await client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/health",status="200"}' in text
+    assert text.count("# TYPE llm_scheduler_queue_depth gauge") == 1
+
+    services.job_queue.running = 3
+    assert "jobs_running 3" in (await client.get("/api/metrics")).text.splitlines()
+    services.job_queue.running = 0
+
+
+@pytest.mark.anyio
+async def test_profiler_routes_are_off_by_default(client):
+    response = await client.post("/api/metrics/profiler/start")
+    assert response.status_code == 403
@@ -0,0 +1,49 @@
+import pytest
+
+from middleware import _matches
+
+
+def test_if_none_match_uses_weak_comparison():
+    assert _matches('W/"abc"', 'W/"abc"')
+    assert _matches('"abc", W/"def"', 'W/"abc"')
+    assert _matches(" * ", 'W/"abc"')
+    assert not _matches('W/"abd"', 'W/"abc"')
+
+
+@pytest.mark.anyio
+async def test_unchanged_read_answers_304_until_the_data_changes(client):
+    student_id = (await client.post("/api/students", json={"name": "Tagged Student"})).json()["id"]
+    url = f"/api/progress/{student_id}/skills"
+    first = await client.get(url)
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"') and first.headers["cache-control"] == "no-cache"
+
+    cached = await client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b"" and "content-type" not in cached.headers
+
+    await client.post("/api/attempts", json={"student_id": student_id, "topic": "Ratios", "correct": True})
+    changed = await client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag and changed.json()[0]["skill"] == "Ratios"
+
+
+@pytest.mark.anyio
+async def test_writes_and_errors_are_not_tagged(client):
+    created = await client.post("/api/students", json={"name": "Untagged Student"})
+    missing = await client.get("/api/students/no-such-student")
+    assert "etag" not in created.headers and "etag" not in missing.headers
+
+
+@pytest.mark.anyio
+async def test_large_responses_are_gzipped_but_event_streams_are_not(client):
+    for n in range(20):
+        await client.post("/api/students", json={"name": f"Compressed Student {n}", "goals": "Read more poetry"})
+    listing = await client.get("/api/students?limit=20", headers={"Accept-Encoding": "gzip"})
+    assert listing.headers["content-encoding"] == "gzip"
+    assert len(listing.json()["items"]) == 20
+
+    stream = await client.post("/api/solutions/stream", headers={"Accept-Encoding": "gzip"},
+                               json={"problem": "Explain what a stanza is", "topic": "Poetry"})
+    assert stream.headers["content-type"].startswith("text/event-stream")
+    assert "content-encoding" not in stream.headers
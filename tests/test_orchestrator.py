@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import pytest
+
+from orchestrator import Step, run_steps
+
+pytestmark = pytest.mark.anyio
+
+
+def _after(seconds: float, value):
+    async def func(**kwargs):
+        await asyncio.sleep(seconds)
+        return value
+    return func
+
+
+async def test_independent_steps_run_concurrently():
+    started = time.monotonic()
+    results = await run_steps([Step("a", _after(0.1, 1)), Step("b", _after(0.1, 2)), Step("c", _after(0.1, 3))])
+    assert [results["a"], results["b"], results["c"]] == [1, 2, 3]
+    assert time.monotonic() - started < 0.25
+
+
+async def test_dependencies_receive_results():
+    async def total(a, b):
+        return a + b
+
+    results = await run_steps([Step("a", _after(0, 2)), Step("b", _after(0, 3)), Step("sum", total, depends_on=["a", "b"])])
+    assert results["sum"] == 5
+    assert not results.partial
+
+
+async def test_failed_and_slow_steps_fall_back():
+    async def boom():
+        raise RuntimeError("model down")
+
+    results = await run_steps([
+        Step("failed", boom, fallback={}),
+        Step("slow", _after(1, "late"), timeout=0.05, fallback=None),
+        Step("ok", _after(0, "fine")),
+    ])
+    assert results["failed"] == {} and results["slow"] is None and results["ok"] == "fine"
+    assert results.errors == {"failed": "model down", "slow": "timed out after 0.05s"}
+
+
+async def test_failure_without_fallback_cancels_the_run():
+    finished = []
+
+    async def boom():
+        raise RuntimeError("model down")
+
+    async def slow():
+        await asyncio.sleep(1)
+        finished.append("slow")
+
+    with pytest.raises(RuntimeError):
+        await run_steps([Step("boom", boom), Step("slow", slow)])
+    assert finished == []
+
+
+async def test_cycles_and_unknown_dependencies_are_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        await run_steps([Step("a", _after(0, 1), depends_on=["b"]), Step("b", _after(0, 1), depends_on=["a"])])
+    with pytest.raises(ValueError, match="unknown"):
+        await run_steps([Step("a", _after(0, 1), depends_on=["missing"])])
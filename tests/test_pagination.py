@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import LearningSession, Student
+
+pytestmark = pytest.mark.anyio
+
+
+def _student_with_sessions(db, count: int) -> str:
+    student = Student(name="Paged Student")
+    db.add(student)
+    db.flush()
+    start = datetime.utcnow()
+    for i in range(count):
+        # Pairs of sessions share a timestamp, so pages have to break ties by id
+        db.add(LearningSession(student_id=student.id, topic=f"Topic {i}", lesson_plan={"objectives": ["o"]},
+                               created_at=start + timedelta(seconds=i // 2)))
+    db.commit()
+    return student.id
+
+
+async def test_cursor_pages_cover_every_row_once_newest_first(client, db):
+    student_id = _student_with_sessions(db, 7)
+    items, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get(f"/api/sessions/{student_id}", params=params)).json()
+        assert len(page["items"]) <= 2
+        items += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len({item["id"] for item in items}) == len(items) == 7
+    keys = [(item["created_at"], item["id"]) for item in items]
+    assert keys == sorted(keys, reverse=True)
+
+
+async def test_list_projects_only_requested_fields(client, db):
+    student_id = _student_with_sessions(db, 1)
+    [item] = (await client.get(f"/api/sessions/{student_id}")).json()["items"]
+    assert set(item) == {"id", "student_id", "topic", "created_at"}
+
+    [item] = (await client.get(f"/api/sessions/{student_id}", params={"fields": "lesson_plan"})).json()["items"]
+    assert item["lesson_plan"] == {"objectives": ["o"]}
+    assert "assessment" not in item
+
+
+async def test_bad_cursor_and_unknown_fields_are_rejected(client):
+    assert (await client.get("/api/students", params={"cursor": "not-a-cursor"})).status_code == 400
+    assert (await client.get("/api/students", params={"fields": "password"})).status_code == 400
@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+import simulator
+from models import PracticeProblem
+from resilience import clear_deadline, set_deadline
+
+
+@pytest.fixture
+def prefetcher(services):
+    prefetcher = services.prefetcher
+    prefetcher.enabled = True
+    return prefetcher
+
+
+async def _failing(self, message):
+    raise RuntimeError("provider is down")
+
+
+async def _settle(prefetcher):
+    await asyncio.gather(*list(prefetcher._tasks.values()), return_exceptions=True)
+
+
+async def _problems(client, count: int = 2) -> list:
+    response = await client.post("/api/problems", json={"topic": "Poetry", "difficulty": "medium", "count": count})
+    assert response.status_code == 200
+    return response.json()["problems"]
+
+
+@pytest.mark.anyio
+async def test_prefetched_answers_are_served_without_a_model_call(client, prefetcher, sim):
+    problems = await _problems(client)
+    assert prefetcher.stats()["in_flight"] == 4
+    await _settle(prefetcher)
+
+    calls = sum(sim.calls.values())
+    solution = await client.get(f"/api/problems/{problems[0]['id']}/solution")
+    hint = await client.get(f"/api/problems/{problems[0]['id']}/hints/2")
+    assert solution.status_code == hint.status_code == 200
+    assert solution.json()["steps"] and hint.json()["hint"]
+    assert sum(sim.calls.values()) == calls
+
+    stats = prefetcher.stats()
+    assert stats["outcomes"]["completed"] == 4
+    assert stats["lookups"] == {"prefetched": 2}
+    assert stats["unused"] == 2
+
+
+@pytest.mark.anyio
+async def test_failed_prefetch_stores_no_placeholder(client, services, monkeypatch, db):
+    problems = await _problems(client, count=1)
+    prefetcher = services.prefetcher
+    prefetcher.enabled = True
+    monkeypatch.setattr(simulator.LlmChat, "send_message", _failing)
+    assert prefetcher.schedule(problems, "Poetry") == 2
+    await _settle(prefetcher)
+    assert prefetcher.stats()["outcomes"] == {"started": 2, "failed": 2}
+    row = db.get(PracticeProblem, problems[0]["id"])
+    assert (row.hints, row.solution_steps) == (None, None)
+
+    monkeypatch.undo()
+    solution = await client.get(f"/api/problems/{problems[0]['id']}/solution")
+    assert "x-degraded" not in solution.headers
+    db.refresh(row)
+    assert row.solution_steps == solution.json()["steps"]
+
+
+@pytest.mark.anyio
+async def test_placeholder_lookup_is_served_but_not_stored(client, monkeypatch, db):
+    problem_id = (await _problems(client, count=1))[0]["id"]
+    monkeypatch.setattr(simulator.LlmChat, "send_message", _failing)
+    first = await client.get(f"/api/problems/{problem_id}/hints/1")
+    assert first.status_code == 200
+    assert first.headers["x-degraded"] == "generate_hints"
+    assert db.get(PracticeProblem, problem_id).hints is None
+
+    monkeypatch.undo()
+    second = await client.get(f"/api/problems/{problem_id}/hints/1")
+    assert "x-degraded" not in second.headers
+    assert second.json()["hint"] != first.json()["hint"]
+    db.expire_all()
+    assert db.get(PracticeProblem, problem_id).hints[0] == second.json()["hint"]
+
+
+@pytest.mark.anyio
+async def test_plain_request_joining_a_prefetch_promotes_it(client, services, sim):
+    problems = await _problems(client, count=1)
+    prefetcher, scheduler = services.prefetcher, services.ai_service.scheduler
+    prefetcher.enabled = True
+    scheduler.max_concurrency = 1
+    # Hold the only slot so the prefetches queue up behind it
+    await scheduler.acquire("interactive")
+    assert prefetcher.schedule(problems, "Poetry") == 2
+    while scheduler.queue_depth < 2:
+        await asyncio.sleep(0.001)
+
+    calls = sim.calls["generate_solution"]
+    request = asyncio.create_task(client.post("/api/solutions", json={"problem": problems[0]["prompt"], "topic": "Poetry"}))
+    while services.ai_service.singleflight.stats()["coalesced"].get("generate_solution") != 1:
+        await asyncio.sleep(0.001)
+    assert sorted(entry[3] for entry in scheduler._waiters) == ["background", "interactive"]
+
+    scheduler.release()
+    response = await request
+    assert response.status_code == 200 and response.json()["steps"]
+    assert sim.calls["generate_solution"] == calls + 1
+    await _settle(prefetcher)
+
+
+@pytest.mark.anyio
+async def test_prefetch_outlives_the_deadline_of_the_request_that_started_it(client, services, db):
+    problems = await _problems(client, count=1)
+    prefetcher = services.prefetcher
+    prefetcher.enabled = True
+    set_deadline(0.001)
+    try:
+        assert prefetcher.schedule(problems, "Poetry") == 2
+    finally:
+        clear_deadline()
+    await asyncio.sleep(0.01)
+    await _settle(prefetcher)
+    assert prefetcher.stats()["outcomes"] == {"started": 2, "completed": 2}
+    row = db.get(PracticeProblem, problems[0]["id"])
+    assert row.hints and row.solution_steps
+
+
+@pytest.mark.anyio
+async def test_prefetching_stops_at_the_token_budget(client, prefetcher):
+    prefetcher.token_budget = 1
+    await _problems(client)
+    assert prefetcher.stats()["outcomes"] == {"skipped_budget": 4}
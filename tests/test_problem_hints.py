@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+from migrations import run_migrations
+
+
+async def _stored_problem(client) -> dict:
+    response = await client.post("/api/problems", json={"topic": "Poetry", "difficulty": "medium", "count": 1})
+    assert response.status_code == 200
+    return response.json()["problems"][0]
+
+
+@pytest.mark.anyio
+async def test_hint_tiers_are_generated_once_and_then_read_back(client, sim):
+    problem = await _stored_problem(client)
+    calls = sim.calls["generate_hints"]
+    hints = [(await client.get(f"/api/problems/{problem['id']}/hints/{level}")).json() for level in (1, 2, 3)]
+    assert [hint["level"] for hint in hints] == [1, 2, 3]
+    assert all(hint["hint"] for hint in hints)
+    assert sim.calls["generate_hints"] == calls + 1
+
+
+@pytest.mark.anyio
+async def test_hint_level_and_problem_are_checked(client):
+    problem = await _stored_problem(client)
+    assert (await client.get(f"/api/problems/{problem['id']}/hints/4")).status_code == 400
+    assert (await client.get("/api/problems/no-such-problem/hints/1")).status_code == 404
+
+
+def test_migration_adds_problem_columns_and_backfills_topic(tmp_path):
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as connection:
+        connection.executescript("""
+            CREATE TABLE learning_sessions (id VARCHAR PRIMARY KEY, student_id VARCHAR, topic VARCHAR NOT NULL,
+                unit_outline JSON, lesson_plan JSON, practice_set JSON, explanations JSON, progress_summary JSON,
+                assessment JSON, created_at DATETIME);
+            CREATE TABLE practice_problems (id VARCHAR PRIMARY KEY, session_id VARCHAR, prompt_text TEXT NOT NULL,
+                difficulty VARCHAR, hints JSON, solution_steps JSON, answer TEXT, solution_explanation TEXT,
+                mastery_indicator VARCHAR, created_at DATETIME);
+            INSERT INTO learning_sessions (id, topic) VALUES ('s1', 'Fractions');
+            INSERT INTO practice_problems (id, session_id, prompt_text) VALUES ('p1', 's1', 'Add 1/2 and 1/3');
+            INSERT INTO practice_problems (id, session_id, prompt_text) VALUES ('p2', NULL, 'Halve 3/4');
+        """)
+
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        result = run_migrations(engine)
+        assert {"practice_problems.topic", "practice_problems.context"} <= set(result["columns_added"])
+        with sqlite3.connect(path) as connection:
+            rows = dict(connection.execute("SELECT id, topic FROM practice_problems").fetchall())
+        assert rows == {"p1": "Fractions", "p2": None}
+        # Nothing left to add on a second run
+        assert run_migrations(engine)["columns_added"] == []
+    finally:
+        engine.dispose()
@@ -0,0 +1,138 @@
+import asyncio
+import contextvars
+import time
+
+import pytest
+
+import server
+import simulator
+from models import Progress
+from resilience import CircuitBreaker, LatencyTracker, collect_degraded, mark_degraded, track_degraded
+
+
+async def _failing(self, message):
+    raise RuntimeError("provider is down")
+
+
+def test_circuit_opens_after_repeated_failures_and_closes_after_a_good_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60, enabled=True)
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == "closed"
+    breaker.record_failure()
+    assert not breaker.allow() and breaker.state == "open"
+
+    breaker.reset_seconds = 0
+    assert breaker.allow() and breaker.state == "half_open"
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opened == 2
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.stats()["rejected_calls"] == 1
+
+
+def test_hedge_delay_needs_enough_samples_and_has_a_floor():
+    tracker = LatencyTracker(percentile=50, min_delay=0.5, min_samples=3, enabled=True)
+    tracker.observe("generate_solution", 2.0)
+    assert tracker.hedge_delay("generate_solution") is None
+    tracker.observe("generate_solution", 1.0)
+    tracker.observe("generate_solution", 3.0)
+    assert tracker.hedge_delay("generate_solution") == 2.0
+    tracker = LatencyTracker(percentile=50, min_delay=0.5, min_samples=1, enabled=True)
+    tracker.observe("generate_hints", 0.1)
+    assert tracker.hedge_delay("generate_hints") == 0.5
+
+
+def test_reasons_collected_in_a_block_still_flag_the_request():
+    def serve():
+        request = track_degraded()
+        with collect_degraded() as inner:
+            mark_degraded("generate_progress_summary")
+        return request, inner
+
+    request, inner = contextvars.copy_context().run(serve)
+    assert inner == request == {"generate_progress_summary"}
+
+
+@pytest.mark.anyio
+async def test_provider_failures_serve_flagged_placeholders_and_open_the_circuit(client, services, monkeypatch):
+    monkeypatch.setattr(simulator.LlmChat, "send_message", _failing)
+    breaker = services.ai_service.breaker
+    for n in range(breaker.failure_threshold):
+        response = await client.post("/api/solutions", json={"problem": f"Scan line {n} of the sonnet", "topic": "Poetry"})
+        assert response.status_code == 200
+        assert response.headers["x-degraded"] == "generate_solution"
+        assert response.headers["cache-control"] == "no-store"
+        assert response.json()["degraded"] == ["generate_solution"]
+    assert breaker.state == "open"
+
+    monkeypatch.undo()
+    refused = await client.post("/api/solutions", json={"problem": "Scan the last line of the sonnet", "topic": "Poetry"})
+    assert refused.headers["x-degraded"] == "generate_solution"
+    assert breaker.stats()["rejected_calls"] == 1
+
+
+@pytest.mark.anyio
+async def test_route_deadline_gives_up_without_opening_the_circuit(client, services, sim, monkeypatch):
+    monkeypatch.setitem(server.LLM_DEADLINES, "POST /api/solutions", 0.05)
+    sim.config.latency_median_ms = 2000
+    started = time.perf_counter()
+    response = await client.post("/api/solutions", json={"problem": "Explain the volta in a sonnet", "topic": "Poetry"})
+    assert time.perf_counter() - started < 1
+    assert response.json()["degraded"] == ["generate_solution"]
+    assert services.ai_service.breaker.stats()["consecutive_failures"] == 0
+
+
+@pytest.mark.anyio
+async def test_slow_call_is_hedged_with_a_duplicate(client, services, monkeypatch):
+    latency = services.ai_service.latency
+    latency.enabled, latency.min_samples, latency.min_delay = True, 1, 0.05
+    latency.observe("generate_solution", 0.01)
+    fast = simulator.LlmChat.send_message
+    calls = []
+
+    async def first_call_stalls(self, message):
+        calls.append(self)
+        if len(calls) == 1:
+            await asyncio.sleep(5)
+        return await fast(self, message)
+
+    monkeypatch.setattr(simulator.LlmChat, "send_message", first_call_stalls)
+    started = time.perf_counter()
+    response = await client.post("/api/solutions", json={"problem": "Explain a caesura", "topic": "Poetry"})
+    assert time.perf_counter() - started < 1
+    assert "degraded" not in response.json() and response.json()["steps"]
+    assert latency.stats()["hedges"] == {"hedge": 1}
+
+
+@pytest.mark.anyio
+async def test_deferred_summaries_outlive_the_request_deadline(client, db, monkeypatch):
+    monkeypatch.setitem(server.LLM_DEADLINES, "POST /api/progress/batch", 0.001)
+    student_id = (await client.post("/api/students", json={"name": "Deferred Student"})).json()["id"]
+
+    async def batch(topic):
+        record = {"student_id": student_id, "topic": topic, "attempts": [{"correct": True}], "hints_used": [[]]}
+        response = await client.post("/api/progress/batch", json={"records": [record], "summaries": "deferred"})
+        assert response.status_code == 200
+        db.expire_all()
+        return db.get(Progress, response.json()["results"][0]["progress_id"])
+
+    assert (await batch("Sonnets")).strengths
+
+    # Placeholder summaries are not written; the row keeps its empty summary
+    monkeypatch.setattr(simulator.LlmChat, "send_message", _failing)
+    assert (await batch("Haiku")).strengths == []
+
+
+@pytest.mark.anyio
+async def test_inline_placeholder_summaries_are_returned_but_not_stored(client, db, monkeypatch):
+    student_id = (await client.post("/api/students", json={"name": "Inline Student"})).json()["id"]
+    monkeypatch.setattr(simulator.LlmChat, "send_message", _failing)
+    record = {"student_id": student_id, "topic": "Limericks", "attempts": [{"correct": True}], "hints_used": [[]]}
+    response = await client.post("/api/progress/batch", json={"records": [record], "summaries": "inline"})
+    assert response.status_code == 200
+    assert response.headers["x-degraded"] == "generate_progress_summary"
+    result = response.json()["results"][0]
+    assert result["summary"]["strengths"]
+    assert db.get(Progress, result["progress_id"]).strengths == []
+    rollups = (await client.get(f"/api/progress/{student_id}")).json()
+    assert rollups[0]["topic"] == "Limericks" and rollups[0]["strengths"] == []
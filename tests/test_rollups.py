@@ -0,0 +1,56 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Progress, ProgressRollup, Student
+from rollups import rebuild_rollups, record_progress
+
+
+def _entry(student_id: str, topic: str, score: float, attempts: int = 2) -> dict:
+    return {"id": str(uuid.uuid4()), "student_id": student_id, "topic": topic, "mastery_score": score, "attempt_count": attempts}
+
+
+def _student(db) -> str:
+    student = Student(name="Rollup Student")
+    db.add(student)
+    db.commit()
+    return student.id
+
+
+def test_rollups_fold_records_in_write_order(db):
+    student_id = _student(db)
+    record_progress(db, [_entry(student_id, "Poetry", 40), _entry(student_id, "Prose", 70)])
+    record_progress(db, [_entry(student_id, "Poetry", 60, attempts=3), _entry(student_id, "Poetry", 59.5)])
+    db.commit()
+
+    rollups = {r.topic: r for r in db.query(ProgressRollup).filter(ProgressRollup.student_id == student_id)}
+    poetry = rollups["Poetry"]
+    assert (poetry.mastery_score, poetry.previous_score, poetry.trend) == (59.5, 60, "flat")
+    assert (poetry.record_count, poetry.attempt_count) == (3, 7)
+    assert (rollups["Prose"].trend, rollups["Prose"].record_count) == ("new", 1)
+
+
+def test_rollups_are_rebuilt_from_history(db):
+    student_id = _student(db)
+    start = datetime.utcnow()
+    for minutes, score in enumerate([20, 50, 80]):
+        db.add(Progress(student_id=student_id, topic="Poetry", mastery_score=score, attempt_count=1,
+                        last_updated=start + timedelta(minutes=minutes)))
+    db.commit()
+
+    [rollup] = rebuild_rollups(db, student_id)
+    assert (rollup.mastery_score, rollup.previous_score, rollup.trend, rollup.record_count) == (80, 50, "up", 3)
+
+
+@pytest.mark.anyio
+async def test_progress_endpoint_reads_the_rollups(client):
+    student_id = (await client.post("/api/students", json={"name": "Rollup Reader"})).json()["id"]
+    for correct in (False, True):
+        response = await client.post("/api/progress/batch", json={"records": [
+            {"student_id": student_id, "topic": "Poetry", "attempts": [{"correct": correct}], "hints_used": []}
+        ], "summaries": "none"})
+        assert response.status_code == 200
+
+    [rollup] = (await client.get(f"/api/progress/{student_id}")).json()
+    assert (rollup["mastery_score"], rollup["previous_score"], rollup["trend"]) == (100.0, 0.0, "up")
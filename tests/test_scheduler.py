@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from scheduler import LLMScheduler, SchedulerBusy, llm_priority
+
+pytestmark = pytest.mark.anyio
+
+
+async def _queued(scheduler: LLMScheduler, priority: str, order: list, name: str):
+    async with scheduler.slot(priority):
+        order.append(name)
+
+
+async def test_queued_calls_run_most_urgent_first():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=10)
+    await scheduler.acquire("interactive")
+    order = []
+    tasks = [
+        asyncio.ensure_future(_queued(scheduler, "background", order, "prefetch")),
+        asyncio.ensure_future(_queued(scheduler, "batch", order, "lesson plan")),
+        asyncio.ensure_future(_queued(scheduler, "interactive", order, "hint")),
+    ]
+    await asyncio.sleep(0)
+    assert scheduler.queue_depth == 3
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    assert order == ["hint", "lesson plan", "prefetch"]
+    assert scheduler.stats()["active"] == 0
+
+
+async def test_full_queue_rejects_with_a_retry_hint():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=1)
+    await scheduler.acquire("interactive")
+    waiter = asyncio.ensure_future(scheduler.acquire("standard"))
+    await asyncio.sleep(0)
+    with pytest.raises(SchedulerBusy) as busy:
+        await scheduler.acquire("standard")
+    assert busy.value.retry_after >= 1
+    assert scheduler.stats()["priorities"]["standard"]["rejected"] == 1
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    assert scheduler.queue_depth == 0
+
+
+async def test_promoted_calls_overtake_the_queue():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=10)
+    await scheduler.acquire("interactive")
+    order = []
+    lesson = asyncio.ensure_future(_queued(scheduler, "batch", order, "lesson plan"))
+    with llm_priority("background", tag="problem-1:hints"):
+        prefetch = asyncio.ensure_future(_queued(scheduler, "background", order, "prefetch"))
+    await asyncio.sleep(0)
+    assert scheduler.promote("problem-1:hints", "interactive") == 1
+    scheduler.release()
+    await asyncio.gather(lesson, prefetch)
+    assert order == ["prefetch", "lesson plan"]
+
+
+async def test_a_slot_handed_to_a_cancelled_waiter_is_passed_on():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=10)
+    await scheduler.acquire("interactive")
+    waiter = asyncio.ensure_future(scheduler.acquire("standard"))
+    await asyncio.sleep(0)
+    scheduler.release()
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    assert scheduler.try_acquire("interactive")
+
+
+async def test_full_queue_answers_429(client, services):
+    scheduler = services.ai_service.scheduler
+    scheduler.max_concurrency, scheduler.max_queue = 0, 0
+    response = await client.post("/api/hints", json={"problem": "Scan the meter of this line", "difficulty": "easy", "topic": "Poetry"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,53 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import httpx
+import pytest
+
+import server
+
+
+def test_importing_the_server_builds_nothing():
+    code = "import sys, server; print(server._app is None, 'litellm' in sys.modules)"
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "True False"
+
+
+def test_each_app_gets_its_own_services():
+    first, second = server.create_app(), server.create_app()
+    assert first.state.services is not second.state.services
+    assert first.state.services.ai_service is not second.state.services.ai_service
+    assert first.state.services.problem_inventory.ai_service is first.state.services.ai_service
+
+
+def test_worker_count_and_deadline_settings(monkeypatch):
+    monkeypatch.setenv("SERVER_WORKERS", "auto")
+    assert server.server_workers() == (os.cpu_count() or 1)
+    monkeypatch.setenv("SERVER_WORKERS", "0")
+    assert server.server_workers() == 1
+    assert server._parse_deadlines(" POST  /api/hints=5, GET /api/x=0.5,") == {"POST /api/hints": 5.0, "GET /api/x": 0.5}
+    with pytest.raises(ValueError):
+        server._parse_deadlines("=5")
+
+
+@pytest.mark.anyio
+async def test_readiness_follows_warm_up_and_drain():
+    app = server.create_app()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async with app.router.lifespan_context(app):
+            assert (await client.get("/api/live")).status_code == 200
+            for _ in range(100):
+                if app.state.ready:
+                    break
+                await asyncio.sleep(0.01)
+            response = await client.get("/api/ready")
+            assert response.status_code == 200
+            assert response.json() == {"ready": True, "draining": False, "pid": os.getpid()}
+
+        response = await client.get("/api/ready")
+        assert response.status_code == 503
+        assert (response.json()["ready"], response.json()["draining"]) == (False, True)
@@ -0,0 +1,71 @@
+import pytest
+
+from similarity import SimilarityIndex, canonicalize
+
+PROBLEM = "A train travels 120 km in 2 hours. What is its average speed in km per hour?"
+
+
+@pytest.fixture
+def index():
+    return SimilarityIndex(threshold=0.9, snapshot_path="", enabled=True)
+
+
+def test_canonical_form_ignores_case_spacing_and_variable_names():
+    assert canonicalize("Solve for y: 2y+3=7") == canonicalize("solve for x: 2x + 3 = 7.")
+    assert canonicalize("What is 0.5 of 10?")[1] == ("1/2", "10")
+
+
+def test_near_duplicates_with_the_same_numbers_match(index):
+    index.add("generate_solution", PROBLEM, "key-1")
+    assert index.lookup("generate_solution", PROBLEM.lower().replace("?", " ?")) == "key-1"
+    assert index.lookup("generate_solution", PROBLEM.replace("120", "150")) is None
+    assert index.lookup("generate_hints|easy", PROBLEM) is None
+    assert index.lookup("generate_solution", PROBLEM, exclude="key-1") is None
+    assert index.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("answered, asked", [
+    ("A bicycle in the shop window had a price of 240 dollars at the start of the month, and over the month that price "
+     "increased by 25 percent. What is the price of the bicycle at the end of the month?",
+     "A bicycle in the shop window had a price of 240 dollars at the start of the month, and over the month that price "
+     "decreased by 25 percent. What is the price of the bicycle at the end of the month?"),
+    ("A baker has 15 trays of rolls. Work out 15 divided by 3 plus 4 times the number of trays the baker has left at the end of the day.",
+     "A baker has 15 trays of rolls. Work out 15 multiplied by 3 plus 4 times the number of trays the baker has left at the end of the day."),
+    ("Solve the system x + 2y = 7 and 3x - y = 7", "Solve the system y + 2x = 7 and 3y - x = 7"),
+])
+def test_near_duplicates_with_a_different_meaning_are_refused(index, answered, asked):
+    index.add("generate_solution", answered, "answered")
+    assert index.lookup("generate_solution", asked) is None
+    assert index.stats()["refused"] == 1
+
+
+def test_entries_stay_found_after_merging_and_a_snapshot_round_trip(index, tmp_path):
+    for n in range(50):
+        index.add("generate_solution", f"Find the perimeter of a square with side {n} cm.", f"square-{n}")
+    index._merge()
+    index.add("generate_solution", PROBLEM, "train")
+    assert index.lookup("generate_solution", "Find the perimeter of a square with side 7 cm") == "square-7"
+
+    index.save(tmp_path / "index.npz")
+    restored = SimilarityIndex(snapshot_path="", enabled=True)
+    assert restored.load(tmp_path / "index.npz") == 51
+    assert restored.lookup("generate_solution", PROBLEM) == "train"
+    assert restored.lookup("generate_solution", "find the perimeter of a square with side 42 cm.") == "square-42"
+
+
+def test_a_full_index_stops_growing(index):
+    index.max_entries = 1
+    index.add("generate_solution", PROBLEM, "a")
+    index.add("generate_solution", "Another problem entirely", "b")
+    assert (len(index), index.stats()["skipped_full"]) == (1, 1)
+
+
+@pytest.mark.anyio
+async def test_reworded_problem_reuses_the_earlier_solution(client, services, sim):
+    calls = sim.calls["generate_solution"]
+    first = await client.post("/api/solutions", json={"problem": PROBLEM, "topic": "Physics"})
+    second = await client.post("/api/solutions", json={"problem": "a train travels 120 km in 2 hours.  what is its average speed in km per hour", "topic": "Physics"})
+    assert first.status_code == second.status_code == 200
+    assert second.json()["answer"] == first.json()["answer"]
+    assert sim.calls["generate_solution"] == calls + 1
+    assert services.ai_service.similar.stats()["hits"] == 1
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_callers_share_one_call_and_get_their_own_copy():
+    flight = SingleFlight()
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"hints": ["h1"]}
+
+    results = await asyncio.gather(*[flight.do("key", generate, "generate_hints") for _ in range(5)])
+    assert len(calls) == 1
+    assert all(result == {"hints": ["h1"]} for result in results)
+    results[1]["hints"].append("changed")
+    assert results[2] == {"hints": ["h1"]}
+    assert flight.stats()["coalesced"] == {"generate_hints": 4}
+    assert flight.stats()["in_flight"] == 0
+
+
+async def test_errors_reach_every_waiter_and_are_not_remembered():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model down")
+
+    results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+
+    async def succeed():
+        return "ok"
+
+    assert await flight.do("key", succeed) == "ok"
+
+
+async def test_a_cancelled_waiter_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+    finished = asyncio.Event()
+
+    async def generate():
+        await asyncio.sleep(0.05)
+        finished.set()
+        return "done"
+
+    first = asyncio.ensure_future(flight.do("key", generate))
+    second = asyncio.ensure_future(flight.do("key", generate))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == "done"
+    assert finished.is_set()
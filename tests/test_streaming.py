@@ -0,0 +1,44 @@
+import pytest
+
+from conftest import sse_events
+from json_stream import JsonArrayStream
+
+
+def test_items_are_returned_as_soon_as_they_complete():
+    stream = JsonArrayStream(["steps"])
+    assert stream.feed('```json\n{"steps": ["Isolate') == []
+    assert stream.feed(' x", "Div') == [("steps", "Isolate x")]
+    assert stream.feed('ide by 2"], "answer": "2"}\n```') == [("steps", "Divide by 2")]
+
+
+def test_nested_items_and_escaped_quotes():
+    stream = JsonArrayStream(["problems"])
+    text = '{"note": "[not an item]", "problems": [{"prompt": "Say \\"hi\\"", "tags": ["a", "b"]}, {"prompt": "x"}]}'
+    items = []
+    for i in range(0, len(text), 5):
+        items.extend(stream.feed(text[i:i + 5]))
+    assert items == [("problems", {"prompt": 'Say "hi"', "tags": ["a", "b"]}), ("problems", {"prompt": "x"})]
+
+
+@pytest.mark.anyio
+async def test_solution_stream_sends_steps_then_the_full_solution(client):
+    response = await client.post("/api/solutions/stream", json={"problem": "Explain the rhyme scheme of a sonnet", "topic": "Poetry"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = sse_events(response.text)
+    names = [event for event, _ in events]
+    assert names[-1] == "done" and set(names[:-1]) == {"step"}
+    done = events[-1][1]
+    assert [data for event, data in events if event == "step"] == done["steps"]
+
+
+@pytest.mark.anyio
+async def test_lesson_plan_stream_for_a_known_student_only(client):
+    missing = await client.post("/api/lesson-plans/stream", json={"student_id": "no-such-student", "topic": "Poetry", "unit_outline": ["Rhyme"]})
+    assert missing.status_code == 404
+
+    student_id = (await client.post("/api/students", json={"name": "Streamed Student", "grade_level": "8th Grade"})).json()["id"]
+    response = await client.post("/api/lesson-plans/stream", json={"student_id": student_id, "topic": "Poetry", "unit_outline": ["Rhyme", "Meter"]})
+    assert response.status_code == 200
+    events = sse_events(response.text)
+    assert events[-1][0] == "done" and events[-1][1]["objectives"]
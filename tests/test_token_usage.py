@@ -0,0 +1,90 @@
+import contextvars
+import subprocess
+import sys
+
+import pytest
+
+import token_usage
+from prompts import PromptRegistry, parse_library
+from token_usage import TokenMeter
+
+LIBRARY = """# comment lines before the first section are ignored
+## Hint Generation Prompt
+You write hints.
+
+### User
+Topic: {topic}
+Problem: {problem}
+
+## Unrelated Section
+Not a generator.
+"""
+
+
+@pytest.fixture
+def estimated(monkeypatch):
+    """Count tokens with the four-characters-per-token estimate"""
+    monkeypatch.setattr(token_usage, "_token_counter", None)
+
+
+def test_importing_the_meter_leaves_litellm_unloaded():
+    code = "import sys, token_usage; print('litellm' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=token_usage.__file__.rsplit("/", 1)[0], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+
+def test_prompt_library_sections_become_templates():
+    templates = parse_library(LIBRARY)
+    assert list(templates) == ["generate_hints"]
+    template = templates["generate_hints"]
+    assert template.system == "You write hints."
+    assert template.fields == {"topic", "problem"}
+    assert template.render(topic=" Algebra ", problem=["x + 1", "x - 1"]) == "Topic: Algebra\nProblem: x + 1, x - 1"
+    with pytest.raises(KeyError, match="problem"):
+        template.render(topic="Algebra")
+
+
+def test_system_message_is_the_same_for_every_call():
+    registry = PromptRegistry()
+    first = registry.render("generate_hints", topic="Algebra", difficulty="easy", problem="2x = 4")
+    second = registry.render("generate_hints", topic="Geometry", difficulty="hard", problem="Find the area")
+    assert first[0] == second[0] == registry.system("generate_hints")
+    assert first[1] != second[1]
+
+
+def test_meter_splits_tokens_by_endpoint_and_prefix(estimated):
+    meter = TokenMeter()
+
+    def calls():
+        token_usage.set_endpoint("POST /api/hints")
+        meter.record("generate_hints", "s" * 40, "p" * 20, "o" * 8)
+        meter.record("generate_hints", "s" * 40, "p" * 20, "o" * 8)
+        token_usage.set_endpoint("POST /api/solutions")
+        meter.record("generate_solution", "s" * 40, "p" * 4, "o" * 40)
+
+    contextvars.copy_context().run(calls)
+    assert token_usage.current_endpoint() == "background"
+
+    report = meter.report()
+    assert [e["endpoint"] for e in report["endpoints"]] == ["POST /api/hints", "POST /api/solutions"]
+    hints = report["endpoints"][0]
+    assert hints["methods"]["generate_hints"] == {"calls": 2, "input_tokens": 30, "prefix_tokens": 20, "output_tokens": 4}
+    assert hints["share"] == round(34 / 55, 4)
+    assert (report["input_tokens"], report["output_tokens"], report["prefix_tokens"]) == (41, 14, 30)
+    assert report["prefix_share"] == round(30 / 41, 4)
+
+    # Expected output is the average the method has produced so far
+    assert meter.estimate("generate_hints", "s" * 40, "p" * 8) == 10 + 2 + 2
+    assert meter.estimate("generate_lesson_plan", "s" * 40, "", default_output=100) == 110
+
+
+@pytest.mark.anyio
+async def test_tokens_are_attributed_to_the_calling_route(client):
+    response = await client.post("/api/hints", json={"problem": "Solve 3x = 12", "topic": "Algebra", "difficulty": "easy"})
+    assert response.status_code == 200
+
+    report = (await client.get("/api/llm/tokens")).json()
+    hints = next(e for e in report["endpoints"] if e["endpoint"] == "POST /api/hints")
+    assert hints["methods"]["generate_hints"]["calls"] == 1
+    assert 0 < hints["prefix_tokens"] < hints["input_tokens"]
+    assert hints["output_tokens"] > 0